@@ -0,0 +1,49 @@
+"""
+Encoding large create requests: a sales order with thousands of lines.
+
+    PYTHONPATH=. python benchmarks/bench_encoder.py
+"""
+import timeit
+from decimal import Decimal
+
+from pyintacct import IntacctAPI
+from pyintacct.models.base import Date
+from pyintacct.models.company import Contact, MailAddress
+from pyintacct.models.order_entry import SOTransaction, SOTransactionItem, SOTransactionItems
+
+LINES = (10, 1000, 5000)
+
+
+def sotransaction(lines: int) -> SOTransaction:
+    shipto = Contact(contactname='Warehouse', mailaddress=MailAddress(address1='1 Main St', city='Sydney'))
+    items = [SOTransactionItem(itemid=f'ITEM-{i:05d}', quantity=Decimal(i % 7 + 1), unit='Each',
+                               price=Decimal('19.95'), locationid='L100', departmentid='D200', memo=f'Line {i}',
+                               revrecstartdate=Date(year='2024', month='01', day='01'), shipto=shipto)
+             for i in range(lines)]
+    return SOTransaction(transactiontype='Sales Order', datecreated=Date(year='2024', month='01', day='31'),
+                         customerid='C-0001', shipto=shipto, sotransitems=SOTransactionItems(sotransitem=items))
+
+
+def legacy(client, obj):
+    # model_dump() -> XMLDictNode -> emit_xml(), as before models were encoded directly.
+    payload, function = client.get_function_base()
+    client._add_create(function, obj)
+    return client.serialize(payload, 'session')
+
+
+def encoder(client, obj):
+    return client.serialize(client.create_payload(obj), 'session')
+
+
+def main():
+    client = IntacctAPI('sender_id', 'sender_password')
+    for lines in LINES:
+        obj = sotransaction(lines)
+        number = max(1, 2000 // lines)
+        for name, func in (('jxmlease', legacy), ('encoder', encoder)):
+            seconds = min(timeit.repeat(lambda: func(client, obj), number=number, repeat=3)) / number
+            print(f'{lines:5d} lines  {name:<10} {seconds * 1000:9.2f} ms/request  {len(func(client, obj)):9d} bytes')
+
+
+if __name__ == '__main__':
+    main()
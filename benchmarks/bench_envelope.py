@@ -0,0 +1,39 @@
+"""
+Per-request overhead of building and serializing a readByQuery request.
+
+    python benchmarks/bench_envelope.py
+"""
+import timeit
+from copy import deepcopy
+
+from jxmlease import XMLCDATANode, XMLDictNode
+
+from pyintacct import IntacctAPI
+
+NUMBER = 5000
+
+
+def legacy(client):
+    # The request path before envelopes were rendered from a template.
+    payload = deepcopy(client.basexml)
+    function = payload['request']['operation']['content'].add_node(tag='function', new_node=XMLDictNode(tag='function'))
+    function.set_xml_attr('controlid', 'controlid')
+    function.add_node(tag='readMore', new_node=XMLDictNode({'resultId': '7765623330000'}))
+    payload['request']['operation']['authentication'].add_node(tag='sessionid', new_node=XMLCDATANode('session'))
+    payload.standardize()
+    return payload.emit_xml().encode('utf-8')
+
+
+def envelope(client):
+    return client.serialize(client.read_more_payload('7765623330000'), 'session')
+
+
+def main():
+    client = IntacctAPI('sender_id', 'sender_password')
+    for name, func in (('deepcopy + emit_xml', legacy), ('envelope', envelope)):
+        seconds = min(timeit.repeat(lambda: func(client), number=NUMBER, repeat=3))
+        print(f'{name:<20} {seconds / NUMBER * 1e6:8.1f} us/request  {len(func(client)):5d} bytes')
+
+
+if __name__ == '__main__':
+    main()
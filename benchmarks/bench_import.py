@@ -0,0 +1,76 @@
+"""
+Startup cost: the time to import pyintacct and construct a client.
+
+Each measurement runs in a fresh interpreter with `-X importtime`, so module
+caches from earlier runs don't hide anything.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --output before.json
+    python benchmarks/bench_import.py --compare before.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = {
+    'import pyintacct': 'import pyintacct',
+    'import IntacctAPI': 'from pyintacct import IntacctAPI',
+    # The import time plus the first construction, which includes setting up the connection pool.
+    'first IntacctAPI()': ('import sys, time; t = time.perf_counter(); from pyintacct import IntacctAPI; '
+                           "IntacctAPI('sender_id', 'sender_password'); "
+                           'sys.stderr.write("total %d\\n" % ((time.perf_counter() - t) * 1e6))'),
+}
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+def run(code):
+    """Returns the cumulative import time of each top-level module and the total, in microseconds."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            env=env, check=True)
+    modules, total = {}, None
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            modules[match.group(4)] = int(match.group(2))
+        elif line.startswith('total '):
+            total = int(line.split()[1])
+    if total is None:
+        total = sum(modules.get(name, 0) for name in modules if name not in ('site', 'encodings'))
+    return modules, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='the number of slowest modules to list')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare against results written by --output')
+    args = parser.parse_args()
+
+    previous = json.load(open(args.compare)) if args.compare else {}
+    results = {}
+    for name, code in SCENARIOS.items():
+        runs = [run(code) for _ in range(args.repeat)]
+        results[name] = statistics.median(total for _, total in runs) / 1000
+        line = f'{name:<22} {results[name]:8.1f} ms'
+        if name in previous:
+            line += f'  ({previous[name]:.1f} ms before, {previous[name] / results[name]:.2f}x)'
+        print(line)
+
+    modules, _ = run(SCENARIOS['import IntacctAPI'])
+    print('\nslowest top-level imports:')
+    for module, micros in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f'  {module:<30} {micros / 1000:8.1f} ms')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Upload size and client peak memory of a large batched create, with and without
+streamed and compressed request bodies.
+
+    PYTHONPATH=. python benchmarks/bench_upload.py
+
+Requests go to a transport that counts the bytes it receives and discards them,
+so the peak memory is the client's alone.
+"""
+import time
+import tracemalloc
+
+import httpx
+
+from pyintacct import IntacctAPI
+
+RECORDS = 5000
+OPTIONS = {
+    'plain': {},
+    'stream': {'stream_requests': True},
+    'gzip': {'compress_requests': True},
+    'stream + gzip': {'stream_requests': True, 'compress_requests': True},
+}
+RESPONSE = (b'<?xml version="1.0" encoding="UTF-8"?><response><control><status>success</status></control>'
+            b'<operation><authentication><status>success</status></authentication></operation></response>')
+
+
+class CountingTransport(httpx.BaseTransport):
+    def __init__(self):
+        self.received = 0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        for chunk in request.stream:
+            self.received += len(chunk)
+        return httpx.Response(200, content=RESPONSE)
+
+
+def main():
+    objs = [{'CUSTOMER': {'CUSTOMERID': f'C{i:06d}', 'NAME': f'Customer {i}', 'STATUS': 'active',
+                          'DISPLAYCONTACT': {'CONTACTNAME': f'Customer {i}', 'EMAIL1': f'ap{i}@example.com'}}}
+            for i in range(RECORDS)]
+    for name, options in OPTIONS.items():
+        transport = CountingTransport()
+        client = IntacctAPI('sender_id', 'sender_pass', session_id='session', session_expiration=time.time() + 3600,
+                            transport=transport, **options)
+        payload = client.get_payload([client.create_function(obj) for obj in objs])
+        tracemalloc.start()
+        started = time.perf_counter()
+        client.execute(payload, validate=False)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'{name:<14} {transport.received / 1024:9.1f} KB sent  {peak / 2 ** 20:7.2f} MB peak  '
+              f'{elapsed * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Client throughput benchmarks, run offline against the gateway emulator.
+
+    PYTHONPATH=. python benchmarks/suite.py --output results.json
+    PYTHONPATH=. python benchmarks/suite.py --compare results.json
+
+Measures envelope building, encoding a large create request, serialization,
+response parsing and validation, and end-to-end pagination at several page
+sizes; the `model` mode reads only the two fields of a model instead of '*'.
+Pagination timings exclude the time the emulator spends answering, so they
+reflect the client alone.
+Results are written as JSON; with --compare, each metric is printed next to
+the saved value and its relative change.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+from datetime import datetime
+from typing import Callable, Dict
+
+import httpx
+from pydantic import BaseModel
+
+from pyintacct import IntacctAPI
+from pyintacct.emulator import Gateway
+
+# Metrics where a larger value is better; for the rest smaller is better.
+HIGHER_IS_BETTER = ('records_per_sec',)
+
+
+class Balance(BaseModel):
+    CUSTOMERID: str
+    TOTALDUE: str
+
+
+def make_records(n: int):
+    return [{'CUSTOMERID': f'C{i:06}', 'NAME': f'Customer {i} & Sons', 'STATUS': 'active',
+             'TOTALDUE': f'{i * 13.37:.2f}', 'ONHOLD': 'false', 'CURRENCY': 'USD',
+             'DISPLAYCONTACT.EMAIL1': f'customer{i}@example.com', 'WHENCREATED': '01/02/2024 03:04:05'}
+            for i in range(n)]
+
+
+def per_call(func: Callable, number: int) -> float:
+    """Best microseconds per call over three runs."""
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def bench_envelope(client: IntacctAPI, number: int) -> Dict[str, float]:
+    payload = client.read_by_query_payload('CUSTOMER', "STATUS = 'active'", '*', 1000)
+    return {
+        'build_us': per_call(lambda: client.read_by_query_payload('CUSTOMER', "STATUS = 'active'", '*', 1000),
+                             number),
+        'serialize_us': per_call(lambda: client.serialize(payload, 'session'), number),
+        'request_bytes': len(client.serialize(payload, 'session')),
+    }
+
+
+def bench_encode(client: IntacctAPI, lines: int, number: int) -> Dict[str, float]:
+    from bench_encoder import sotransaction
+
+    obj = sotransaction(lines)
+    return {'create_us': per_call(lambda: client.serialize(client.create_payload(obj), 'session'), number),
+            'request_bytes': len(client.serialize(client.create_payload(obj), 'session'))}
+
+
+def bench_parse(client: IntacctAPI, gateway: Gateway, pagesize: int, number: int) -> Dict[str, float]:
+    request = client.serialize(client.read_by_query_payload('CUSTOMER', '', '*', pagesize), client.session_id)
+    response = httpx.Response(200, content=gateway.handle(request)[1])
+    parse_us = per_call(lambda: client.handle_response(response), number)
+    return {'parse_validate_us': parse_us, 'us_per_record': parse_us / pagesize,
+            'response_bytes': len(response.content)}
+
+
+def bench_pagination(client: IntacctAPI, gateway: Gateway, pagesize: int, mode: str) -> Dict[str, float]:
+    kwargs = {'stream': {'stream': True}, 'tuples': {'as_tuples': True}, 'model': {'model': Balance}}.get(mode, {})
+    gateway.reset_stats()
+    started = time.perf_counter()
+    count = sum(1 for _ in client.yield_by_query('CUSTOMER', '', '*', pagesize, **kwargs))
+    elapsed = time.perf_counter() - started - gateway.seconds
+    return {'records_per_sec': count / elapsed, 'requests': gateway.requests,
+            'bytes_per_record': gateway.bytes_sent / count}
+
+
+def run(records: int, pagesizes, number: int) -> Dict[str, Dict[str, float]]:
+    gateway = Gateway({'CUSTOMER': make_records(records)})
+    client = IntacctAPI('sender_id', 'sender_pass', company_id='company', user_id='user', user_password='password',
+                        transport=gateway.transport())
+    client.set_session(client.get_session_id())
+    results = {'envelope': bench_envelope(client, number), 'encode/1000': bench_encode(client, 1000, 10)}
+    for pagesize in pagesizes:
+        results[f'parse/{pagesize}'] = bench_parse(client, gateway, pagesize, max(number // pagesize, 3))
+        for mode in ('nodes', 'stream', 'tuples', 'model'):
+            results[f'paginate/{mode}/{pagesize}'] = bench_pagination(client, gateway, pagesize, mode)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]):
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(name, {}).get(metric)
+            line = f'{name:<24} {metric:<18} {value:14.2f}'
+            if before:
+                change = (value - before) / before * 100
+                better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+                line += f' {before:14.2f} {change:+7.1f}%{"" if abs(change) < 5 or better else "  <-- regression"}'
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=10000, help='records served by the emulator')
+    parser.add_argument('--pagesizes', default='100,1000,2000', help='comma-separated page sizes')
+    parser.add_argument('--number', type=int, default=2000, help='iterations for per-call timings')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare with results saved by an earlier run')
+    args = parser.parse_args(argv)
+
+    results = run(args.records, [int(p) for p in args.pagesizes.split(',')], args.number)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f)['results'])
+    else:
+        compare(results, {})
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'created': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0],
+                       'platform': platform.platform(), 'records': args.records, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
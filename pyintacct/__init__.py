@@ -1,2 +1,58 @@
-from .client import IntacctAPI
-from .exceptions import IntacctException
+import logging
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+# Exported names are imported on first use, so that `import pyintacct` stays
+# cheap for scripts and workers that only need part of the package.
+_EXPORTS = {
+    'IntacctAPI': '.client',
+    'AsyncIntacctAPI': '.async_client',
+    'IntacctException': '.exceptions',
+    'MemorySessionStore': '.sessions',
+    'SessionStore': '.sessions',
+    'SQLiteSessionStore': '.sessions',
+    'AdaptiveLimit': '.retry',
+    'RetryPolicy': '.retry',
+    'TokenBucket': '.retry',
+    'MetadataCache': '.schema',
+    'DeltaSync': '.delta',
+    'MemoryWatermarkStore': '.delta',
+    'SQLiteWatermarkStore': '.delta',
+    'WatermarkStore': '.delta',
+    'Hooks': '.events',
+    'BulkLoad': '.journal',
+    'MemoryWriteJournal': '.journal',
+    'SQLiteWriteJournal': '.journal',
+    'WriteJournal': '.journal',
+    'FanOut': '.fanout',
+    'Tenant': '.fanout',
+}
+
+__all__ = list(_EXPORTS)
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+if TYPE_CHECKING:
+    from .async_client import AsyncIntacctAPI
+    from .client import IntacctAPI
+    from .delta import DeltaSync, MemoryWatermarkStore, SQLiteWatermarkStore, WatermarkStore
+    from .events import Hooks
+    from .exceptions import IntacctException
+    from .fanout import FanOut, Tenant
+    from .journal import BulkLoad, MemoryWriteJournal, SQLiteWriteJournal, WriteJournal
+    from .retry import AdaptiveLimit, RetryPolicy, TokenBucket
+    from .schema import MetadataCache
+    from .sessions import MemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
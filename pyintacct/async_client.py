@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from itertools import islice
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Iterable, List, Optional, Tuple, Type, Union
+
+import httpx
+from httpx import USE_CLIENT_DEFAULT
+from jxmlease import XMLDictNode
+
+from .batch import MAX_FUNCTIONS_PER_REQUEST, FunctionResult, map_results
+from .client import BaseIntacctAPI, RequestBody
+from .decode import record_decoder
+from .events import DOWNLOAD, SERIALIZE, RequestTimer, TraceTimes
+from .exceptions import IntacctException
+from .schema import ObjectSchema, parse_fields
+from .stream import ResponseStreamParser
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from .models.base import API21Object
+    from .query import Filter, QueryPage
+
+
+class AsyncIntacctAPI(BaseIntacctAPI):
+    """
+    An asyncio version of IntacctAPI. At most `max_concurrency` requests are in flight at once,
+    all sharing a single connection pool (and HTTP/2 connection, if h2 is installed).
+    """
+    def __init__(self, *args, max_concurrency: int = 10, timeout: Union[float, httpx.Timeout] = 30,
+                 limits: httpx.Limits = None, transport: httpx.AsyncBaseTransport = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_concurrency = max_concurrency
+        self._http_kwargs = {'timeout': timeout}
+        if limits is not None:
+            self._http_kwargs['limits'] = limits
+        if transport is not None:
+            self._http_kwargs['transport'] = transport
+        # Created on first use so they bind to the running event loop.
+        self._semaphore = None
+        self._session_lock = None
+
+    def _create_http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(headers=self.headers, http2=self.http2_enabled(), **self._http_kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+
+    async def execute(self, payload: XMLDictNode, refresh_session=True, validate=True,
+                      timeout=USE_CLIENT_DEFAULT) -> XMLDictNode:
+        """
+        Sends the request to the Intacct API. See `IntacctAPI.execute`.
+        """
+        timer = self.start_timer(payload)
+        session_id, endpoint = await self._ensure_session() if refresh_session else (None, self.endpoint)
+        if timer is not None:
+            timer.reset()
+        body = RequestBody(self, payload, session_id)
+        if timer is not None:
+            timer.mark(SERIALIZE)
+            timer.info.request_bytes = body.size
+
+        async def attempt():
+            try:
+                async with self._get_semaphore():
+                    r = await self._post(endpoint, body, timeout, timer)
+                    if r.status_code == 415 and body.gzip:
+                        self.compression_rejected(body)
+                        r = await self._post(endpoint, body, timeout, timer)
+                return self.handle_response(r, validate, timer)
+            except httpx.HTTPStatusError as e:
+                raise IntacctException(e)
+
+        try:
+            if self.policy is None:
+                response = await attempt()
+            else:
+                response = await self.policy.call_async(self.function_names(payload), attempt,
+                                                        timer.retry if timer is not None else None)
+        except Exception as e:
+            if timer is not None:
+                timer.finish(e)
+            raise
+        if timer is not None:
+            timer.finish()
+        return response
+
+    async def _post(self, endpoint: str, body: RequestBody, timeout,
+                    timer: Optional[RequestTimer]) -> httpx.Response:
+        if timer is None:
+            return await self.http_client.post(endpoint, content=await body.acontent(), headers=body.headers,
+                                               timeout=timeout)
+        timer.info.attempts += 1
+        trace = TraceTimes()
+        timer.reset()
+        async with self.http_client.stream('POST', endpoint, content=await body.acontent(), headers=body.headers,
+                                           timeout=timeout, extensions={'trace': trace.atrace}) as r:
+            self.mark_response(timer, r, trace, time.perf_counter())
+            await r.aread()
+        timer.info.request_bytes = body.size
+        timer.mark(DOWNLOAD)
+        timer.info.response_bytes = r.num_bytes_downloaded or len(r.content)
+        return r
+
+    async def execute_stream(self, payload: XMLDictNode, parser: ResponseStreamParser, refresh_session=True,
+                             timeout=USE_CLIENT_DEFAULT) -> AsyncIterator[XMLDictNode]:
+        """
+        Sends the request and yields records as they are parsed. See `IntacctAPI.execute_stream`.
+        """
+        timer = self.start_timer(payload)
+        session_id, endpoint = await self._ensure_session() if refresh_session else (None, self.endpoint)
+        if timer is not None:
+            timer.reset()
+        content = self.serialize(payload, session_id)
+        trace = None
+        if timer is not None:
+            timer.mark(SERIALIZE)
+            timer.info.request_bytes = len(content)
+            timer.info.attempts = 1
+            trace = TraceTimes()
+        if self.policy is not None:
+            await self.policy.acquire_async()
+        throttled = False
+        error = r = None
+        try:
+            async with self._get_semaphore():
+                if timer is not None:
+                    timer.reset()
+                async with self.http_client.stream('POST', endpoint, content=content, timeout=timeout,
+                                                   extensions={'trace': trace.atrace} if trace else None) as r:
+                    if timer is not None:
+                        self.mark_response(timer, r, trace, time.perf_counter())
+                    if r.status_code == 429 or 500 <= r.status_code <= 599:
+                        await r.aread()
+                    self.check_status(r)
+                    async for chunk in r.aiter_bytes():
+                        for record in parser.feed(chunk):
+                            yield record
+                    for record in parser.close():
+                        yield record
+        except httpx.HTTPStatusError as e:
+            error = e
+            raise IntacctException(e)
+        except Exception as e:
+            error = e
+            throttled = self.policy is not None and self.policy.is_throttled(e)
+            raise
+        finally:
+            if self.policy is not None:
+                self.policy.limit.release(throttled)
+            if timer is not None:
+                timer.mark(DOWNLOAD)
+                timer.info.records = parser.records
+                timer.info.response_bytes = r.num_bytes_downloaded if r is not None else 0
+                timer.finish(error)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _ensure_session(self) -> Tuple[str, str]:
+        if self.session_expired():
+            if self._session_lock is None:
+                self._session_lock = asyncio.Lock()
+            async with self._session_lock:
+                # Another task may have refreshed the session while we waited.
+                if self.session_expired():
+                    await self._renew_session()
+        return self.session_id, self.endpoint
+
+    async def _renew_session(self):
+        if self.session_store is None:
+            return await self._refresh_session()
+        if self.load_session():
+            return
+        async with self.session_store.alock(self.session_key()):
+            # Another client may have refreshed the session while we waited.
+            if self.load_session():
+                return
+            await self._refresh_session()
+            self.store_session()
+
+    async def _refresh_session(self):
+        started = time.perf_counter()
+        try:
+            self.set_session(await self.get_session_id())
+        except IntacctException as e:
+            self.clear_session()
+            if self.instrumentation is not None:
+                self.instrumentation.session_refresh(time.perf_counter() - started, e)
+            raise e
+        if self.instrumentation is not None:
+            self.instrumentation.session_refresh(time.perf_counter() - started, None)
+
+    async def get_session_id(self) -> Tuple[str, str, str]:
+        response = await self.execute(self.session_payload(), refresh_session=False)
+        return self.parse_session(response)
+
+    async def read_by_query(self, obj: str, query: str, fields: str = '*', pagesize: int = 100,
+                            docparid: str = '', prefetch: int = 0, stream: bool = False, model: Type[BaseModel] = None,
+                            as_tuples: bool = False, as_dicts: bool = False) -> list:
+        return [record async for record in self.yield_by_query(obj, query, fields, pagesize, docparid, prefetch,
+                                                               stream, model, as_tuples, as_dicts)]
+
+    async def yield_by_query(self, obj: str, query: str, fields: str = '*', pagesize: int = 100,
+                             docparid: str = '', prefetch: int = 0, stream: bool = False,
+                             model: Type[BaseModel] = None, as_tuples: bool = False,
+                             as_dicts: bool = False) -> AsyncIterator[Any]:
+        """
+        Yields the records matching the query. See `IntacctAPI.yield_by_query`.
+
+        :param prefetch: Number of pages to fetch in a background task while the caller iterates.
+        :param stream: If True, records are yielded while each page downloads.
+        :param model: Decode each record directly into this pydantic model.
+        :param as_tuples: Decode each record into a tuple of values ordered like `fields`.
+        :param as_dicts: Decode each record into a dict.
+        """
+        fields = await self.project(obj, fields, model)
+        decode = record_decoder(fields, model, as_tuples, as_dicts)
+        if stream or decode is not None:
+            records = self.yield_streamed(obj, query, fields, pagesize, docparid, decode)
+            if prefetch:
+                from .prefetch import aprefetched
+                records = aprefetched(records, prefetch * int(pagesize))
+            async for record in records:
+                yield record
+            return
+        pages = self.yield_pages(obj, query, fields, pagesize, docparid)
+        if prefetch:
+            from .prefetch import aprefetched
+            pages = aprefetched(pages, prefetch)
+        async for data in pages:
+            for record in data.find_nodes_with_tag(obj.lower()):
+                yield record
+
+    async def project(self, obj: str, fields: Union[str, Iterable[str]] = '*',
+                      model: Type[BaseModel] = None) -> str:
+        """Resolves the fields to read. See `IntacctAPI.project`."""
+        schema = await self.describe(obj) if self.check_fields and self.projects(fields, model) else None
+        return self.projection(obj, fields, model, schema)
+
+    async def yield_pages(self, obj: str, query: str, fields: str = '*', pagesize: int = 100,
+                          docparid: str = '') -> AsyncIterator[XMLDictNode]:
+        data, remaining, result_id = self.parse_page(
+            await self.execute(self.read_by_query_payload(obj, query, fields, pagesize, docparid)))
+        yield data
+        while int(remaining) > 0:
+            data, remaining, result_id = await self.read_more(result_id)
+            yield data
+
+    async def yield_streamed(self, obj: str, query: str, fields: str = '*', pagesize: int = 100,
+                             docparid: str = '', decode: Callable = None) -> AsyncIterator[Any]:
+        parser = ResponseStreamParser(obj.lower(), decode)
+        async for record in self.execute_stream(self.read_by_query_payload(obj, query, fields, pagesize, docparid),
+                                                parser):
+            yield record
+        while int(parser.remaining or 0) > 0:
+            result_id = parser.result_id
+            parser = ResponseStreamParser(obj.lower(), decode)
+            async for record in self.execute_stream(self.read_more_payload(result_id), parser):
+                yield record
+
+    async def query_page(self, obj: str, fields: Union[str, Iterable[str]], filter: Filter = None,
+                         orderby: Union[str, Iterable[str]] = None, pagesize: int = 1000, offset: int = 0,
+                         case_insensitive: bool = False) -> QueryPage:
+        from .query import parse_query_page
+
+        response = await self.execute(self.query_payload(obj, fields, filter, orderby, pagesize, offset,
+                                                         case_insensitive))
+        return parse_query_page(response, obj)
+
+    async def query(self, obj: str, fields: Union[str, Iterable[str]], filter: Filter = None,
+                    orderby: Union[str, Iterable[str]] = None, pagesize: int = 1000, max_workers: int = None,
+                    case_insensitive: bool = False) -> list:
+        return [record async for record in self.yield_query(obj, fields, filter, orderby, pagesize, max_workers,
+                                                            True, case_insensitive)]
+
+    async def yield_query(self, obj: str, fields: Union[str, Iterable[str]], filter: Filter = None,
+                          orderby: Union[str, Iterable[str]] = None, pagesize: int = 1000, max_workers: int = None,
+                          ordered: bool = False, case_insensitive: bool = False) -> AsyncIterator[XMLDictNode]:
+        """
+        Yields the records matching `filter`, requesting pages by offset concurrently.
+        See `IntacctAPI.yield_query`.
+
+        :param max_workers: Number of pages requested at once. Defaults to `max_concurrency`.
+        """
+        orderby = orderby or 'RECORDNO'
+        first = await self.query_page(obj, fields, filter, orderby, pagesize, 0, case_insensitive)
+        for record in first.records:
+            yield record
+        size = len(first.records)
+        offsets = iter(range(size, first.total, size) if size else ())
+        window = max_workers or self.max_concurrency
+
+        def fetch(offset):
+            return asyncio.ensure_future(self.query_page(obj, fields, filter, orderby, pagesize, offset,
+                                                         case_insensitive))
+
+        pending = deque(fetch(offset) for offset in islice(offsets, window))
+        try:
+            while pending:
+                if ordered:
+                    task = pending.popleft()
+                    await asyncio.wait([task])
+                else:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    task = next(t for t in pending if t in done)
+                    pending.remove(task)
+                page = task.result()
+                pending.extend(fetch(offset) for offset in islice(offsets, 1))
+                for record in page.records:
+                    yield record
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def read_more(self, result_id):
+        return self.parse_page(await self.execute(self.read_more_payload(result_id)))
+
+    async def inspect(self, obj: str = '*', detail: bool = False, name: str = None):
+        return await self.execute(self.inspect_payload(obj, detail, name))
+
+    async def describe(self, obj: str, detail: bool = True, refresh: bool = False) -> ObjectSchema:
+        """
+        Returns the parsed field definitions of an object. See `IntacctAPI.describe`.
+        """
+        key = self.metadata_key(obj, detail)
+        schema = None if refresh else self.metadata_cache.get(key)
+        if schema is None:
+            schema = ObjectSchema(obj.upper(), parse_fields(await self.inspect(obj, detail)))
+            self.metadata_cache.set(key, schema)
+        return schema
+
+    async def create(self, obj):
+        return await self.execute(self.create_payload(obj))
+
+    async def update(self, obj: Union[dict, BaseModel]):
+        return await self.execute(self.update_payload(obj))
+
+    async def create_many(self, objs: Iterable, transaction: bool = False,
+                          batch_size: int = MAX_FUNCTIONS_PER_REQUEST) -> List[FunctionResult]:
+        """
+        Creates many objects. See `IntacctAPI.create_many`.
+        """
+        objs = list(objs)
+        return await self.execute_batch([self.create_function(obj) for obj in objs], transaction, batch_size,
+                                        items=objs)
+
+    async def update_many(self, objs: Iterable, transaction: bool = False,
+                          batch_size: int = MAX_FUNCTIONS_PER_REQUEST) -> List[FunctionResult]:
+        """
+        Updates many objects. See `IntacctAPI.create_many`.
+        """
+        objs = list(objs)
+        return await self.execute_batch([self.update_function(obj) for obj in objs], transaction, batch_size,
+                                        items=objs)
+
+    async def execute_batch(self, functions: Iterable[XMLDictNode], transaction: bool = False,
+                            batch_size: int = MAX_FUNCTIONS_PER_REQUEST,
+                            items: List[Any] = None) -> List[FunctionResult]:
+        """
+        Sends function nodes in as few requests as possible. See `IntacctAPI.execute_batch`.
+        The requests are sent concurrently, subject to `max_concurrency`.
+        """
+        batches = list(self.batch_payloads(functions, transaction, batch_size, items))
+        tasks = [asyncio.ensure_future(self.execute(payload, validate=False)) for payload, _, _ in batches]
+        try:
+            responses = await asyncio.gather(*tasks)
+        except BaseException:
+            # Don't leave the other batches running once one has failed.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        results = []
+        for response, (_, controlids, chunk_items) in zip(responses, batches):
+            results.extend(map_results(response, controlids, chunk_items))
+        return results
+
+    async def delete(self, obj: Union[str, type(API21Object)], keys: List[str]):
+        if self.is_api21(obj):
+            for result in await self.execute_batch(self.delete_v21_functions(obj, keys), items=keys):
+                result.raise_for_status()
+            return
+        return await self.execute(self.delete_payload(obj, keys))
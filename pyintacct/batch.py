@@ -0,0 +1,92 @@
+from typing import Any, Iterable, Iterator, List, Optional
+
+from jxmlease import XMLDictNode
+
+from .exceptions import IntacctFunctionError
+
+# The gateway rejects requests containing more functions than this.
+MAX_FUNCTIONS_PER_REQUEST = 100
+
+
+def format_errors(node: XMLDictNode) -> str:
+    """Joins the descriptions of every error node below `node` into a message."""
+    msg = ''
+    for error in node.find_nodes_with_tag('error'):
+        msg += f'{error.get("description")}{error.get("description2")}\n'
+    return msg
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class FunctionResult(object):
+    """The outcome of a single function from a multi-function request."""
+    __slots__ = ('controlid', 'function', 'status', 'node', 'item')
+
+    def __init__(self, controlid: str, function: Optional[str], status: str,
+                 node: Optional[XMLDictNode] = None, item: Any = None):
+        self.controlid = controlid
+        self.function = function
+        self.status = status
+        self.node = node
+        self.item = item
+
+    def __repr__(self):
+        return f'FunctionResult(controlid={self.controlid!r}, function={self.function!r}, status={self.status!r})'
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'success'
+
+    @property
+    def data(self) -> Optional[XMLDictNode]:
+        if self.node is None:
+            return None
+        return self.node.get('data')
+
+    @property
+    def error(self) -> Optional[str]:
+        if self.ok:
+            return None
+        if self.node is None:
+            return f'No result was returned for function {self.controlid}.'
+        return format_errors(self.node) or f'Function {self.controlid} returned status {self.status}.'
+
+    @property
+    def key(self) -> Optional[str]:
+        """The key of the created or updated record, if the gateway returned one."""
+        if self.node is None:
+            return None
+        for tag in ('RECORDNO', 'key'):
+            for node in self.node.find_nodes_with_tag(tag):
+                return str(node)
+        return None
+
+    def raise_for_status(self) -> 'FunctionResult':
+        if not self.ok:
+            raise IntacctFunctionError(self.error, result=self)
+        return self
+
+
+def map_results(response: XMLDictNode, controlids: List[str], items: List[Any]) -> List[FunctionResult]:
+    """Pairs every `<result>` in the response with the function that produced it, in request order."""
+    by_controlid = {}
+    for node in response.find_nodes_with_tag('result'):
+        by_controlid[str(node.get('controlid', ''))] = node
+    results = []
+    for controlid, item in zip(controlids, items):
+        node = by_controlid.get(controlid)
+        if node is None:
+            results.append(FunctionResult(controlid, None, 'missing', item=item))
+        else:
+            results.append(FunctionResult(controlid, str(node.get('function', '')), str(node.get('status', '')),
+                                          node=node, item=item))
+    return results
@@ -0,0 +1,226 @@
+"""
+Bulk loading from files.
+
+Rows are read from CSV or JSONL one at a time, grouped into batches, and each
+batch is validated into a model, encoded and sent as one multi-function
+request by a pool of worker threads:
+
+    rows = read_rows('invoices.jsonl')
+    write_results('results.csv', bulk_load(client, rows, model=ARInvoice))
+
+At most `max_workers * 2` batches are held at once, so memory depends on the
+batch size and the number of workers, not on the size of the input. Results
+are yielded in input order. Pace requests with the client's RetryPolicy.
+A request that fails outright, e.g. with a server error, fails the rows of its
+batch and the load carries on.
+
+In CSV input, dotted column names such as `shipto.contactname` become nested
+fields and empty cells are left out; use JSONL for line items and other lists.
+"""
+import csv
+import json
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Type
+
+import httpx
+from pydantic import BaseModel, ValidationError
+
+from .batch import MAX_FUNCTIONS_PER_REQUEST, chunked
+from .exceptions import IntacctException
+
+SUCCESS = 'success'
+FAILURE = 'failure'
+INVALID = 'invalid'
+
+RESULT_FIELDS = ('line', 'status', 'key', 'error')
+
+
+class LoadResult(NamedTuple):
+    """The outcome of one input row. `line` counts data rows from 1."""
+    line: int
+    status: str
+    key: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == SUCCESS
+
+
+def file_format(path: str, format: str = None) -> str:
+    """Returns `format`, or 'csv' or 'jsonl' according to the extension of `path`."""
+    if format:
+        return format
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def nest(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Turns dotted keys into nested dicts, dropping empty values."""
+    nested: Dict[str, Any] = {}
+    for column, value in row.items():
+        if value is None or value == '':
+            continue
+        *parents, name = column.split('.')
+        node = nested
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[name] = value
+    return nested
+
+
+def read_rows(path: str, format: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the rows of a CSV or JSONL file as dicts. '-' reads standard input.
+
+    :param format: 'csv' or 'jsonl'. By default it is chosen by extension, and standard input is JSONL.
+    """
+    format = file_format(path, format)
+    f = sys.stdin if path == '-' else open(path, newline='' if format == 'csv' else None, encoding='utf-8')
+    try:
+        if format == 'csv':
+            for row in csv.DictReader(f):
+                yield nest(row)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def write_results(path: str, results: Iterable[LoadResult], format: str = None) -> Dict[str, int]:
+    """
+    Writes results to a CSV or JSONL file as they arrive. '-' writes to standard output.
+
+    :return: The number of results in each status.
+    """
+    format = file_format(path, format)
+    counts: Dict[str, int] = {}
+    f = sys.stdout if path == '-' else open(path, 'w', newline='' if format == 'csv' else None, encoding='utf-8')
+    try:
+        writer = csv.writer(f) if format == 'csv' else None
+        if writer:
+            writer.writerow(RESULT_FIELDS)
+        for result in results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+            if writer:
+                writer.writerow(['' if value is None else value for value in result])
+            else:
+                f.write(json.dumps(result._asdict()) + '\n')
+    finally:
+        if f is sys.stdout:
+            f.flush()
+        else:
+            f.close()
+    return counts
+
+
+def resolve_model(name: str) -> Type[BaseModel]:
+    """
+    Finds a model by name: either a class in pyintacct.models, e.g. 'ARInvoice', or 'package.module:Class'.
+    """
+    if ':' in name:
+        module, attr = name.split(':', 1)
+        return getattr(import_module(module), attr)
+    for module in ('accounts_receivable', 'company', 'order_entry', 'purchasing'):
+        model = getattr(import_module(f'.models.{module}', __package__), name, None)
+        if isinstance(model, type) and issubclass(model, BaseModel):
+            return model
+    raise ValueError(f'Unknown model {name}. Use a pyintacct model name or package.module:Class.')
+
+
+def validation_message(error: ValidationError) -> str:
+    return '; '.join(f'{".".join(str(part) for part in e["loc"])}: {e["msg"]}' for e in error.errors())
+
+
+class BulkLoader(object):
+    """
+    Validates, encodes and submits rows concurrently. See the module documentation.
+
+    :param client: An IntacctAPI. It is shared by the worker threads.
+    :param model: A pydantic model each row is validated into, e.g. ARInvoice or POTransaction.
+    :param obj: Without a model, the API 3.0 object each row is sent as, e.g. 'CUSTOMER'.
+    :param operation: 'create' or 'update'.
+    :param transaction: If True, each request is all-or-nothing.
+    :param batch_size: Maximum number of functions per request.
+    :param max_workers: Number of batches validated and sent at once.
+    """
+    def __init__(self, client, model: Type[BaseModel] = None, obj: str = None, operation: str = 'create',
+                 transaction: bool = False, batch_size: int = MAX_FUNCTIONS_PER_REQUEST, max_workers: int = 4):
+        if (model is None) == (obj is None):
+            raise ValueError('Pass either a model or an object name.')
+        if operation not in ('create', 'update'):
+            raise ValueError(f'Unsupported operation {operation}.')
+        self.client = client
+        self.model = model
+        self.obj = obj
+        self.operation = operation
+        self.transaction = transaction
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def prepare(self, row: Dict[str, Any]):
+        if self.model is not None:
+            return self.model.model_validate(row)
+        return {self.obj: row}
+
+    def load(self, rows: Iterable[Dict[str, Any]]) -> Iterator[LoadResult]:
+        """Yields a LoadResult for every row, in input order."""
+        batches = chunked(enumerate(rows, 1), self.batch_size)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pyintacct-load')
+        window = deque()
+        try:
+            window.extend(executor.submit(self.submit, batch)
+                          for batch in islice(batches, self.max_workers * 2))
+            while window:
+                results = window.popleft().result()
+                for batch in islice(batches, 1):
+                    window.append(executor.submit(self.submit, batch))
+                yield from results
+        finally:
+            for future in window:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def submit(self, batch: List[tuple]) -> List[LoadResult]:
+        results: Dict[int, LoadResult] = {}
+        functions, items = [], []
+        make = self.client.create_function if self.operation == 'create' else self.client.update_function
+        for line, row in batch:
+            try:
+                functions.append(make(self.prepare(row)))
+            except ValidationError as e:
+                results[line] = LoadResult(line, INVALID, error=validation_message(e))
+                continue
+            except (TypeError, ValueError) as e:
+                results[line] = LoadResult(line, INVALID, error=str(e))
+                continue
+            items.append(line)
+        if functions:
+            try:
+                batch_results = self.client.execute_batch(functions, self.transaction, self.batch_size, items=items)
+            except (IntacctException, httpx.HTTPError) as e:
+                # The other batches carry on. Whether the gateway processed this one is unknown.
+                error = str(e).strip() or type(e).__name__
+                batch_results = []
+                for line in items:
+                    results[line] = LoadResult(line, FAILURE, error=error)
+            for result in batch_results:
+                if result.ok:
+                    results[result.item] = LoadResult(result.item, SUCCESS, key=result.key)
+                else:
+                    results[result.item] = LoadResult(result.item, FAILURE, error=result.error.strip())
+        return [results[line] for line, _ in batch]
+
+
+def bulk_load(client, rows: Iterable[Dict[str, Any]], model: Type[BaseModel] = None, obj: str = None,
+              operation: str = 'create', transaction: bool = False, batch_size: int = MAX_FUNCTIONS_PER_REQUEST,
+              max_workers: int = 4) -> Iterator[LoadResult]:
+    """Creates or updates an object for every row. See BulkLoader."""
+    loader = BulkLoader(client, model, obj, operation, transaction, batch_size, max_workers)
+    return loader.load(rows)
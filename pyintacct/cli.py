@@ -0,0 +1,128 @@
+"""
+The `pyintacct` command.
+
+    pyintacct load invoices.jsonl --model ARInvoice --output results.csv --workers 8 --rate 5
+    pyintacct extract ARINVOICE --query "STATE = 'Posted'" --fields RECORDNO,TOTALDUE --output invoices.parquet
+
+Credentials are read from the environment: INTACCT_SENDER_ID, INTACCT_SENDER_PASSWORD,
+INTACCT_COMPANY_ID, INTACCT_USER_ID and INTACCT_USER_PASSWORD, and optionally
+INTACCT_ENTITY_ID and INTACCT_ENDPOINT.
+"""
+import argparse
+import os
+import sys
+from typing import List
+
+ENVIRONMENT = {
+    'sender_id': 'INTACCT_SENDER_ID',
+    'sender_password': 'INTACCT_SENDER_PASSWORD',
+    'company_id': 'INTACCT_COMPANY_ID',
+    'entity_id': 'INTACCT_ENTITY_ID',
+    'user_id': 'INTACCT_USER_ID',
+    'user_password': 'INTACCT_USER_PASSWORD',
+    'endpoint': 'INTACCT_ENDPOINT',
+}
+
+
+def client_from_environment(args: argparse.Namespace, **kwargs):
+    """Creates an IntacctAPI from environment variables and the common command line options."""
+    import httpx
+
+    from .client import IntacctAPI
+    from .retry import RetryPolicy
+
+    credentials = {name: os.environ[variable] for name, variable in ENVIRONMENT.items() if os.environ.get(variable)}
+    missing = [ENVIRONMENT[name] for name in ('sender_id', 'sender_password', 'company_id', 'user_id',
+                                              'user_password') if name not in credentials]
+    if missing:
+        raise SystemExit(f'pyintacct: set {", ".join(missing)}')
+    policy = RetryPolicy(rate=args.rate, burst=max(1, int(args.rate))) if args.rate else None
+    workers = getattr(args, 'workers', None)
+    if workers:
+        kwargs['limits'] = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+    return IntacctAPI(**credentials, policy=policy, timeout=args.timeout, **kwargs)
+
+
+def add_common_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--rate', type=float, help='maximum requests per second')
+    parser.add_argument('--timeout', type=float, default=60, help='request timeout in seconds (default 60)')
+
+
+def load(args: argparse.Namespace) -> int:
+    from .bulk import SUCCESS, bulk_load, read_rows, resolve_model, write_results
+
+    model = resolve_model(args.model) if args.model else None
+    client = client_from_environment(args, stream_requests=args.compress, compress_requests=args.compress)
+    rows = read_rows(args.input, args.input_format)
+    results = bulk_load(client, rows, model=model, obj=args.object, operation=args.operation,
+                        transaction=args.transaction, batch_size=args.batch_size, max_workers=args.workers)
+    counts = write_results(args.output, results, args.output_format)
+    print(', '.join(f'{count} {status}' for status, count in sorted(counts.items())) or 'no rows',
+          file=sys.stderr)
+    return 0 if set(counts) <= {SUCCESS} else 1
+
+
+def report(stats):
+    print(f'{stats.rows} rows in {stats.seconds:.1f}s, {stats.rows_per_second:.0f} rows/s, '
+          f'{stats.bytes / 2 ** 20:.1f} MB written', file=sys.stderr)
+
+
+def extract(args: argparse.Namespace) -> int:
+    from .extract import extract as extract_to_file
+
+    client = client_from_environment(args)
+    stats = extract_to_file(client, args.object, args.output, args.query, args.fields, args.format,
+                            args.compression, args.pagesize, args.prefetch, args.batch_rows,
+                            progress=None if args.quiet else report)
+    if not args.quiet:
+        report(stats)
+    return 0
+
+
+def parser() -> argparse.ArgumentParser:
+    root = argparse.ArgumentParser(prog='pyintacct', description='Sage Intacct command line tools.')
+    commands = root.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('load', help='create or update records from a CSV or JSONL file',
+                            description='Creates or updates a record for every row of a CSV or JSONL file and '
+                                        'writes the key or error of each row to the output.')
+    p.add_argument('input', help="CSV or JSONL file, or '-' for JSONL on standard input")
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument('--model', help="model to validate rows with, e.g. ARInvoice or 'package.module:Class'")
+    target.add_argument('--object', help='API 3.0 object to send rows as, e.g. CUSTOMER')
+    p.add_argument('--operation', choices=('create', 'update'), default='create')
+    p.add_argument('--output', default='-', help="results file, CSV or JSONL (default '-', standard output)")
+    p.add_argument('--input-format', choices=('csv', 'jsonl'), help='default: by file extension')
+    p.add_argument('--output-format', choices=('csv', 'jsonl'), help='default: by file extension')
+    p.add_argument('--batch-size', type=int, default=100, help='functions per request (default 100)')
+    p.add_argument('--transaction', action='store_true', help='make each request all-or-nothing')
+    p.add_argument('--compress', action='store_true', help='stream and gzip request bodies')
+    p.add_argument('--workers', type=int, default=4, help='requests in flight at once (default 4)')
+    add_common_arguments(p)
+    p.set_defaults(run=load)
+
+    p = commands.add_parser('extract', help='write the records of an object to a JSONL, CSV or Parquet file',
+                            description='Streams the records matching a query to a file, page by page.')
+    p.add_argument('object', help='object to read, e.g. ARINVOICE')
+    p.add_argument('--query', default='', help="readByQuery filter, e.g. \"STATE = 'Posted'\"")
+    p.add_argument('--fields', default='*', help='comma separated fields (default all)')
+    p.add_argument('--output', default='-', help="output file (default '-', standard output)")
+    p.add_argument('--format', choices=('jsonl', 'csv', 'parquet'), help='default: by file extension')
+    p.add_argument('--compression', help="'gzip' for JSONL and CSV; a Parquet codec such as snappy or zstd")
+    p.add_argument('--pagesize', type=int, default=1000, help='records per request (default 1000)')
+    p.add_argument('--prefetch', type=int, default=2, help='pages fetched ahead (default 2)')
+    p.add_argument('--batch-rows', type=int, default=10000,
+                   help='rows per Parquet row group, or between flushes (default 10000)')
+    p.add_argument('--quiet', action='store_true', help='do not report progress')
+    add_common_arguments(p)
+    p.set_defaults(run=extract)
+    return root
+
+
+def main(argv: List[str] = None) -> int:
+    args = parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
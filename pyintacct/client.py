@@ -1,17 +1,45 @@
+from __future__ import annotations
+
+import gzip
 import logging
+import threading
 import time
 from copy import deepcopy
-from typing import List, Tuple, Union
+from functools import lru_cache
+from typing import (TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence,
+                    Tuple, Type, Union)
 from uuid import uuid4
 
 import httpx
+from httpx import USE_CLIENT_DEFAULT
 from jxmlease import parse, XMLDictNode, XMLCDATANode
-from pydantic import BaseModel
 
-from .exceptions import IntacctException, IntacctServerError
-from .models.base import API21Object
+from .batch import MAX_FUNCTIONS_PER_REQUEST, FunctionResult, chunked, format_errors, map_results
+from .decode import model_fields, record_decoder
+from .envelope import Envelope, Request, gzip_chunks
+from .events import (DOWNLOAD, FIRST_BYTE, PARSE, SEND, SERIALIZE, VALIDATE, Hooks, Instrumentation,
+                     RequestInfo, RequestTimer, TraceTimes, record_count)
+from .exceptions import (DUPLICATE_REQUEST, IntacctDuplicateRequestError, IntacctException, IntacctRateLimitError,
+                         IntacctServerError)
+from .schema import MetadataCache, ObjectSchema, parse_fields
+from .retry import RetryPolicy
+from .sessions import Session, SessionStore
+from .stream import ResponseStreamParser
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from .columnar import RecordBatch
+    from .models.base import API21Object
+    from .query import Filter, QueryPage
+
+logger = logging.getLogger(__name__)
 
-logging.basicConfig(level=logging.ERROR, format='%(asctime)s:%(levelname)s:%(message)s')
+# Request bodies smaller than this are sent uncompressed even when compression is enabled.
+COMPRESS_MIN_BYTES = 1024
+
+# Reading fields='*' from an object with more fields than this logs a warning.
+WIDE_OBJECT_FIELDS = 40
 
 BASE_XML = """<?xml version="1.0" encoding="UTF-8"?>
 <request>
@@ -31,7 +59,89 @@ BASE_XML = """<?xml version="1.0" encoding="UTF-8"?>
 """
 
 
-class IntacctAPI(object):
+@lru_cache(maxsize=None)
+def base_xml() -> XMLDictNode:
+    """The request template, parsed once per process. Copy it before modifying it."""
+    return parse(BASE_XML)
+
+
+@lru_cache(maxsize=None)
+def accepted_encodings() -> str:
+    """The response content codings httpx can decode: gzip and deflate, and br when brotli is installed."""
+    from importlib.util import find_spec
+
+    encodings = ['gzip', 'deflate']
+    if find_spec('brotli') or find_spec('brotlicffi'):
+        encodings.append('br')
+    return ', '.join(encodings)
+
+
+@lru_cache(maxsize=None)
+def h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class RequestBody(object):
+    """
+    The body of a request sent by `execute`. It is rendered once and resent as-is
+    on retries, unless it is streamed: streamed bodies are rendered again, chunk
+    by chunk, for each attempt, so the whole document is never held in memory.
+    Either way it is gzipped if the client compresses requests.
+    """
+    __slots__ = ('client', 'payload', 'session_id', 'stream', 'gzip', 'data', 'size')
+
+    def __init__(self, client: BaseIntacctAPI, payload: Union[Request, XMLDictNode], session_id: Optional[str]):
+        self.client = client
+        self.payload = payload
+        self.session_id = session_id
+        self.stream = client.stream_requests and isinstance(payload, Request)
+        self.data = None if self.stream else client.serialize(payload, session_id)
+        self.gzip = client.compress_requests and (self.stream or len(self.data) >= COMPRESS_MIN_BYTES)
+        # The number of bytes sent by the last attempt, or to be sent when not streamed.
+        self.size = 0 if self.stream else len(self.data)
+
+    @property
+    def headers(self) -> Optional[Dict[str, str]]:
+        return {'content-encoding': 'gzip'} if self.gzip else None
+
+    def content(self) -> Union[bytes, Iterator[bytes]]:
+        """The body to send for one attempt."""
+        if not self.stream:
+            if not self.gzip:
+                return self.data
+            data = gzip.compress(self.data, 6)
+            self.size = len(data)
+            return data
+        self.size = 0
+        chunks = self.client.envelope.chunks(self.payload, self.session_id)
+        return self._count(gzip_chunks(chunks) if self.gzip else chunks)
+
+    async def acontent(self) -> Union[bytes, AsyncIterator[bytes]]:
+        content = self.content()
+        if isinstance(content, bytes):
+            return content
+        return self._aiter(content)
+
+    def _count(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.size += len(chunk)
+            yield chunk
+
+    @staticmethod
+    async def _aiter(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+        for chunk in chunks:
+            yield chunk
+
+
+class BaseIntacctAPI(object):
+    """
+    Request building and response handling shared by the synchronous and asynchronous clients.
+    Subclasses only implement the transport.
+    """
     def __init__(self,
                  sender_id: str = None,
                  sender_password: str = None,
@@ -41,7 +151,15 @@ class IntacctAPI(object):
                  user_password: str = None,
                  session_id: str = None,
                  session_expiration: int = 0,
-                 endpoint: str = 'https://api.intacct.com/ia/xml/xmlgw.phtml'):
+                 endpoint: str = 'https://api.intacct.com/ia/xml/xmlgw.phtml',
+                 session_store: SessionStore = None,
+                 policy: RetryPolicy = None,
+                 metadata_cache: MetadataCache = None,
+                 hooks: Sequence[Hooks] = None,
+                 stream_requests: bool = False,
+                 compress_requests: bool = False,
+                 accept_encoding: str = None,
+                 check_fields: bool = False):
         self.sender_id = sender_id
         self.sender_password = sender_password
         self.company_id = company_id
@@ -51,71 +169,203 @@ class IntacctAPI(object):
         self.session_id = session_id
         self.session_expiration = session_expiration
         self.endpoint = endpoint
+        self.session_store = session_store
+        self.policy = policy
+        self.metadata_cache = metadata_cache if metadata_cache is not None else MetadataCache()
+        self.instrumentation = Instrumentation(hooks) if hooks else None
+        self.stream_requests = stream_requests
+        self.compress_requests = compress_requests
+        self.check_fields = check_fields
+        self._wide_objects_warned = set()
         self.headers = {'content-type': 'application/xml',
-                        'accept-encoding': '*',
+                        'accept-encoding': accept_encoding or accepted_encodings(),
                         'user-agent': 'pyintacct-0.2.0'}
-        # Auto-detect http2 is available
-        http2_enabled = False
-        try:
-            import h2
-            http2_enabled = True
-        except ImportError:
-            pass
-        self.http_client = httpx.Client(headers=self.headers, timeout=30, http2=http2_enabled)
-        self.basexml = parse(BASE_XML)
-        self.basexml['request']['control'].update(XMLDictNode({
+        self.control = {
             'senderid': self.sender_id,
             'password': self.sender_password,
-            'controlid': uuid4(),
+            'controlid': str(uuid4()),
             'uniqueid': 'false',
             'dtdversion': '3.0',
             'includewhitespace': 'true',
-        }))
+        }
+        self.envelope = Envelope(XMLDictNode(self.control, tag='control'))
+        self._basexml = None
+        self._http_client = None
+        self._http_client_lock = threading.Lock()
+
+    @property
+    def basexml(self) -> XMLDictNode:
+        """The request template with this client's control block, for building jxmlease request trees."""
+        if self._basexml is None:
+            basexml = deepcopy(base_xml())
+            basexml['request']['control'].update(XMLDictNode(self.control))
+            self._basexml = basexml
+        return self._basexml
+
+    @property
+    def http_client(self):
+        """The httpx client, created on first use so that constructing an API object stays cheap."""
+        if self._http_client is None:
+            with self._http_client_lock:
+                if self._http_client is None:
+                    self._http_client = self._create_http_client()
+        return self._http_client
+
+    @http_client.setter
+    def http_client(self, client):
+        self._http_client = client
+
+    def _create_http_client(self):
+        raise NotImplementedError
+
+    @staticmethod
+    def http2_enabled() -> bool:
+        """Auto-detect whether http2 is available. The check is made once per process."""
+        return h2_available()
+
+    def session_expired(self) -> bool:
+        return self.session_expiration < time.time()
 
-    def execute(self, payload: XMLDictNode, refresh_session=True) -> XMLDictNode:
+    def set_session(self, session: Tuple[str, str, str]):
+        """Stores the session id, endpoint and timeout returned by getAPISession."""
+        self.session_id, self.endpoint, timestamp = session
+        self.session_expiration = time.mktime(time.strptime(timestamp, '%Y-%m-%dT%H:%M:%S+00:00'))
+
+    def clear_session(self):
+        self.session_id = None
+        self.session_expiration = 0
+
+    def session_key(self) -> str:
+        """The key identifying this client's session in a SessionStore."""
+        return f'{self.sender_id}|{self.company_id}|{self.entity_id or ""}|{self.user_id}'
+
+    def load_session(self) -> bool:
+        """Adopts the session from the session store, if it holds one which has not expired."""
+        session = self.session_store.get(self.session_key())
+        if session is None or session.expired:
+            return False
+        self.session_id, self.endpoint, self.session_expiration = session
+        return True
+
+    def store_session(self):
+        self.session_store.set(self.session_key(), Session(self.session_id, self.endpoint, self.session_expiration))
+
+    def serialize(self, payload: Union[Request, XMLDictNode], session_id: str = None) -> bytes:
         """
-        Sends the request to the Intacct API. Automatically refreshes session token after one hour.
+        Renders a payload into the request body.
 
-        :param payload: A jxmlease structure containing the full payload except authentication.
-        :param refresh_session: An override flag to allow bypassing session reuse.
-        :return: An XMLDictNode.
+        :param payload: A Request, or a complete jxmlease request tree.
+        :param session_id: The session id to authenticate with, if any.
         """
-        if self.session_expiration < time.time() and refresh_session:
-            try:
-                self.session_id, self.endpoint, timestamp = self.get_session_id()
-                self.session_expiration = time.mktime(time.strptime(timestamp, '%Y-%m-%dT%H:%M:%S+00:00'))
-            except IntacctException as e:
-                self.session_id = None
-                self.session_expiration = 0
-                raise e
-        if refresh_session:
+        if isinstance(payload, Request):
+            return self.envelope.render(payload, session_id)
+        if session_id is not None:
             payload['request']['operation']['authentication'] \
-                .add_node(tag='sessionid', new_node=XMLCDATANode(self.session_id))
-        try:
-            payload.standardize()
-            r = self.http_client.post(self.endpoint, content=payload.emit_xml().encode('utf-8'))
-            if 500 <= r.status_code <= 599:
-                # If a 500 error is encountered we raise IntacctServerError. The user may decide whether to retry.
-                raise IntacctServerError(r.text)
-            response = parse(r.text)
-            if self.validate_response(response):
-                return response
-            else:
-                raise IntacctException('Intacct API call failed.\n' + r.text)
-        except httpx.HTTPStatusError as e:
-            raise IntacctException(e)
+                .add_node(tag='sessionid', new_node=XMLCDATANode(session_id))
+        payload.standardize()
+        return payload.emit_xml().encode('utf-8')
 
-    def get_function_base(self):
+    def compression_rejected(self, body: RequestBody):
+        """Called when the gateway refuses a gzipped request: it is resent, and later requests sent, uncompressed."""
+        logger.warning('The gateway does not accept compressed requests; disabling request compression.')
+        self.compress_requests = False
+        body.gzip = False
+
+    def handle_response(self, r: httpx.Response, validate=True, timer: RequestTimer = None) -> XMLDictNode:
         """
-        Internal function to get a prepared copy of the XML request and the function node.
-        :return: Tuple of the complete payload and the function node.
+        Checks the HTTP status of a gateway response, then parses and validates the XML.
+
+        :param r: The httpx response.
+        :param validate: See `IntacctAPI.execute`.
+        :param timer: Reports the parse and validate phases, if instrumentation is enabled.
+        :return: An XMLDictNode.
         """
+        self.check_status(r)
+        response = parse(r.text)
+        if timer is not None:
+            timer.mark(PARSE)
+        validator = self.validate_response if validate else self.validate_envelope
+        if validator(response):
+            if timer is not None:
+                timer.mark(VALIDATE)
+                timer.info.records = record_count(response)
+            return response
+        else:
+            raise IntacctException('Intacct API call failed.\n' + r.text)
+
+    def start_timer(self, payload: Union[Request, XMLDictNode]) -> Optional[RequestTimer]:
+        """Starts reporting a request to the client's hooks. Returns None if there are none."""
+        if self.instrumentation is None:
+            return None
+        if isinstance(payload, Request):
+            functions = payload.functions
+        else:
+            functions = list(payload.find_nodes_with_tag('function'))
+        info = RequestInfo([name for function in functions for name in function.keys()],
+                           [function.get_xml_attr('controlid', '') for function in functions])
+        return RequestTimer(self.instrumentation, info, payload.created if isinstance(payload, Request) else None)
+
+    @staticmethod
+    def mark_response(timer: RequestTimer, r: httpx.Response, trace: TraceTimes, headers: float):
+        """Reports the send and first byte phases once the response headers have arrived at `headers`."""
+        if trace.sent is not None:
+            timer.mark(SEND, trace.sent)
+        timer.mark(FIRST_BYTE, headers)
+        timer.info.status_code = r.status_code
+
+    @staticmethod
+    def function_names(payload: Union[Request, XMLDictNode]) -> List[str]:
+        """The names of the functions in a payload, e.g. ['readByQuery']."""
+        functions = payload.functions if isinstance(payload, Request) else payload.find_nodes_with_tag('function')
+        return [name for function in functions for name in function.keys()]
+
+    @staticmethod
+    def check_status(r: httpx.Response):
+        if r.status_code == 429:
+            raise IntacctRateLimitError(r.text)
+        if 500 <= r.status_code <= 599:
+            # If a 500 error is encountered we raise IntacctServerError. The user may decide whether to retry.
+            raise IntacctServerError(r.text)
+
+    def get_function_base(self) -> Tuple[XMLDictNode, XMLDictNode]:
+        """
+        Gets a prepared copy of the XML request and its function node.
+        :return: Tuple of the complete jxmlease request tree and the function node.
+        """
+        function = self.new_function()
         payload = deepcopy(self.basexml)
-        content = payload['request']['operation']['content']
-        function = content.add_node(tag='function', new_node=XMLDictNode(tag='function'))
-        function.set_xml_attr('controlid', str(uuid4()))
+        payload['request']['operation']['content'].add_node(tag='function', new_node=function)
         return payload, function
 
+    def _function_request(self) -> Tuple[Request, XMLDictNode]:
+        """Like `get_function_base`, but the payload is a Request rendered with the envelope."""
+        function = self.new_function()
+        return self.get_payload([function]), function
+
+    @staticmethod
+    def new_function(controlid: str = None) -> XMLDictNode:
+        """
+        Creates an empty function node which can be added to a payload.
+        :param controlid: The controlid for the function. A random one is generated if omitted.
+        :return: The function node.
+        """
+        function = XMLDictNode(tag='function')
+        function.set_xml_attr('controlid', controlid or str(uuid4()))
+        return function
+
+    @staticmethod
+    def get_payload(functions: List[XMLDictNode], transaction: bool = False, controlid: str = None,
+                    uniqueid: bool = False) -> Request:
+        """
+        Internal function to get a request containing the given function nodes.
+        :param functions: Function nodes created with `new_function`.
+        :param transaction: If True, the gateway rolls back every function if any of them fails.
+        :param controlid: The control id of the request, instead of the client's.
+        :param uniqueid: If True, the gateway refuses the request if its control id was already processed.
+        :return: The payload, rendered with the envelope when executed.
+        """
+        return Request(functions, transaction, controlid=controlid, uniqueid=uniqueid)
+
     @staticmethod
     def validate_response(xml: XMLDictNode) -> bool:
         """
@@ -124,79 +374,258 @@ class IntacctAPI(object):
         :return: Returns True if the tree has no error nodes,
                  otherwise raises an IntacctException with the error node contents.
         """
-        msg = ''
-        for node in xml.find_nodes_with_tag('error'):
-            msg += f'{node.get("description")}{node.get("description2")}\n'
+        msg = format_errors(xml)
         if msg != '':
-            raise IntacctException(msg)
+            raise BaseIntacctAPI.error_class(xml)(msg)
         else:
             return True
 
-    def get_session_id(self) -> Tuple[str, str, str]:
-        payload = deepcopy(self.basexml)
+    @staticmethod
+    def validate_envelope(xml: XMLDictNode) -> bool:
+        """
+
+        :param xml: jxmlease XML tree to validate.
+        :return: Returns True if the control and authentication blocks succeeded,
+                 otherwise raises an IntacctException. Errors within function results are ignored.
+        """
+        response = xml.get('response', xml)
+        operation = response.get('operation')
+        msg = ''
+        for node in (response, operation):
+            if node is not None and 'errormessage' in node:
+                msg += format_errors(node['errormessage'])
+        if msg != '':
+            raise BaseIntacctAPI.error_class(xml)(msg)
+        return True
+
+    @staticmethod
+    def error_class(xml: XMLDictNode) -> Type[IntacctException]:
+        """The exception to raise for a failed response: IntacctDuplicateRequestError for duplicate control ids."""
+        errors = xml.get('response', xml).get('errormessage')
+        if errors is not None and any(str(error.get('errorno', '')) == DUPLICATE_REQUEST
+                                      for error in errors.find_nodes_with_tag('error')):
+            return IntacctDuplicateRequestError
+        return IntacctException
+
+    def session_payload(self) -> Request:
         # Note: the login elements need to be in this order
         login = XMLDictNode({
             'userid': self.user_id,
             'companyid': self.company_id,
             'password': self.user_password
-        })
-        payload['request']['operation']['authentication'].add_node(tag='login', new_node=login)
-        function = XMLDictNode(tag='function')
-        function.set_xml_attr('controlid', str(uuid4()))
+        }, tag='login')
+        function = self.new_function()
         session_node = function.add_node('getAPISession')
         if self.entity_id is not None:
             session_node.add_node('locationid', text=self.entity_id)
-        payload['request']['operation']['content'].add_node(tag='function', new_node=function)
-        response = self.execute(payload, refresh_session=False)
+        return Request([function], login=login)
+
+    @staticmethod
+    def parse_session(response: XMLDictNode) -> Tuple[str, str, str]:
         sessionid = next(response.find_nodes_with_tag('sessionid'))
         endpoint = next(response.find_nodes_with_tag('endpoint'))
         timestamp = next(response.find_nodes_with_tag('sessiontimeout'))
         return str(sessionid.text), str(endpoint.text), str(timestamp.text)
 
-    def read_by_query(self, obj: str, query: str, fields: str = '*', pagesize: int = 100, docparid: str = ''):
-        return list(self.yield_by_query(obj, query, fields, pagesize, docparid))
+    @staticmethod
+    def projects(fields: Union[str, Iterable[str]], model: Type[BaseModel] = None) -> bool:
+        """Whether a query reads named fields rather than every field."""
+        return model is not None or (fields if isinstance(fields, str) else ','.join(fields)).strip() != '*'
+
+    def projection(self, obj: str, fields: Union[str, Iterable[str]] = '*', model: Type[BaseModel] = None,
+                   schema: ObjectSchema = None) -> str:
+        """
+        Resolves the fields a query should read. '*' becomes the fields of `model`, if one is given; with a
+        schema, the fields are checked against it. Reading '*' from an object known to have more than
+        WIDE_OBJECT_FIELDS fields logs a warning, once per object.
+
+        :param fields: A comma separated string or a list of field names.
+        :param model: The model records are decoded into.
+        :return: The fields, comma separated.
+        """
+        if not isinstance(fields, str):
+            fields = ','.join(fields)
+        if fields.strip() == '*' and model is not None:
+            fields = ','.join(model_fields(model))
+        if fields.strip() == '*':
+            schema = schema or self.metadata_cache.get(self.metadata_key(obj, True)) \
+                or self.metadata_cache.get(self.metadata_key(obj, False))
+            if schema is not None and len(schema.fields) > WIDE_OBJECT_FIELDS \
+                    and obj.upper() not in self._wide_objects_warned:
+                self._wide_objects_warned.add(obj.upper())
+                logger.warning("Reading all %d fields of %s; pass fields or a model to read only the ones "
+                               "you use.", len(schema.fields), obj.upper())
+            return fields
+        if schema is not None:
+            schema.check([field.strip() for field in fields.split(',')])
+        return fields
 
-    def yield_by_query(self, obj: str, query: str, fields: str = '*', pagesize: int = 100, docparid: str = ''):
-        payload, function = self.get_function_base()
+    def read_by_query_payload(self, obj: str, query: str, fields: str = '*', pagesize: int = 100,
+                              docparid: str = '') -> XMLDictNode:
+        payload, function = self._function_request()
         function.add_node(tag='readByQuery', new_node=XMLDictNode({
             'object': obj,
             'fields': fields,
             'query': query,
             'pagesize': pagesize,
             'docparid': docparid}))
-        r = self.execute(payload)
-        for record in r.find_nodes_with_tag(obj.lower()):
-            yield record
-        data = next(r.find_nodes_with_tag('data'))
-        remaining = data.get_xml_attr('numremaining')
-        result_id = data.get_xml_attr('resultId')
-        while int(remaining) > 0:
-            data, remaining, result_id = self.read_more(result_id)
-            for record in data.find_nodes_with_tag(obj.lower()):
-                yield record
+        return payload
 
-    def read_more(self, result_id):
-        payload, function = self.get_function_base()
+    def read_more_payload(self, result_id) -> XMLDictNode:
+        payload, function = self._function_request()
         function.add_node(tag='readMore', new_node=XMLDictNode({
             'resultId': result_id
         }))
-        r = self.execute(payload)
-        data = next(r.find_nodes_with_tag('data'))
+        return payload
+
+    def query_payload(self, obj: str, fields: Union[str, Iterable[str]], filter: Filter = None,
+                      orderby: Union[str, Iterable[str]] = None, pagesize: int = 1000, offset: int = 0,
+                      case_insensitive: bool = False) -> XMLDictNode:
+        """
+        Builds a `query` function. See `pyintacct.query`.
+
+        :param fields: The fields to select, as a list or a comma separated string.
+        :param filter: A Filter built with `pyintacct.query.Field`.
+        :param orderby: Fields to sort by; prefix a field with '-' to sort it in descending order.
+        :param pagesize: Records per page, capped at `pyintacct.query.MAX_PAGESIZE`.
+        """
+        from .query import field_names, order_node, page_size
+
+        query = {'object': obj, 'select': {'field': field_names(fields)}}
+        if filter is not None:
+            query['filter'] = dict([filter.node()])
+        if orderby:
+            query['orderby'] = order_node(orderby)
+        if case_insensitive:
+            query['options'] = {'caseinsensitive': 'true'}
+        query['pagesize'] = page_size(pagesize)
+        query['offset'] = offset
+        payload, function = self._function_request()
+        function.add_node(tag='query', new_node=XMLDictNode(query))
+        return payload
+
+    @staticmethod
+    def parse_page(response: XMLDictNode) -> Tuple[XMLDictNode, str, str]:
+        """
+        :return: Tuple of the data node, the number of records remaining and the resultId for readMore.
+        """
+        data = next(response.find_nodes_with_tag('data'))
         remaining = data.get_xml_attr('numremaining')
         result_id = data.get_xml_attr('resultId', None)
         return data, remaining, result_id
 
-    def inspect(self, obj: str = '*', detail: bool = False, name: str = None):
-        payload, function = self.get_function_base()
+    def inspect_payload(self, obj: str = '*', detail: bool = False, name: str = None) -> XMLDictNode:
+        payload, function = self._function_request()
         inspect_node = function.add_node(tag='inspect', new_node=XMLDictNode({
             f'{"name" if name else "object"}': f'{name if name else obj}'}
         ))
         inspect_node.set_xml_attr('detail', f'{"1" if detail else "0"}')
-        return self.execute(payload)
+        return payload
 
-    def create(self, obj):
-        payload, function = self.get_function_base()
+    def metadata_key(self, obj: str, detail: bool) -> str:
+        return self.metadata_cache.key(self.company_id, self.entity_id, obj, detail)
+
+    def invalidate_metadata(self, obj: str = None):
+        """Drops the cached schema of `obj`, or of every object if omitted."""
+        if obj is None:
+            return self.metadata_cache.invalidate()
+        for detail in (True, False):
+            self.metadata_cache.invalidate(self.metadata_key(obj, detail))
+
+    def create_payload(self, obj) -> Request:
+        return self.get_payload([self.create_function(obj)])
+
+    def update_payload(self, obj: Union[dict, BaseModel]) -> Request:
+        return self.get_payload([self.update_function(obj)])
+
+    def create_function(self, obj, controlid: str = None):
+        """
+        The function creating `obj`. Pydantic models are encoded straight to XML;
+        other objects are added to a node from `new_function`.
+        """
+        if hasattr(obj, '__pydantic_fields_set__'):
+            from .encoder import EncodedFunction, encode
+
+            controlid = controlid or str(uuid4())
+            if self.is_api21(obj.__class__):
+                name = obj.create()
+                return EncodedFunction(controlid, name, encode(obj, name, exclude_unset=True))
+            return EncodedFunction(controlid, 'create',
+                                   b'<create>' + encode(obj, obj.__class__.__name__.upper()) + b'</create>')
+        function = self.new_function(controlid)
+        self._add_create(function, obj)
+        return function
+
+    def update_function(self, obj: Union[dict, BaseModel], controlid: str = None):
+        """The function updating `obj`. See `create_function`."""
+        if hasattr(obj, '__pydantic_fields_set__'):
+            from .encoder import EncodedFunction, encode
+
+            return EncodedFunction(controlid or str(uuid4()), 'update',
+                                   b'<update>' + encode(obj, obj.__class__.__name__.upper()) + b'</update>')
+        function = self.new_function(controlid)
+        self._add_update(function, obj)
+        return function
+
+    def delete_payload(self, obj: str, keys: List[str]) -> XMLDictNode:
+        payload, function = self._function_request()
+        function.add_node(tag='delete', new_node=XMLDictNode({
+            'object': obj,
+            'keys': ','.join(keys)
+        }))
+        return payload
+
+    def delete_v21_functions(self, obj: type(API21Object), keys: List[str]) -> List[XMLDictNode]:
+        function_name, key_attr = obj.delete()
+        functions = []
+        for key in keys:
+            function = self.new_function()
+            f = function.add_node(function_name)
+            f.set_xml_attr(key_attr, key)
+            functions.append(function)
+        return functions
+
+    def many_functions(self, add, objs: List) -> List[XMLDictNode]:
+        functions = []
+        for obj in objs:
+            function = self.new_function()
+            add(function, obj)
+            functions.append(function)
+        return functions
+
+    def batch_payloads(self, functions: Iterable[XMLDictNode], transaction: bool, batch_size: int,
+                       items: List[Any] = None):
+        """
+        Groups function nodes into payloads of at most `batch_size` functions.
+        :return: Iterator of (payload, controlids, items) tuples.
+        """
+        functions = list(functions)
+        if items is None:
+            items = [None] * len(functions)
+        for chunk in chunked(zip(functions, items), batch_size):
+            chunk_functions = [function for function, _ in chunk]
+            controlids = [function.get_xml_attr('controlid') for function in chunk_functions]
+            yield self.get_payload(chunk_functions, transaction), controlids, [item for _, item in chunk]
+
+    @staticmethod
+    def is_api21(obj) -> bool:
+        if isinstance(obj, str):
+            return False
+        from .models.base import API21Object
+
+        try:
+            return issubclass(obj, API21Object)
+        except TypeError:
+            return False
+
+    @staticmethod
+    def _add_create(function: XMLDictNode, obj):
         tag = 'create'
+        if isinstance(obj, dict):
+            function.add_node(tag=tag, new_node=XMLDictNode(obj))
+            return
+        from .models.base import API21Object
+
         if issubclass(obj.__class__, API21Object):
             tag = obj.create()
             new_node = XMLDictNode(obj.model_dump(exclude_unset=True))
@@ -209,10 +638,9 @@ class IntacctAPI(object):
         else:
             new_node = XMLDictNode(obj)
         function.add_node(tag=tag, new_node=new_node)
-        return self.execute(payload)
 
-    def update(self, obj: Union[dict, BaseModel]):
-        payload, function = self.get_function_base()
+    @staticmethod
+    def _add_update(function: XMLDictNode, obj):
         tag = 'update'
         if hasattr(obj, 'model_dump'):
             obj = dict([(obj.__class__.__name__.upper(), obj.model_dump())])
@@ -223,26 +651,415 @@ class IntacctAPI(object):
         else:
             new_node = XMLDictNode(obj)
         function.add_node(tag=tag, new_node=new_node)
-        return self.execute(payload)
+
+
+class IntacctAPI(BaseIntacctAPI):
+    """
+    The synchronous client. An instance can be shared between threads: session
+    refreshes are single-flight, and every request is sent with a consistent
+    session id and endpoint. Size `limits` to the number of threads sharing it.
+
+    :param timeout: Default timeout in seconds, or an httpx.Timeout.
+    :param limits: Connection pool limits, e.g. httpx.Limits(max_connections=20, max_keepalive_connections=20).
+    :param transport: An httpx transport to send requests through instead of the network,
+                      e.g. `pyintacct.emulator.Gateway().transport()`.
+    :param stream_requests: Send `execute` request bodies with chunked encoding as they are rendered,
+                            instead of rendering the whole document first.
+    :param compress_requests: Gzip `execute` request bodies of 1KB or more. If the gateway refuses them
+                              with HTTP 415, the request is resent uncompressed and compression is turned off.
+    :param accept_encoding: The Accept-Encoding header. Defaults to the codings httpx can decode here;
+                            'identity' disables response compression.
+    :param check_fields: Check the fields of queries against the object's `describe()` metadata before
+                         sending them, so unknown fields fail early. The metadata is cached.
+    """
+    def __init__(self, *args, timeout: Union[float, httpx.Timeout] = 30, limits: httpx.Limits = None,
+                 transport: httpx.BaseTransport = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session_lock = threading.Lock()
+        self._http_kwargs = {'timeout': timeout}
+        if limits is not None:
+            self._http_kwargs['limits'] = limits
+        if transport is not None:
+            self._http_kwargs['transport'] = transport
+
+    def _create_http_client(self) -> httpx.Client:
+        return httpx.Client(headers=self.headers, http2=self.http2_enabled(), **self._http_kwargs)
+
+    def execute(self, payload: XMLDictNode, refresh_session=True, validate=True,
+                timeout=USE_CLIENT_DEFAULT) -> XMLDictNode:
+        """
+        Sends the request to the Intacct API. Automatically refreshes session token after one hour.
+
+        :param payload: A jxmlease structure containing the full payload except authentication.
+        :param refresh_session: An override flag to allow bypassing session reuse.
+        :param validate: If False, only control and authentication errors are raised and
+                         errors inside individual function results are left to the caller.
+        :param timeout: Overrides the client's timeout for this request.
+        :return: An XMLDictNode.
+        """
+        timer = self.start_timer(payload)
+        session_id, endpoint = self._ensure_session() if refresh_session else (None, self.endpoint)
+        if timer is not None:
+            timer.reset()
+        body = RequestBody(self, payload, session_id)
+        if timer is not None:
+            timer.mark(SERIALIZE)
+            timer.info.request_bytes = body.size
+
+        def attempt():
+            try:
+                r = self._post(endpoint, body, timeout, timer)
+                if r.status_code == 415 and body.gzip:
+                    self.compression_rejected(body)
+                    r = self._post(endpoint, body, timeout, timer)
+                return self.handle_response(r, validate, timer)
+            except httpx.HTTPStatusError as e:
+                raise IntacctException(e)
+
+        try:
+            if self.policy is None:
+                response = attempt()
+            else:
+                response = self.policy.call(self.function_names(payload), attempt,
+                                            timer.retry if timer is not None else None)
+        except Exception as e:
+            if timer is not None:
+                timer.finish(e)
+            raise
+        if timer is not None:
+            timer.finish()
+        return response
+
+    def _post(self, endpoint: str, body: RequestBody, timeout, timer: Optional[RequestTimer]) -> httpx.Response:
+        if timer is None:
+            return self.http_client.post(endpoint, content=body.content(), headers=body.headers, timeout=timeout)
+        timer.info.attempts += 1
+        trace = TraceTimes()
+        timer.reset()
+        with self.http_client.stream('POST', endpoint, content=body.content(), headers=body.headers,
+                                     timeout=timeout, extensions={'trace': trace}) as r:
+            self.mark_response(timer, r, trace, time.perf_counter())
+            r.read()
+        timer.info.request_bytes = body.size
+        timer.mark(DOWNLOAD)
+        timer.info.response_bytes = r.num_bytes_downloaded or len(r.content)
+        return r
+
+    def execute_stream(self, payload: XMLDictNode, parser: ResponseStreamParser, refresh_session=True,
+                       timeout=USE_CLIENT_DEFAULT) -> Iterator[XMLDictNode]:
+        """
+        Sends the request and yields records as they are parsed from the response body.
+        Page information is available on `parser` once the records have been consumed.
+
+        :param payload: A jxmlease structure containing the full payload except authentication.
+        :param parser: A ResponseStreamParser for the expected record tag.
+        :param refresh_session: An override flag to allow bypassing session reuse.
+        :param timeout: Overrides the client's timeout for this request.
+        """
+        timer = self.start_timer(payload)
+        session_id, endpoint = self._ensure_session() if refresh_session else (None, self.endpoint)
+        if timer is not None:
+            timer.reset()
+        content = self.serialize(payload, session_id)
+        trace = None
+        if timer is not None:
+            timer.mark(SERIALIZE)
+            timer.info.request_bytes = len(content)
+            timer.info.attempts = 1
+            trace = TraceTimes()
+        # Streamed requests are paced by the policy but not retried, since records may already have been yielded.
+        if self.policy is not None:
+            self.policy.acquire()
+        throttled = False
+        error = r = None
+        try:
+            if timer is not None:
+                timer.reset()
+            with self.http_client.stream('POST', endpoint, content=content, timeout=timeout,
+                                         extensions={'trace': trace} if trace else None) as r:
+                if timer is not None:
+                    self.mark_response(timer, r, trace, time.perf_counter())
+                if r.status_code == 429 or 500 <= r.status_code <= 599:
+                    r.read()
+                self.check_status(r)
+                for chunk in r.iter_bytes():
+                    yield from parser.feed(chunk)
+                yield from parser.close()
+        except httpx.HTTPStatusError as e:
+            error = e
+            raise IntacctException(e)
+        except Exception as e:
+            error = e
+            throttled = self.policy is not None and self.policy.is_throttled(e)
+            raise
+        finally:
+            if self.policy is not None:
+                self.policy.limit.release(throttled)
+            if timer is not None:
+                # Parsing is interleaved with the download, so both are reported as download.
+                timer.mark(DOWNLOAD)
+                timer.info.records = parser.records
+                timer.info.response_bytes = r.num_bytes_downloaded if r is not None else 0
+                timer.finish(error)
+
+    def _ensure_session(self) -> Tuple[str, str]:
+        """
+        Refreshes the session if it has expired. Only one thread refreshes; the others wait and reuse it.
+        :return: Tuple of the session id and endpoint, read together.
+        """
+        with self._session_lock:
+            if self.session_expired():
+                self._renew_session()
+            return self.session_id, self.endpoint
+
+    def _renew_session(self):
+        if self.session_store is None:
+            return self._refresh_session()
+        if self.load_session():
+            return
+        with self.session_store.lock(self.session_key()):
+            # Another client may have refreshed the session while we waited.
+            if self.load_session():
+                return
+            self._refresh_session()
+            self.store_session()
+
+    def _refresh_session(self):
+        started = time.perf_counter()
+        try:
+            self.set_session(self.get_session_id())
+        except IntacctException as e:
+            self.clear_session()
+            if self.instrumentation is not None:
+                self.instrumentation.session_refresh(time.perf_counter() - started, e)
+            raise e
+        if self.instrumentation is not None:
+            self.instrumentation.session_refresh(time.perf_counter() - started, None)
+
+    def get_session_id(self) -> Tuple[str, str, str]:
+        response = self.execute(self.session_payload(), refresh_session=False)
+        return self.parse_session(response)
+
+    def read_by_query(self, obj: str, query: str, fields: str = '*', pagesize: int = 100, docparid: str = '',
+                      prefetch: int = 0, stream: bool = False, model: Type[BaseModel] = None, as_tuples: bool = False,
+                      as_dicts: bool = False):
+        return list(self.yield_by_query(obj, query, fields, pagesize, docparid, prefetch, stream, model, as_tuples,
+                                        as_dicts))
+
+    def yield_by_query(self, obj: str, query: str, fields: str = '*', pagesize: int = 100, docparid: str = '',
+                       prefetch: int = 0, stream: bool = False, model: Type[BaseModel] = None, as_tuples: bool = False,
+                       as_dicts: bool = False):
+        """
+        Yields the records matching the query, following readMore until the result set is exhausted.
+        Records are XMLDictNodes unless one of `model`, `as_tuples` or `as_dicts` is given, in which case
+        they are decoded straight from the parsed elements without building XMLDictNodes.
+
+        :param fields: The fields to read, comma separated or as a list. '*' reads the fields of `model` if one
+                       is given, and every field otherwise.
+        :param prefetch: Number of pages to fetch in a background thread while the caller iterates.
+                         At most this many pages are buffered. 0 fetches each page on demand.
+        :param stream: If True, records are parsed and yielded while each page downloads
+                       instead of after the whole page has been parsed.
+        :param model: Decode each record directly into this pydantic model.
+        :param as_tuples: Decode each record into a tuple of values ordered like `fields`.
+        :param as_dicts: Decode each record into a dict.
+        """
+        fields = self.project(obj, fields, model)
+        decode = record_decoder(fields, model, as_tuples, as_dicts)
+        if stream or decode is not None:
+            records = self.yield_streamed(obj, query, fields, pagesize, docparid, decode)
+            if prefetch:
+                from .prefetch import prefetched
+                records = prefetched(records, prefetch * int(pagesize))
+            yield from records
+            return
+        pages = self.yield_pages(obj, query, fields, pagesize, docparid)
+        if prefetch:
+            from .prefetch import prefetched
+            pages = prefetched(pages, prefetch)
+        for data in pages:
+            for record in data.find_nodes_with_tag(obj.lower()):
+                yield record
+
+    def project(self, obj: str, fields: Union[str, Iterable[str]] = '*', model: Type[BaseModel] = None) -> str:
+        """Resolves the fields to read, checking them with `describe()` if `check_fields` is set. See `projection`."""
+        schema = self.describe(obj) if self.check_fields and self.projects(fields, model) else None
+        return self.projection(obj, fields, model, schema)
+
+    def yield_pages(self, obj: str, query: str, fields: str = '*', pagesize: int = 100, docparid: str = ''):
+        """
+        Yields the data node of every page of a readByQuery result set.
+        """
+        data, remaining, result_id = self.parse_page(
+            self.execute(self.read_by_query_payload(obj, query, fields, pagesize, docparid)))
+        yield data
+        while int(remaining) > 0:
+            data, remaining, result_id = self.read_more(result_id)
+            yield data
+
+    def yield_streamed(self, obj: str, query: str, fields: str = '*', pagesize: int = 100, docparid: str = '',
+                       decode: Callable = None):
+        """
+        Yields the records of a readByQuery result set as they are parsed from each response.
+        """
+        parser = ResponseStreamParser(obj.lower(), decode)
+        yield from self.execute_stream(self.read_by_query_payload(obj, query, fields, pagesize, docparid), parser)
+        while int(parser.remaining or 0) > 0:
+            result_id = parser.result_id
+            parser = ResponseStreamParser(obj.lower(), decode)
+            yield from self.execute_stream(self.read_more_payload(result_id), parser)
+
+    def read_by_query_columnar(self, obj: str, query: str, fields: str = '*', batch_rows: int = 10000,
+                               pagesize: int = 1000, docparid: str = '', types: Dict[str, str] = None,
+                               scales: Dict[str, int] = None, prefetch: int = 0) -> Iterator[RecordBatch]:
+        """
+        Yields the query results as RecordBatches of typed columns, without creating an object per row.
+        See `pyintacct.columnar` for how Intacct data types map to columns.
+
+        :param batch_rows: Number of rows per batch. The last batch may be smaller.
+        :param types: Maps field names to Intacct data types. Read from `inspect(detail=True)` if omitted.
+        :param scales: Overrides the number of decimal places kept for decimal fields.
+        :param prefetch: Number of pages to fetch in a background thread while the caller iterates.
+                         The batches are built in that thread too, so at least one batch is buffered.
+        """
+        from .columnar import BatchBuilder, yield_batches
+
+        fields = self.project(obj, fields)
+        if types is None:
+            types = self.describe(obj).types
+        names = None if fields.strip() == '*' else [field.strip() for field in fields.split(',')]
+        builder = BatchBuilder(types, names, scales)
+        records = self.yield_streamed(obj, query, fields, pagesize, docparid, builder.append)
+        batches = yield_batches(records, builder, batch_rows)
+        if prefetch:
+            # The builder is filled while parsing, so only whole batches may cross threads.
+            from .prefetch import prefetched
+            batches = prefetched(batches, max(1, prefetch * int(pagesize) // batch_rows))
+        return batches
+
+    def yield_partitioned(self, obj: str, query: str = '', fields: str = '*', key: str = 'RECORDNO',
+                          partitions: int = 4, boundaries: list = None, max_workers: int = None,
+                          ordered: bool = False, pagesize: int = 1000, **kwargs):
+        """
+        Reads the query as disjoint ranges of `key` concurrently. See `pyintacct.partition.yield_partitioned`.
+        """
+        from .partition import yield_partitioned
+
+        return yield_partitioned(self, obj, query, fields, key, partitions, boundaries, max_workers, ordered,
+                                 pagesize, **kwargs)
+
+    def query_page(self, obj: str, fields: Union[str, Iterable[str]], filter: Filter = None,
+                   orderby: Union[str, Iterable[str]] = None, pagesize: int = 1000, offset: int = 0,
+                   case_insensitive: bool = False) -> QueryPage:
+        """Runs one `query` function and returns its records along with the total count."""
+        from .query import parse_query_page
+
+        response = self.execute(self.query_payload(obj, fields, filter, orderby, pagesize, offset, case_insensitive))
+        return parse_query_page(response, obj)
+
+    def query(self, obj: str, fields: Union[str, Iterable[str]], filter: Filter = None,
+              orderby: Union[str, Iterable[str]] = None, pagesize: int = 1000, max_workers: int = 4,
+              case_insensitive: bool = False) -> List[XMLDictNode]:
+        """Returns every record matching `filter`, in order. See `yield_query`."""
+        return list(self.yield_query(obj, fields, filter, orderby, pagesize, max_workers, True, case_insensitive))
+
+    def yield_query(self, obj: str, fields: Union[str, Iterable[str]], filter: Filter = None,
+                    orderby: Union[str, Iterable[str]] = None, pagesize: int = 1000, max_workers: int = 4,
+                    ordered: bool = False, case_insensitive: bool = False) -> Iterator[XMLDictNode]:
+        """
+        Yields the records matching `filter` using the `query` function. The first page gives the total
+        count; the remaining pages are then requested by offset, `max_workers` at a time.
+
+        :param orderby: Fields to sort by. Defaults to RECORDNO, so that offsets are stable between requests.
+        :param max_workers: Number of pages requested at once.
+        :param ordered: If True, pages are yielded in offset order; otherwise as they arrive.
+        """
+        from .query import fetch_pages
+
+        orderby = orderby or 'RECORDNO'
+        first = self.query_page(obj, fields, filter, orderby, pagesize, 0, case_insensitive)
+        yield from first.records
+        # Step by the size of the first page, which `query_payload` caps at MAX_PAGESIZE.
+        size = len(first.records)
+        offsets = range(size, first.total, size) if size else ()
+
+        def fetch(offset):
+            return self.query_page(obj, fields, filter, orderby, pagesize, offset, case_insensitive)
+
+        for page in fetch_pages(fetch, offsets, max_workers, ordered):
+            yield from page.records
+
+    def read_more(self, result_id):
+        return self.parse_page(self.execute(self.read_more_payload(result_id)))
+
+    def inspect(self, obj: str = '*', detail: bool = False, name: str = None):
+        return self.execute(self.inspect_payload(obj, detail, name))
+
+    def describe(self, obj: str, detail: bool = True, refresh: bool = False) -> ObjectSchema:
+        """
+        Returns the parsed field definitions of an object, from the metadata cache if possible.
+
+        :param detail: If True, field types and flags are included.
+        :param refresh: If True, the cache is bypassed and updated.
+        """
+        key = self.metadata_key(obj, detail)
+        schema = None if refresh else self.metadata_cache.get(key)
+        if schema is None:
+            schema = ObjectSchema(obj.upper(), parse_fields(self.inspect(obj, detail)))
+            self.metadata_cache.set(key, schema)
+        return schema
+
+    def create(self, obj):
+        return self.execute(self.create_payload(obj))
+
+    def update(self, obj: Union[dict, BaseModel]):
+        return self.execute(self.update_payload(obj))
+
+    def create_many(self, objs: Iterable, transaction: bool = False,
+                    batch_size: int = MAX_FUNCTIONS_PER_REQUEST) -> List[FunctionResult]:
+        """
+        Creates many objects using as few requests as possible.
+
+        :param objs: Objects accepted by `create`.
+        :param transaction: If True, each request is all-or-nothing.
+        :param batch_size: Maximum number of functions per request.
+        :return: A FunctionResult for every object, in input order, with the object as `item`.
+        """
+        objs = list(objs)
+        return self.execute_batch([self.create_function(obj) for obj in objs], transaction, batch_size, items=objs)
+
+    def update_many(self, objs: Iterable, transaction: bool = False,
+                    batch_size: int = MAX_FUNCTIONS_PER_REQUEST) -> List[FunctionResult]:
+        """
+        Updates many objects using as few requests as possible. See `create_many`.
+        """
+        objs = list(objs)
+        return self.execute_batch([self.update_function(obj) for obj in objs], transaction, batch_size, items=objs)
+
+    def execute_batch(self, functions: Iterable[XMLDictNode], transaction: bool = False,
+                      batch_size: int = MAX_FUNCTIONS_PER_REQUEST, items: List[Any] = None) -> List[FunctionResult]:
+        """
+        Sends function nodes in as few requests as possible and reports the outcome of each one.
+        Failed functions do not raise; check `FunctionResult.ok` or call `raise_for_status()`.
+
+        :param functions: Function nodes created with `new_function`. Each must have a unique controlid.
+        :param transaction: If True, each request is all-or-nothing.
+        :param batch_size: Maximum number of functions per request.
+        :param items: Optional objects to attach to the results, one per function.
+        :return: A FunctionResult for every function, in input order.
+        """
+        results = []
+        for payload, controlids, chunk_items in self.batch_payloads(functions, transaction, batch_size, items):
+            response = self.execute(payload, validate=False)
+            results.extend(map_results(response, controlids, chunk_items))
+        return results
 
     def _delete_v21(self, obj: type(API21Object), keys: List[str]):
-        function_name, key_attr = obj.delete()
-        for key in keys:
-            payload, function = self.get_function_base()
-            f = function.add_node(function_name)
-            f.set_xml_attr(key_attr, key)
-            self.execute(payload)
+        for result in self.execute_batch(self.delete_v21_functions(obj, keys), items=keys):
+            result.raise_for_status()
         return
 
     def delete(self, obj: Union[str, type(API21Object)], keys: List[str]):
-        try:
-            if issubclass(obj, API21Object):
-                return self._delete_v21(obj, keys)
-        except TypeError:
-            pass
-        payload, function = self.get_function_base()
-        function.add_node(tag='delete', new_node=XMLDictNode({
-            'object': obj,
-            'keys': ','.join(keys)
-        }))
-        return self.execute(payload)
+        if self.is_api21(obj):
+            return self._delete_v21(obj, keys)
+        return self.execute(self.delete_payload(obj, keys))
@@ -0,0 +1,212 @@
+"""
+Accumulates query results into typed column buffers instead of per-row objects.
+
+Intacct data types map to column kinds as follows:
+
+    INTEGER                     int        int64
+    DECIMAL, PERCENT, CURRENCY  decimal    int64 scaled by 10 ** scale
+    DATE                        date       int32 days since 1970-01-01
+    TIMESTAMP                   timestamp  int64 seconds since 1970-01-01
+    BOOLEAN                     bool       int8
+    anything else               str        list of str
+
+`RecordBatch.to_numpy()` requires numpy and `RecordBatch.to_arrow()` requires pyarrow.
+"""
+from array import array
+from datetime import date, datetime
+from decimal import Decimal
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+from xml.etree.ElementTree import Element
+
+if TYPE_CHECKING:
+    import numpy
+    import pyarrow
+
+KINDS = {
+    'INTEGER': 'int',
+    'DECIMAL': 'decimal',
+    'PERCENT': 'decimal',
+    'CURRENCY': 'decimal',
+    'DATE': 'date',
+    'TIMESTAMP': 'timestamp',
+    'BOOLEAN': 'bool',
+}
+DEFAULT_SCALES = {'CURRENCY': 2, 'DECIMAL': 6, 'PERCENT': 6}
+TYPECODES = {'int': 'q', 'decimal': 'q', 'date': 'i', 'timestamp': 'q', 'bool': 'b'}
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class Column(object):
+    """A typed column buffer with a validity byte (1 valid, 0 null) per row."""
+    __slots__ = ('name', 'kind', 'scale', 'values', 'valid', '_factor')
+
+    def __init__(self, name: str, kind: str = 'str', scale: int = 0, rows: int = 0):
+        self.name = name
+        self.kind = kind
+        self.scale = scale
+        self._factor = Decimal(10) ** scale
+        self.values = [] if kind == 'str' else array(TYPECODES[kind])
+        self.valid = bytearray()
+        self.pad(rows)
+
+    def __len__(self):
+        return len(self.valid)
+
+    def pad(self, rows: int):
+        """Appends nulls until the column has `rows` rows."""
+        missing = rows - len(self.valid)
+        if missing > 0:
+            if self.kind == 'str':
+                self.values.extend([None] * missing)
+            else:
+                self.values.extend(array(self.values.typecode, bytes(missing * self.values.itemsize)))
+            self.valid.extend(bytes(missing))
+
+    def append(self, text: Optional[str]):
+        if text is None or text == '':
+            self.values.append(None if self.kind == 'str' else 0)
+            self.valid.append(0)
+            return
+        self.values.append(self.convert(text))
+        self.valid.append(1)
+
+    def convert(self, text: str):
+        kind = self.kind
+        if kind == 'str':
+            return text
+        if kind == 'int':
+            return int(text)
+        if kind == 'decimal':
+            return int((Decimal(text) * self._factor).to_integral_value())
+        if kind == 'date':
+            return datetime.strptime(text, '%m/%d/%Y').toordinal() - _EPOCH_ORDINAL
+        if kind == 'timestamp':
+            moment = datetime.strptime(text, '%m/%d/%Y %H:%M:%S')
+            return (moment.toordinal() - _EPOCH_ORDINAL) * 86400 + moment.hour * 3600 + moment.minute * 60 \
+                + moment.second
+        return 1 if text.strip().lower() == 'true' else 0
+
+    def to_numpy(self):
+        import numpy as np
+
+        if self.kind == 'str':
+            values = np.array(self.values, dtype=object)
+        else:
+            values = np.frombuffer(self.values, dtype=self.values.typecode)
+            if self.kind == 'date':
+                values = values.astype('datetime64[D]')
+            elif self.kind == 'timestamp':
+                values = values.astype('datetime64[s]')
+            elif self.kind == 'bool':
+                values = values.astype(bool)
+        mask = np.frombuffer(bytes(self.valid), dtype=np.uint8) == 0
+        return np.ma.MaskedArray(values, mask=mask) if mask.any() else values
+
+    def to_arrow(self):
+        import numpy as np
+        import pyarrow as pa
+
+        if self.kind == 'str':
+            return pa.array(self.values, type=pa.string())
+        valid = np.frombuffer(bytes(self.valid), dtype=np.uint8).astype(bool)
+        validity = pa.py_buffer(np.packbits(valid, bitorder='little'))
+        values = np.frombuffer(self.values, dtype=self.values.typecode)
+        if self.kind == 'decimal':
+            # decimal128 is a little-endian two's complement int128, so sign-extend the int64 values.
+            words = np.empty((len(values), 2), dtype='<i8')
+            words[:, 0] = values
+            words[:, 1] = values >> 63
+            return pa.Array.from_buffers(pa.decimal128(38, self.scale), len(values),
+                                         [validity, pa.py_buffer(words.tobytes())])
+        arrow_type = {'int': pa.int64(), 'date': pa.date32(), 'timestamp': pa.timestamp('s')}.get(self.kind)
+        if arrow_type is None:
+            return pa.array(values.astype(bool), mask=~valid)
+        return pa.Array.from_buffers(arrow_type, len(values), [validity, pa.py_buffer(values.tobytes())])
+
+
+class RecordBatch(object):
+    """A group of rows held as one Column per field."""
+    def __init__(self, columns: List[Column], num_rows: int):
+        self.columns = columns
+        self.num_rows = num_rows
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, name: str) -> Column:
+        for column in self.columns:
+            if column.name == name:
+                return column
+        raise KeyError(name)
+
+    @property
+    def names(self) -> List[str]:
+        return [column.name for column in self.columns]
+
+    def to_numpy(self) -> Dict[str, 'numpy.ndarray']:
+        """Returns a numpy array per column, masked where the column has nulls."""
+        return {column.name: column.to_numpy() for column in self.columns}
+
+    def to_arrow(self) -> 'pyarrow.Table':
+        import pyarrow as pa
+
+        return pa.Table.from_arrays([column.to_arrow() for column in self.columns], names=self.names)
+
+
+class BatchBuilder(object):
+    """
+    Appends record elements to column buffers.
+
+    :param types: Maps field names to Intacct data types, e.g. from `inspect(detail=True)`.
+    :param fields: The expected field names, in column order. Unexpected fields are added as they appear.
+    :param scales: Overrides the number of decimal places kept for decimal fields.
+    """
+    def __init__(self, types: Dict[str, str] = None, fields: List[str] = None, scales: Dict[str, int] = None):
+        self.types = types or {}
+        self.scales = scales or {}
+        self.fields = list(fields or [])
+        self._reset()
+
+    def _reset(self):
+        self.num_rows = 0
+        self.columns: Dict[str, Column] = {}
+        for name in self.fields:
+            self._add_column(name)
+
+    def _add_column(self, name: str) -> Column:
+        datatype = self.types.get(name, '')
+        kind = KINDS.get(datatype, 'str')
+        scale = self.scales.get(name, DEFAULT_SCALES.get(datatype, 0)) if kind == 'decimal' else 0
+        column = self.columns[name] = Column(name, kind, scale, self.num_rows)
+        return column
+
+    def append(self, elem: Element):
+        rows = self.num_rows
+        for child in elem:
+            column = self.columns.get(child.tag)
+            if column is None:
+                column = self._add_column(child.tag)
+            if len(column) == rows:
+                column.append(child.text)
+        self.num_rows = rows = rows + 1
+        for column in self.columns.values():
+            if len(column) < rows:
+                column.pad(rows)
+
+    def finish(self) -> RecordBatch:
+        batch = RecordBatch(list(self.columns.values()), self.num_rows)
+        self._reset()
+        return batch
+
+
+def yield_batches(records: Iterator, builder: BatchBuilder, batch_rows: int) -> Iterator[RecordBatch]:
+    """
+    Drains `records`, an iterator whose decoder appends each record to `builder`,
+    yielding a RecordBatch every `batch_rows` rows.
+    """
+    for _ in records:
+        if builder.num_rows >= batch_rows:
+            yield builder.finish()
+    if builder.num_rows:
+        yield builder.finish()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import typing
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Type
+from xml.etree.ElementTree import Element
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+# Maps the element tag of each model field, which is also the key it is validated by, to the nested
+# field plan of nested models.
+FieldPlan = Dict[str, Optional['FieldPlan']]
+
+
+def element_to_dict(elem: Element) -> Dict[str, Any]:
+    """Converts a record element into a dict of its children's text. Nested elements become nested dicts."""
+    record = {}
+    for child in elem:
+        record[child.tag] = element_to_dict(child) if len(child) else (child.text or '')
+    return record
+
+
+def record_value(record: Any, name: str) -> Any:
+    """Reads field `name` from a record decoded as an XMLDictNode, a dict or a model."""
+    if isinstance(record, dict):
+        return record[name]
+    return getattr(record, name)
+
+
+def _nested_model(annotation) -> Optional[Type[BaseModel]]:
+    for candidate in (annotation, *typing.get_args(annotation)):
+        if isinstance(candidate, type) and hasattr(candidate, 'model_fields'):
+            return candidate
+    return None
+
+
+@lru_cache(maxsize=None)
+def field_plan(model: Type[BaseModel]) -> FieldPlan:
+    """Builds, once per model, the mapping from record element tags to the model's fields."""
+    plan = {}
+    for name, field in model.model_fields.items():
+        nested = _nested_model(field.annotation)
+        # Pydantic validates by validation_alias, then alias; AliasPath and AliasChoices don't name one tag.
+        tag = field.validation_alias if isinstance(field.validation_alias, str) else field.alias or name
+        plan[tag] = field_plan(nested) if nested else None
+    return plan
+
+
+def model_fields(model: Type[BaseModel]) -> Tuple[str, ...]:
+    """The record fields `model` decodes, to use as the fields of a query."""
+    return tuple(field_plan(model))
+
+
+def _plan_values(elem: Element, plan: FieldPlan) -> Dict[str, Any]:
+    values = {}
+    for child in elem:
+        if child.tag not in plan:
+            continue
+        nested = plan[child.tag]
+        if nested is not None and len(child):
+            values[child.tag] = _plan_values(child, nested)
+        else:
+            values[child.tag] = element_to_dict(child) if len(child) else (child.text or '')
+    return values
+
+
+def model_decoder(model: Type[BaseModel]) -> Callable[[Element], BaseModel]:
+    """Decodes record elements into `model`, skipping elements the model has no field for."""
+    plan = field_plan(model)
+
+    def decode(elem: Element) -> BaseModel:
+        return model.model_validate(_plan_values(elem, plan))
+    return decode
+
+
+class TupleDecoder(object):
+    """
+    Decodes record elements into tuples ordered like `fields`.
+    If `fields` is None, the order of the first record's elements is used for every record.
+    """
+    def __init__(self, fields: Optional[Tuple[str, ...]] = None):
+        self.fields = fields
+
+    def __call__(self, elem: Element) -> tuple:
+        if self.fields is None:
+            self.fields = tuple(child.tag for child in elem)
+        values = {child.tag: child.text or '' for child in elem}
+        return tuple(values.get(field) for field in self.fields)
+
+
+def record_decoder(fields: str = '*', model: Type[BaseModel] = None, as_tuples: bool = False,
+                   as_dicts: bool = False) -> Optional[Callable[[Element], Any]]:
+    """
+    Chooses the decoder for yield_by_query's output options.
+    :return: A callable taking a record element, or None to produce XMLDictNodes.
+    """
+    if sum((model is not None, as_tuples, as_dicts)) > 1:
+        raise ValueError('Only one of model, as_tuples and as_dicts may be given.')
+    if model is not None:
+        return model_decoder(model)
+    if as_tuples:
+        names = tuple(f.strip() for f in fields.split(',')) if fields.strip() != '*' else None
+        return TupleDecoder(names)
+    if as_dicts:
+        return element_to_dict
+    return None
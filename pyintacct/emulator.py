@@ -0,0 +1,540 @@
+"""
+A local stand-in for the Intacct XML gateway, for tests and benchmarks.
+
+The Gateway keeps records in memory and answers getAPISession, readByQuery,
+readMore, query, read, inspect, create, update and delete, as well as API 2.1
+create_* and delete_* functions. It can be used as an httpx transport:
+
+    gateway = Gateway({'CUSTOMER': [{'CUSTOMERID': 'C1', 'NAME': 'Acme'}]})
+    client = IntacctAPI(..., transport=gateway.transport())
+
+or served over HTTP on localhost:
+
+    with gateway.serve() as server:
+        client = IntacctAPI(..., endpoint=server.url)
+
+Request bodies may be chunked and gzipped, and with `compress=True` responses
+are gzipped for clients that accept it.
+
+readByQuery supports conditions of the form `FIELD op value` joined by AND,
+where op is one of = != <> < <= > >= LIKE and value is a number or a quoted
+string; quoted MM/DD/YYYY dates compare as dates. query supports every filter
+operator, nested <and> and <or>, orderby and offset.
+"""
+import copy
+import gzip
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from uuid import uuid4
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import httpx
+
+from .decode import element_to_dict
+from .exceptions import DUPLICATE_REQUEST
+
+ENDPOINT = 'https://api.intacct.com/ia/xml/xmlgw.phtml'
+TIMESTAMP_FORMAT = '%m/%d/%Y %H:%M:%S'
+# Distinct from DUPLICATE_REQUEST, so clients don't mistake an unsupported function for a replayed request.
+UNKNOWN_FUNCTION = 'XL03000003'
+
+_CONDITION = re.compile(r"\s*\(?\s*(\w+)\s*(<=|>=|<>|!=|=|<|>|\bLIKE\b)\s*"
+                        r"(-?\d+(?:\.\d+)?|'(?:[^'\\]|\\.)*')\s*\)?\s*", re.IGNORECASE)
+_AND = re.compile(r'\s+AND\s+', re.IGNORECASE)
+
+
+class GatewayError(Exception):
+    """A function failure, reported in the function's result."""
+    def __init__(self, description: str, errorno: str = 'BL01001973'):
+        super().__init__(description)
+        self.errorno = errorno
+
+
+def _value(text: str) -> Any:
+    """Converts a query literal or a record value into a comparable value."""
+    if text.startswith("'"):
+        text = text[1:-1].replace("\\'", "'")
+        for fmt in (TIMESTAMP_FORMAT, '%m/%d/%Y'):
+            try:
+                return datetime.strptime(text, fmt)
+            except ValueError:
+                pass
+        return text
+    try:
+        return float(text) if '.' in text else int(text)
+    except ValueError:
+        return text
+
+
+def _compare(record_value: Any, op: str, literal: Any) -> bool:
+    if record_value is None or isinstance(record_value, dict):
+        return False
+    value = _value(f"'{record_value}'") if isinstance(literal, datetime) else record_value
+    if isinstance(literal, (int, float)):
+        try:
+            value = float(value)
+        except ValueError:
+            return False
+    op = op.upper()
+    if op == 'LIKE':
+        pattern = '^' + re.escape(str(literal)).replace('%', '.*').replace('_', '.') + '$'
+        return re.match(pattern, str(value), re.IGNORECASE) is not None
+    if op == '=':
+        return value == literal
+    if op in ('!=', '<>'):
+        return value != literal
+    try:
+        return {'<': value < literal, '<=': value <= literal, '>': value > literal, '>=': value >= literal}[op]
+    except TypeError:
+        return False
+
+
+def compile_query(query: str) -> Callable[[Dict[str, Any]], bool]:
+    """Compiles a readByQuery query into a predicate over record dicts."""
+    query = query.strip()
+    if not query:
+        return lambda record: True
+    conditions = []
+    for part in _AND.split(query):
+        match = _CONDITION.fullmatch(part)
+        if match is None:
+            raise GatewayError(f'Unsupported query condition: {part}', 'DL02000001')
+        field, op, literal = match.groups()
+        conditions.append((field.upper(), op, _value(literal)))
+    return lambda record: all(_compare(record.get(f), op, v) for f, op, v in conditions)
+
+
+_OPERATORS = {'equalto': '=', 'notequalto': '!=', 'lessthan': '<', 'lessthanorequalto': '<=',
+              'greaterthan': '>', 'greaterthanorequalto': '>=', 'like': 'LIKE'}
+
+
+def _filter_value(text: str) -> Any:
+    value = _value(text)
+    return _value(f"'{text}'") if isinstance(value, str) else value
+
+
+def compile_filter(element: Optional[ElementTree.Element]) -> Callable[[Dict[str, Any]], bool]:
+    """Compiles the <filter> of a query function into a predicate over record dicts."""
+    if element is None or len(element) == 0:
+        return lambda record: True
+    return _compile_filter(element[0])
+
+
+def _compile_filter(element: ElementTree.Element) -> Callable[[Dict[str, Any]], bool]:
+    tag = element.tag
+    if tag in ('and', 'or'):
+        children = [_compile_filter(child) for child in element]
+        combine = all if tag == 'and' else any
+        return lambda record: combine(child(record) for child in children)
+    field = (element.findtext('field') or '').upper()
+    values = [_filter_value(value.text or '') for value in element.findall('value')]
+    if tag in _OPERATORS:
+        op, value = _OPERATORS[tag], values[0]
+        return lambda record: _compare(record.get(field), op, value)
+    if tag == 'notlike':
+        return lambda record: not _compare(record.get(field), 'LIKE', values[0])
+    if tag == 'between':
+        return lambda record: (_compare(record.get(field), '>=', values[0]) and
+                               _compare(record.get(field), '<=', values[1]))
+    if tag == 'in':
+        return lambda record: any(_compare(record.get(field), '=', value) for value in values)
+    if tag == 'notin':
+        return lambda record: not any(_compare(record.get(field), '=', value) for value in values)
+    if tag == 'isnull':
+        return lambda record: record.get(field) in (None, '')
+    if tag == 'isnotnull':
+        return lambda record: record.get(field) not in (None, '')
+    raise GatewayError(f'Unsupported filter operator {tag}', 'DL02000001')
+
+
+def _emit(tag: str, value: Any) -> str:
+    if isinstance(value, dict):
+        return f'<{tag}>' + ''.join(_emit(k, v) for k, v in value.items()) + f'</{tag}>'
+    if value is None:
+        return f'<{tag}/>'
+    return f'<{tag}>{escape(str(value))}</{tag}>'
+
+
+def _error(description: str, errorno: str = 'BL01001973') -> str:
+    return (f'<errormessage><error><errorno>{errorno}</errorno><description></description>'
+            f'<description2>{escape(description)}</description2><correction></correction></error></errormessage>')
+
+
+class Gateway(object):
+    """
+    An in-memory Intacct XML gateway.
+
+    :param objects: Initial records by object name. Each record is a dict of field values.
+    :param latency: Seconds added to every request.
+    :param error_rate: Probability that a request fails with HTTP `error_status`.
+    :param error_status: The status of injected errors.
+    :param session_timeout: Lifetime of API sessions in seconds.
+    :param seed: Seeds the random generator used for error injection.
+    :param compress: Gzip responses for clients that accept it.
+    :param accept_gzip: Accept gzipped request bodies. If False they are refused with HTTP 415.
+    """
+    def __init__(self, objects: Dict[str, List[Dict[str, Any]]] = None, latency: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, session_timeout: float = 3600,
+                 endpoint: str = ENDPOINT, seed: int = None, compress: bool = False, accept_gzip: bool = True):
+        self.objects: Dict[str, List[Dict[str, Any]]] = {}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.session_timeout = session_timeout
+        self.endpoint = endpoint
+        self.compress = compress
+        self.accept_gzip = accept_gzip
+        self.sessions: Dict[str, float] = {}
+        self.requests = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.seconds = 0.0
+        self._failures: List[Tuple[int, bool]] = []
+        self._unique_controlids = set()
+        self._result_sets: Dict[str, Tuple[List[Dict[str, Any]], Optional[List[str]], int, str]] = {}
+        self._recordno = 1
+        self._random = random.Random(seed)
+        self._functions = {
+            'getAPISession': self._get_api_session, 'readByQuery': self._read_by_query, 'readMore': self._read_more,
+            'query': self._query, 'read': self._read, 'inspect': self._inspect, 'create': self._create,
+            'update': self._update, 'delete': self._delete}
+        self._lock = threading.RLock()
+        for obj, records in (objects or {}).items():
+            self.load(obj, records)
+
+    def load(self, obj: str, records: List[Dict[str, Any]]):
+        """Adds records to an object, assigning RECORDNO and WHENMODIFIED where missing."""
+        with self._lock:
+            table = self.objects.setdefault(obj.upper(), [])
+            for record in records:
+                table.append(self._stamp(dict(record)))
+
+    def _stamp(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        recordno = str(record.get('RECORDNO') or self._recordno)
+        record['RECORDNO'] = recordno
+        if recordno.isdigit():
+            self._recordno = max(self._recordno, int(recordno) + 1)
+        record['WHENMODIFIED'] = record.get('WHENMODIFIED') or datetime.now().strftime(TIMESTAMP_FORMAT)
+        return record
+
+    def fail_next(self, requests: int = 1, status: int = None, processed: bool = False):
+        """
+        Makes the next `requests` requests fail with HTTP `status` (default `error_status`).
+        If `processed`, each request is carried out before the error is returned, as when a response is lost.
+        """
+        with self._lock:
+            self._failures.extend([(status or self.error_status, processed)] * requests)
+
+    def reset_stats(self):
+        """Zeroes `requests`, `bytes_received`, `bytes_sent` and `seconds`, the time spent answering requests."""
+        with self._lock:
+            self.requests = self.bytes_received = self.bytes_sent = 0
+            self.seconds = 0.0
+
+    def transport(self) -> httpx.MockTransport:
+        """An httpx transport, usable by both IntacctAPI and AsyncIntacctAPI."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            status, body, headers = self.exchange(request.read(), request.headers)
+            return httpx.Response(status, content=body, headers=headers)
+        return httpx.MockTransport(handler)
+
+    def serve(self, host: str = '127.0.0.1', port: int = 0) -> 'GatewayServer':
+        """Starts serving the gateway over HTTP in a background thread."""
+        return GatewayServer(self, host, port)
+
+    def exchange(self, body: bytes, headers: Mapping[str, str]) -> Tuple[int, bytes, Dict[str, str]]:
+        """
+        Answers one HTTP request, decoding a gzipped body and gzipping the response
+        if `compress` is set and the client accepts it. The byte counts in the
+        stats are the sizes on the wire.
+        """
+        response_headers = {'content-type': 'text/xml; encoding="UTF-8"'}
+        encoding = headers.get('content-encoding', 'identity').lower()
+        if encoding not in ('identity', 'gzip') or encoding == 'gzip' and not self.accept_gzip:
+            with self._lock:
+                self.requests += 1
+                self.bytes_received += len(body)
+            return 415, b'', response_headers
+        xml = gzip.decompress(body) if encoding == 'gzip' else body
+        status, response = self.handle(xml)
+        accepted = [coding.split(';')[0].strip() for coding in headers.get('accept-encoding', '').split(',')]
+        if self.compress and ('gzip' in accepted or '*' in accepted):
+            compressed = gzip.compress(response, 6)
+            response_headers['content-encoding'] = 'gzip'
+        else:
+            compressed = response
+        with self._lock:
+            self.bytes_received += len(body) - len(xml)
+            self.bytes_sent += len(compressed) - len(response)
+        return status, compressed, response_headers
+
+    def handle(self, body: bytes) -> Tuple[int, bytes]:
+        """Answers one request, returning the HTTP status and response body."""
+        if self.latency:
+            time.sleep(self.latency)
+        started = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(body)
+            status, processed = self._failures.pop(0) if self._failures else (None, False)
+            if status is None and self.error_rate and self._random.random() < self.error_rate:
+                status = self.error_status
+        if status is not None:
+            if processed:
+                self._respond(ElementTree.fromstring(body))
+            response = f'<html><body>{status} Service Unavailable</body></html>'.encode('utf-8')
+        else:
+            status, response = 200, self._respond(ElementTree.fromstring(body)).encode('utf-8')
+        with self._lock:
+            self.bytes_sent += len(response)
+            self.seconds += time.perf_counter() - started
+        return status, response
+
+    def _respond(self, request: ElementTree.Element) -> str:
+        control = request.find('control')
+        controlid = control.findtext('controlid', '') if control is not None else ''
+        unique = control is not None and control.findtext('uniqueid', '') == 'true'
+        rest = (f'<senderid>{escape(control.findtext("senderid", "") if control is not None else "")}</senderid>'
+                f'<controlid>{escape(controlid)}</controlid><uniqueid>{"true" if unique else "false"}</uniqueid>'
+                '<dtdversion>3.0</dtdversion></control>')
+        with self._lock:
+            if unique and controlid in self._unique_controlids:
+                return ('<?xml version="1.0" encoding="UTF-8"?>\n<response><control><status>failure</status>' + rest
+                        + _error(f'A request with control id {controlid} has already been processed.',
+                                 DUPLICATE_REQUEST) + '</response>')
+        head = '<?xml version="1.0" encoding="UTF-8"?>\n<response><control><status>success</status>' + rest \
+            + '<operation>'
+        operation = request.find('operation')
+        authentication = operation.find('authentication')
+        login = authentication.find('login')
+        if login is not None:
+            userid, companyid = login.findtext('userid', ''), login.findtext('companyid', '')
+        else:
+            session = authentication.findtext('sessionid', '')
+            with self._lock:
+                expires = self.sessions.get(session)
+            if expires is None or expires < time.time():
+                return (head + '<authentication><status>failure</status></authentication>'
+                        + _error('Invalid session', 'XL03000006') + '</operation></response>')
+            userid, companyid = 'user', 'company'
+        auth = (f'<authentication><status>success</status><userid>{escape(userid)}</userid>'
+                f'<companyid>{escape(companyid)}</companyid></authentication>')
+        functions = list(operation.find('content'))
+        transaction = operation.get('transaction') == 'true'
+        with self._lock:
+            if unique:
+                self._unique_controlids.add(controlid)
+            snapshot = copy.deepcopy(self.objects) if transaction else None
+            results = [self._result(function) for function in functions]
+            if transaction and any(status == 'failure' for status, _ in results):
+                self.objects = snapshot
+                results = [(status, body) if status == 'failure' else ('aborted', _error('Transaction aborted'))
+                           for status, body in results]
+        return head + auth + ''.join(body for _, body in results) + '</operation></response>'
+
+    def _result(self, function: ElementTree.Element) -> Tuple[str, str]:
+        controlid = escape(function.get('controlid', ''))
+        call = function[0] if len(function) else None
+        name = call.tag if call is not None else ''
+        try:
+            status, handler = 'success', self._functions.get(name)
+            if handler is None:
+                if name.startswith('create_'):
+                    handler = self._create_v21
+                elif name.startswith(('update_', 'delete_')):
+                    handler = self._other_v21
+                else:
+                    raise GatewayError(f'Unknown function {name}', UNKNOWN_FUNCTION)
+            body = handler(call)
+        except GatewayError as e:
+            status, body = 'failure', _error(str(e), e.errorno)
+        return status, (f'<result><status>{status}</status><function>{escape(name)}</function>'
+                        f'<controlid>{controlid}</controlid>{body}</result>')
+
+    # Functions. Each returns the body of a successful result or raises GatewayError.
+
+    def _get_api_session(self, call: ElementTree.Element) -> str:
+        session = uuid4().hex
+        expires = time.time() + self.session_timeout
+        self.sessions[session] = expires
+        timeout = time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(expires))
+        return (f'<data><api><sessionid>{session}</sessionid><endpoint>{escape(self.endpoint)}</endpoint>'
+                f'<locationid></locationid><sessiontimeout>{timeout}</sessiontimeout></api></data>')
+
+    def _table(self, obj: str) -> List[Dict[str, Any]]:
+        table = self.objects.get(obj.upper())
+        if table is None:
+            raise GatewayError(f'Object definition {obj} not found', 'DL02000001')
+        return table
+
+    def _read_by_query(self, call: ElementTree.Element) -> str:
+        obj = call.findtext('object', '')
+        table = self._table(obj)
+        predicate = compile_query(call.findtext('query') or '')
+        fields = (call.findtext('fields') or '*').strip()
+        fields = None if fields == '*' else [field.strip().upper() for field in fields.split(',')]
+        pagesize = min(int(call.findtext('pagesize') or 100), 2000)
+        matches = [record for record in table if predicate(record)]
+        return self._page(obj.lower(), matches, fields, pagesize, len(matches))
+
+    def _read_more(self, call: ElementTree.Element) -> str:
+        result_id = call.findtext('resultId', '')
+        if result_id not in self._result_sets:
+            raise GatewayError(f'Attempt to readMore with an invalid resultId {result_id}', 'GW-0011')
+        records, fields, pagesize, tag = self._result_sets.pop(result_id)
+        return self._page(tag, records, fields, pagesize, None, result_id)
+
+    def _query(self, call: ElementTree.Element) -> str:
+        obj = call.findtext('object', '')
+        table = self._table(obj)
+        fields = [field.text.upper() for field in call.iterfind('select/field')]
+        if not fields:
+            raise GatewayError('The query has no fields to select', 'DL02000001')
+        predicate = compile_filter(call.find('filter'))
+        matches = [record for record in table if predicate(record)]
+        for order in reversed(call.findall('orderby/order')):
+            field = (order.findtext('field') or '').upper()
+            # Missing values sort first, like NULLs.
+            matches.sort(key=lambda record: (record.get(field) not in (None, ''),
+                                             _filter_value(str(record.get(field) or ''))),
+                         reverse=order.find('descending') is not None)
+        pagesize = min(int(call.findtext('pagesize') or 1000), 2000)
+        offset = int(call.findtext('offset') or 0)
+        page = matches[offset:offset + pagesize]
+        tag = obj.upper()
+        rows = ''.join(_emit(tag, {f: record.get(f) for f in fields}) for record in page)
+        return (f'<data listtype="{escape(tag)}" totalcount="{len(matches)}" offset="{offset}" count="{len(page)}" '
+                f'numremaining="{max(len(matches) - offset - len(page), 0)}">{rows}</data>')
+
+    def _page(self, tag: str, records: List[Dict[str, Any]], fields: Optional[List[str]], pagesize: int,
+              total: Optional[int], result_id: str = None) -> str:
+        page, rest = records[:pagesize], records[pagesize:]
+        attrs = f'listtype="{tag}" count="{len(page)}"'
+        if total is not None:
+            attrs += f' totalcount="{total}"'
+        attrs += f' numremaining="{len(rest)}"'
+        if rest:
+            result_id = result_id or uuid4().hex
+            self._result_sets[result_id] = (rest, fields, pagesize, tag)
+            attrs += f' resultId="{result_id}"'
+        rows = ''.join(_emit(tag, record if fields is None else {f: record.get(f) for f in fields})
+                       for record in page)
+        return f'<data {attrs}>{rows}</data>'
+
+    def _read(self, call: ElementTree.Element) -> str:
+        obj = call.findtext('object', '')
+        keys = {key.strip() for key in (call.findtext('keys') or '').split(',') if key.strip()}
+        records = [record for record in self._table(obj) if record['RECORDNO'] in keys]
+        return self._page(obj.lower(), records, None, len(records) or 1, len(records))
+
+    def _inspect(self, call: ElementTree.Element) -> str:
+        obj = call.findtext('object', '')
+        table = self._table(obj)
+        names = dict.fromkeys(name for record in table[:100] for name in record)
+        types = {'RECORDNO': 'INTEGER', 'WHENMODIFIED': 'TIMESTAMP'}
+        fields = ''.join(f'<Field><Name>{name}</Name><DisplayLabel>{name.title()}</DisplayLabel>'
+                         f'<isRequired>false</isRequired><isReadOnly>{str(name == "RECORDNO").lower()}</isReadOnly>'
+                         f'<DATATYPE>{types.get(name, "TEXT")}</DATATYPE></Field>' for name in names)
+        return (f'<data listtype="All" count="1"><Type Name="{escape(obj.upper())}">'
+                f'<Fields>{fields}</Fields></Type></data>')
+
+    def _create(self, call: ElementTree.Element) -> str:
+        created = []
+        for element in call:
+            record = self._stamp({key.upper(): value for key, value in element_to_dict(element).items()})
+            self.objects.setdefault(element.tag.upper(), []).append(record)
+            created.append(_emit(element.tag.lower(), {'RECORDNO': record['RECORDNO']}))
+        return f'<data listtype="objects" count="{len(created)}">{"".join(created)}</data>'
+
+    def _update(self, call: ElementTree.Element) -> str:
+        updated = []
+        for element in call:
+            values = {key.upper(): value for key, value in element_to_dict(element).items()}
+            recordno = values.get('RECORDNO')
+            for record in self._table(element.tag):
+                if record['RECORDNO'] == recordno:
+                    record.update(values)
+                    record['WHENMODIFIED'] = datetime.now().strftime(TIMESTAMP_FORMAT)
+                    break
+            else:
+                raise GatewayError(f'{element.tag.upper()} record {recordno} not found', 'BL01001973')
+            updated.append(_emit(element.tag.lower(), {'RECORDNO': recordno}))
+        return f'<data listtype="objects" count="{len(updated)}">{"".join(updated)}</data>'
+
+    def _delete(self, call: ElementTree.Element) -> str:
+        obj = call.findtext('object', '')
+        keys = {key.strip() for key in (call.findtext('keys') or '').split(',') if key.strip()}
+        table = self._table(obj)
+        missing = keys - {record['RECORDNO'] for record in table}
+        if missing:
+            raise GatewayError(f'{obj.upper()} records {", ".join(sorted(missing))} not found', 'BL01001973')
+        table[:] = [record for record in table if record['RECORDNO'] not in keys]
+        return ''
+
+    def _create_v21(self, call: ElementTree.Element) -> str:
+        record = self._stamp({key.upper(): value for key, value in element_to_dict(call).items()})
+        self.objects.setdefault(call.tag[len('create_'):].upper(), []).append(record)
+        return f'<key>{record["RECORDNO"]}</key>'
+
+    def _other_v21(self, call: ElementTree.Element) -> str:
+        return ''
+
+
+class _Handler(BaseHTTPRequestHandler):
+    gateway: Gateway = None
+
+    def do_POST(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = self._read_chunked()
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status, response, headers = self.gateway.exchange(body, {k.lower(): v for k, v in self.headers.items()})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def _read_chunked(self) -> bytes:
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';')[0], 16)
+            if size == 0:
+                # Skip any trailers up to the blank line ending the body.
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GatewayServer(object):
+    """Serves a Gateway on localhost until `close` is called. Use `url` as the client's endpoint."""
+    def __init__(self, gateway: Gateway, host: str = '127.0.0.1', port: int = 0):
+        handler = type('Handler', (_Handler,), {'gateway': gateway})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.url = f'http://{host}:{self.server.server_address[1]}/ia/xml/xmlgw.phtml'
+        gateway.endpoint = self.url
+        self.thread = threading.Thread(target=self.server.serve_forever, name='pyintacct-gateway', daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
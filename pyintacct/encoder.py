@@ -0,0 +1,112 @@
+"""
+Encodes pydantic models straight into XML, without building a jxmlease tree.
+
+The output is the same as wrapping `model_dump()` in an XMLDictNode and
+calling `emit_xml(full_document=False, pretty=False)`: fields in declaration
+order, None as an empty element, list items as repeated elements, and every
+other value as `str(value)`. Each model class is compiled once into a list of
+its fields and their tags. Models whose dump can differ from their
+attributes (custom serializers, computed fields or extra fields) are encoded
+from `model_dump()` instead.
+"""
+from functools import lru_cache
+from typing import Callable, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+Writer = Callable[[object, List[str], bool], None]
+
+
+@lru_cache(maxsize=None)
+def model_writer(model: type) -> Optional[Writer]:
+    """
+    Compiles a writer for a model class, or returns None if the model must be encoded from `model_dump()`.
+    A writer appends the XML of an instance's fields to a list of strings.
+    """
+    decorators = getattr(model, '__pydantic_decorators__', None)
+    if decorators is None or decorators.field_serializers or decorators.model_serializers \
+            or model.model_computed_fields or model.model_config.get('extra') == 'allow' \
+            or getattr(model, '__pydantic_root_model__', False):
+        return None
+    fields = [(name, f'<{name}>', f'</{name}>') for name, field in model.model_fields.items() if not field.exclude]
+
+    def write(obj, out: List[str], exclude_unset: bool):
+        values = obj.__dict__
+        fields_set = obj.__pydantic_fields_set__ if exclude_unset else None
+        for name, open_tag, close_tag in fields:
+            if fields_set is None or name in fields_set:
+                write_value(out, open_tag, close_tag, values[name], exclude_unset)
+
+    return write
+
+
+def write_value(out: List[str], open_tag: str, close_tag: str, value, exclude_unset: bool = False):
+    """Appends the XML of one value, as jxmlease would emit it, to a list of strings."""
+    cls = value.__class__
+    if cls is str:
+        out += (open_tag, escape(value), close_tag)
+    elif value is None:
+        out += (open_tag, close_tag)
+    elif cls is list:
+        for item in value:
+            write_value(out, open_tag, close_tag, item, exclude_unset)
+    elif hasattr(cls, '__pydantic_fields_set__'):
+        writer = model_writer(cls)
+        if writer is None:
+            write_value(out, open_tag, close_tag, value.model_dump(exclude_unset=exclude_unset), exclude_unset)
+            return
+        out.append(open_tag)
+        writer(value, out, exclude_unset)
+        out.append(close_tag)
+    elif isinstance(value, dict):
+        out.append(open_tag)
+        for key, item in value.items():
+            write_value(out, f'<{key}>', f'</{key}>', item, exclude_unset)
+        out.append(close_tag)
+    elif isinstance(value, list):
+        for item in value:
+            write_value(out, open_tag, close_tag, item, exclude_unset)
+    else:
+        out += (open_tag, escape(str(value)), close_tag)
+
+
+def encode(obj, tag: str, exclude_unset: bool = False) -> bytes:
+    """
+    Encodes a model, or a dict, as an element.
+
+    :param obj: A pydantic model instance or a dict.
+    :param tag: The tag of the element, e.g. 'create_sotransaction'.
+    :param exclude_unset: Omit fields that were not explicitly set, as `model_dump(exclude_unset=True)` does.
+    """
+    out: List[str] = []
+    write_value(out, f'<{tag}>', f'</{tag}>', obj, exclude_unset)
+    return ''.join(out).encode('utf-8')
+
+
+class EncodedFunction(object):
+    """
+    A function whose body has already been encoded. It can be used wherever a
+    function node from `new_function` is accepted by `get_payload` and `execute_batch`.
+    """
+    __slots__ = ('controlid', 'name', 'body')
+
+    def __init__(self, controlid: str, name: str, body: bytes):
+        self.controlid = controlid
+        self.name = name
+        self.body = body
+
+    def keys(self):
+        return [self.name]
+
+    def get_xml_attr(self, attr: str, *default):
+        if attr == 'controlid':
+            return self.controlid
+        if default:
+            return default[0]
+        raise KeyError(attr)
+
+    def emit(self) -> bytes:
+        return b''.join([b'<function controlid=', quoteattr(self.controlid).encode('utf-8'), b'>', self.body,
+                         b'</function>'])
+
+    def __repr__(self):
+        return f'<EncodedFunction {self.name} {self.controlid}>'
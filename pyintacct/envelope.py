@@ -0,0 +1,125 @@
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+
+from jxmlease import XMLDictNode
+
+from .encoder import EncodedFunction
+
+XML_DECLARATION = b'<?xml version="1.0" encoding="utf-8"?>\n'
+FOOTER = b'</content></operation></request>'
+
+
+class Request(object):
+    """
+    The variable part of a request: its function nodes (or EncodedFunctions), and the login node
+    when requesting a session. A request may also carry its own control id, which with `uniqueid`
+    the gateway uses to refuse processing the same request twice.
+    The control and authentication blocks are rendered by `Envelope`.
+    """
+    __slots__ = ('functions', 'transaction', 'login', 'controlid', 'uniqueid', 'created')
+
+    def __init__(self, functions: List[XMLDictNode], transaction: bool = False, login: XMLDictNode = None,
+                 controlid: str = None, uniqueid: bool = False):
+        self.functions = functions
+        self.transaction = transaction
+        self.login = login
+        self.controlid = controlid
+        self.uniqueid = uniqueid
+        # When the payload started being built, for instrumentation.
+        self.created = time.perf_counter()
+
+
+class Envelope(object):
+    """
+    Renders requests into bytes. The control block is rendered once and the part of
+    the envelope preceding the functions is cached until the session id changes,
+    so only the function bodies are serialized for each call.
+    """
+    def __init__(self, control: XMLDictNode):
+        self._control = dict(control)
+        self.control = self.control_block()
+        self._headers: Dict[Tuple[Optional[str], bool], bytes] = {}
+        self._session_id = None
+
+    def control_block(self, controlid: str = None, uniqueid: bool = False) -> bytes:
+        """The start of the document up to the end of the control block, with the given control id."""
+        values = dict(self._control)
+        if controlid is not None:
+            values['controlid'] = controlid
+        if uniqueid:
+            values['uniqueid'] = 'true'
+        control = XMLDictNode(values, tag='control')
+        control.standardize()
+        return XML_DECLARATION + b'<request>' + control.emit_xml(full_document=False, pretty=False).encode('utf-8')
+
+    def header(self, session_id: Optional[str], transaction: bool = False) -> bytes:
+        if session_id != self._session_id:
+            self._headers = {}
+            self._session_id = session_id
+        key = (session_id, transaction)
+        header = self._headers.get(key)
+        if header is None:
+            header = self._headers[key] = self._open(self._authentication(session_id), transaction)
+        return header
+
+    @staticmethod
+    def _authentication(session_id: Optional[str]) -> bytes:
+        if session_id is None:
+            return b''
+        return b'<sessionid>' + escape(session_id).encode('utf-8') + b'</sessionid>'
+
+    def render(self, request: Request, session_id: Optional[str] = None) -> bytes:
+        """
+        :param request: The request to render.
+        :param session_id: The session id to authenticate with. Ignored if the request has a login node.
+        :return: The complete request document.
+        """
+        return b''.join(self.chunks(request, session_id))
+
+    def chunks(self, request: Request, session_id: Optional[str] = None) -> Iterator[bytes]:
+        """Renders a request piece by piece: the header, each function, then the footer. See `render`."""
+        control = None
+        if request.controlid is not None or request.uniqueid:
+            control = self.control_block(request.controlid, request.uniqueid)
+        if request.login is not None:
+            yield self._open(request.login.emit_xml(full_document=False, pretty=False).encode('utf-8'),
+                             request.transaction, control)
+        elif control is not None:
+            yield self._open(self._authentication(session_id), request.transaction, control)
+        else:
+            yield self.header(session_id, request.transaction)
+        for function in request.functions:
+            yield self.function(function)
+        yield FOOTER
+
+    @staticmethod
+    def function(function: Union[XMLDictNode, EncodedFunction]) -> bytes:
+        if isinstance(function, EncodedFunction):
+            return function.emit()
+        function.standardize()
+        return function.emit_xml(full_document=False, pretty=False).encode('utf-8')
+
+    def _open(self, authentication: bytes, transaction: bool, control: bytes = None) -> bytes:
+        operation = b'<operation transaction="true">' if transaction else b'<operation>'
+        return b''.join([control or self.control, operation, b'<authentication>', authentication, b'</authentication>',
+                         b'<content>'])
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6, size: int = 65536) -> Iterator[bytes]:
+    """Compresses a stream of chunks into gzip data, yielding it in pieces of roughly `size` bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            pending.append(data)
+            pending_size += len(data)
+            if pending_size >= size:
+                yield b''.join(pending)
+                pending = []
+                pending_size = 0
+    pending.append(compressor.flush())
+    yield b''.join(pending)
@@ -0,0 +1,267 @@
+"""
+Instrumentation hooks for timing where a request spends its time.
+
+Each call to `execute` or `execute_stream` creates a RequestInfo and reports
+its phases, in order, to every hook on the client:
+
+- build: from the creation of the payload to the start of `execute`;
+- serialize: rendering the request body;
+- send: connecting and writing the request;
+- first_byte: waiting for the response headers, i.e. the gateway's processing time;
+- download: reading the response body (including parsing, when streamed);
+- parse: parsing the response XML;
+- validate: checking the response for errors.
+
+send and first_byte can only be told apart with httpx's standard transports;
+with other transports all of the wait is reported as first_byte. Retries and
+session refreshes are reported separately.
+
+    class SlowRequests(Hooks):
+        def on_request(self, info):
+            if info.elapsed > 5:
+                logger.warning('%s took %.1fs: %s', info.functions, info.elapsed, info.timings)
+
+    client = IntacctAPI(..., hooks=[SlowRequests()])
+"""
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+BUILD = 'build'
+SERIALIZE = 'serialize'
+SEND = 'send'
+FIRST_BYTE = 'first_byte'
+DOWNLOAD = 'download'
+PARSE = 'parse'
+VALIDATE = 'validate'
+PHASES = (BUILD, SERIALIZE, SEND, FIRST_BYTE, DOWNLOAD, PARSE, VALIDATE)
+
+
+class RequestInfo(object):
+    """
+    What is known about one request. Hooks receive the same instance for every event of a request.
+    `request_bytes` and `response_bytes` are sizes on the wire, i.e. after compression.
+    """
+    __slots__ = ('functions', 'controlids', 'started', 'timings', 'attempts', 'request_bytes', 'response_bytes',
+                 'status_code', 'records', 'error', 'elapsed')
+
+    def __init__(self, functions: List[str], controlids: List[str]):
+        self.functions = functions
+        self.controlids = controlids
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.attempts = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.status_code: Optional[int] = None
+        self.records = 0
+        self.error: Optional[BaseException] = None
+        self.elapsed = 0.0
+
+    @property
+    def function(self) -> str:
+        """The function name, or a comma-separated list for requests with several functions."""
+        return ','.join(sorted(set(self.functions)))
+
+    def __repr__(self):
+        timings = ' '.join(f'{phase}={seconds * 1000:.1f}ms' for phase, seconds in self.timings.items())
+        return f'<RequestInfo {self.function} {self.status_code} {self.response_bytes}B {timings}>'
+
+
+class Hooks(object):
+    """Receives instrumentation events. Override the methods you need; exceptions they raise are logged."""
+    def on_phase(self, info: RequestInfo, phase: str, seconds: float):
+        """A phase of a request completed. Phases of retried attempts are reported again."""
+
+    def on_request(self, info: RequestInfo):
+        """A request completed, successfully or with `info.error` set."""
+
+    def on_retry(self, info: RequestInfo, attempt: int, error: BaseException, delay: float):
+        """Attempt `attempt` (from 0) failed with `error` and will be retried after `delay` seconds."""
+
+    def on_session_refresh(self, seconds: float, error: Optional[BaseException]):
+        """A new API session was requested."""
+
+
+class Instrumentation(object):
+    """Dispatches events to a client's hooks, isolating the client from their failures."""
+    def __init__(self, hooks: Sequence[Hooks]):
+        self.hooks = list(hooks)
+
+    def _dispatch(self, method: str, *args):
+        for hook in self.hooks:
+            try:
+                getattr(hook, method)(*args)
+            except Exception:
+                logger.exception('Instrumentation hook %r failed', hook)
+
+    def phase(self, info: RequestInfo, phase: str, seconds: float):
+        info.timings[phase] = info.timings.get(phase, 0.0) + seconds
+        self._dispatch('on_phase', info, phase, seconds)
+
+    def request(self, info: RequestInfo):
+        info.elapsed = time.perf_counter() - info.started
+        self._dispatch('on_request', info)
+
+    def retry(self, info: RequestInfo, attempt: int, error: BaseException, delay: float):
+        self._dispatch('on_retry', info, attempt, error, delay)
+
+    def session_refresh(self, seconds: float, error: Optional[BaseException]):
+        self._dispatch('on_session_refresh', seconds, error)
+
+
+class RequestTimer(object):
+    """Reports the phases of one request, timing each from the end of the previous one."""
+    __slots__ = ('instrumentation', 'info', 'last')
+
+    def __init__(self, instrumentation: Instrumentation, info: RequestInfo, created: float = None):
+        self.instrumentation = instrumentation
+        self.info = info
+        self.last = time.perf_counter()
+        if created is not None:
+            instrumentation.phase(info, BUILD, self.last - created)
+
+    def reset(self):
+        self.last = time.perf_counter()
+
+    def mark(self, phase: str, at: float = None):
+        now = time.perf_counter() if at is None else at
+        self.instrumentation.phase(self.info, phase, now - self.last)
+        self.last = now
+
+    def retry(self, attempt: int, error: BaseException, delay: float):
+        self.instrumentation.retry(self.info, attempt, error, delay)
+
+    def finish(self, error: BaseException = None):
+        self.info.error = error
+        self.instrumentation.request(self.info)
+
+
+def record_count(response) -> int:
+    """The number of records in a parsed response, from the `count` attribute of each result's data."""
+    operation = response.get('response', {}).get('operation', {})
+    results = operation.get('result', []) if isinstance(operation, dict) else []
+    total = 0
+    for result in results if isinstance(results, list) else [results]:
+        data = result.get('data') if isinstance(result, dict) else None
+        count = data.get_xml_attr('count', None) if hasattr(data, 'get_xml_attr') else None
+        if count is not None and str(count).isdigit():
+            total += int(count)
+    return total
+
+
+class TraceTimes(object):
+    """An httpx `trace` extension callback recording when the request body was sent."""
+    __slots__ = ('sent',)
+
+    def __init__(self):
+        self.sent: Optional[float] = None
+
+    def __call__(self, name: str, info: dict):
+        if name.endswith('send_request_body.complete'):
+            self.sent = time.perf_counter()
+
+    async def atrace(self, name: str, info: dict):
+        self(name, info)
+
+
+class PrometheusHooks(Hooks):
+    """
+    Exports Prometheus metrics through prometheus_client:
+
+    - <namespace>_requests_total{function, outcome}
+    - <namespace>_request_seconds{function}, a histogram of the whole request
+    - <namespace>_phase_seconds{function, phase}, a histogram per phase
+    - <namespace>_request_bytes_total{function} and <namespace>_response_bytes_total{function}
+    - <namespace>_records_total{function}
+    - <namespace>_retries_total{function}
+    - <namespace>_session_refreshes_total{outcome}
+    """
+    def __init__(self, namespace: str = 'pyintacct', registry=None, buckets: Sequence[float] = None):
+        from prometheus_client import REGISTRY, Counter, Histogram
+
+        registry = registry or REGISTRY
+        histogram = {'buckets': buckets} if buckets else {}
+        self.requests = Counter('requests_total', 'Intacct requests.', ['function', 'outcome'],
+                                namespace=namespace, registry=registry)
+        self.request_seconds = Histogram('request_seconds', 'Intacct request duration.', ['function'],
+                                         namespace=namespace, registry=registry, **histogram)
+        self.phase_seconds = Histogram('phase_seconds', 'Duration of each phase of an Intacct request.',
+                                       ['function', 'phase'], namespace=namespace, registry=registry, **histogram)
+        self.request_bytes = Counter('request_bytes_total', 'Intacct request body bytes.', ['function'],
+                                     namespace=namespace, registry=registry)
+        self.response_bytes = Counter('response_bytes_total', 'Intacct response body bytes.', ['function'],
+                                      namespace=namespace, registry=registry)
+        self.records = Counter('records_total', 'Records returned by Intacct.', ['function'],
+                               namespace=namespace, registry=registry)
+        self.retries = Counter('retries_total', 'Intacct request retries.', ['function'],
+                               namespace=namespace, registry=registry)
+        self.session_refreshes = Counter('session_refreshes_total', 'Intacct session refreshes.', ['outcome'],
+                                         namespace=namespace, registry=registry)
+
+    def on_phase(self, info: RequestInfo, phase: str, seconds: float):
+        self.phase_seconds.labels(info.function, phase).observe(seconds)
+
+    def on_request(self, info: RequestInfo):
+        function = info.function
+        self.requests.labels(function, 'error' if info.error else 'success').inc()
+        self.request_seconds.labels(function).observe(info.elapsed)
+        self.request_bytes.labels(function).inc(info.request_bytes)
+        self.response_bytes.labels(function).inc(info.response_bytes)
+        self.records.labels(function).inc(info.records)
+
+    def on_retry(self, info: RequestInfo, attempt: int, error: BaseException, delay: float):
+        self.retries.labels(info.function).inc()
+
+    def on_session_refresh(self, seconds: float, error: Optional[BaseException]):
+        self.session_refreshes.labels('error' if error else 'success').inc()
+
+
+class OpenTelemetryHooks(Hooks):
+    """
+    Records each request as an OpenTelemetry span named `intacct <function>`, with
+    byte, record and status attributes and one span event per phase, retry and
+    session refresh. The span covers the whole request and is ended when it completes.
+    """
+    def __init__(self, tracer_provider=None):
+        from opentelemetry import trace
+
+        self._trace = trace
+        self.tracer = trace.get_tracer('pyintacct', tracer_provider=tracer_provider)
+        self._spans = {}
+
+    def _get(self, info: RequestInfo):
+        span = self._spans.get(id(info))
+        if span is None:
+            # Started on the first event and back-dated to the start of the request.
+            started = time.time_ns() - int((time.perf_counter() - info.started) * 1e9)
+            span = self._spans[id(info)] = self.tracer.start_span(
+                f'intacct {info.function}', start_time=started,
+                attributes={'intacct.functions': info.functions, 'intacct.controlids': info.controlids})
+        return span
+
+    def on_phase(self, info: RequestInfo, phase: str, seconds: float):
+        self._get(info).add_event(phase, {'duration_ms': seconds * 1000})
+
+    def on_retry(self, info: RequestInfo, attempt: int, error: BaseException, delay: float):
+        self._get(info).add_event('retry', {'attempt': attempt, 'error': repr(error), 'delay_s': delay})
+
+    def on_request(self, info: RequestInfo):
+        span = self._get(info)
+        try:
+            span.set_attributes({
+                'intacct.request_bytes': info.request_bytes, 'intacct.response_bytes': info.response_bytes,
+                'intacct.records': info.records, 'intacct.attempts': info.attempts,
+                'http.status_code': info.status_code or 0})
+            if info.error is not None:
+                span.record_exception(info.error)
+                span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(info.error)))
+        finally:
+            self._spans.pop(id(info), None)
+            span.end()
+
+    def on_session_refresh(self, seconds: float, error: Optional[BaseException]):
+        span = self._trace.get_current_span()
+        span.add_event('session_refresh', {'duration_ms': seconds * 1000, 'error': repr(error) if error else ''})
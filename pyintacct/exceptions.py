@@ -1,6 +1,25 @@
+# The error number the gateway returns for a request whose control id was already processed with uniqueid set.
+DUPLICATE_REQUEST = 'XL03000009'
+
+
 class IntacctException(Exception):
     """Base exception for Intacct API errors"""
 
 
 class IntacctServerError(IntacctException):
     """Raised when a 500-level response is received"""
+
+
+class IntacctFunctionError(IntacctException):
+    """Raised when an individual function within a request fails"""
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class IntacctRateLimitError(IntacctException):
+    """Raised when the gateway responds with HTTP 429 Too Many Requests"""
+
+
+class IntacctDuplicateRequestError(IntacctException):
+    """Raised when a request sent with uniqueid is rejected because its control id was already processed"""
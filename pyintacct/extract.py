@@ -0,0 +1,223 @@
+"""
+Streaming extracts to files.
+
+Records are parsed as each page downloads and written to the file straight
+away, so memory is bounded by the pages prefetched, not by the size of the
+object:
+
+    extract(client, 'ARINVOICE', 'invoices.parquet', query="STATE = 'Posted'", fields='RECORDNO,TOTALDUE')
+
+JSONL and CSV files are gzipped if compression is 'gzip' or the path ends in
+.gz; in CSV, nested fields become dotted columns. Parquet files are written
+one row group per `batch_rows` records from typed columns (see
+`pyintacct.columnar`) and require pyarrow; compression is any codec pyarrow
+supports.
+"""
+import csv
+import gzip
+import io
+import json
+import logging
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('jsonl', 'csv', 'parquet')
+
+
+class ExtractStats(NamedTuple):
+    rows: int
+    seconds: float
+    bytes: int
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class Progress(object):
+    """
+    Counts rows and calls `callback(stats)` with an ExtractStats at most every `interval` seconds.
+    """
+    def __init__(self, callback: Callable[[ExtractStats], Any] = None, interval: float = 5.0):
+        self.callback = callback
+        self.interval = interval
+        self.rows = 0
+        self.bytes = 0
+        self.started = self.reported = time.perf_counter()
+
+    def update(self, rows: int, bytes: int = None):
+        self.rows += rows
+        if bytes is not None:
+            self.bytes = bytes
+        if self.callback is not None:
+            now = time.perf_counter()
+            if now - self.reported >= self.interval:
+                self.reported = now
+                self.callback(self.stats())
+
+    def stats(self) -> ExtractStats:
+        return ExtractStats(self.rows, time.perf_counter() - self.started, self.bytes)
+
+
+def output_format(path: str, format: str = None) -> str:
+    """Returns `format`, or the format matching the extension of `path`, ignoring .gz. JSONL by default."""
+    if format:
+        if format not in FORMATS:
+            raise ValueError(f'Unsupported format {format}. Use one of {", ".join(FORMATS)}.')
+        return format
+    name = path.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    for candidate in FORMATS:
+        if name.endswith('.' + candidate):
+            return candidate
+    return 'jsonl'
+
+
+def flatten(record: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """Turns nested dicts into dotted keys."""
+    flat = {}
+    for name, value in record.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{name}.'))
+        else:
+            flat[prefix + name] = value
+    return flat
+
+
+class _CountingWriter(io.RawIOBase):
+    """Counts the bytes written to a binary file."""
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.count += len(b)
+        return self.raw.write(b)
+
+    def flush(self):
+        self.raw.flush()
+
+
+def extract(client, obj: str, path: str, query: str = '', fields: str = '*', format: str = None,
+            compression: str = None, pagesize: int = 1000, prefetch: int = 2, batch_rows: int = 10000,
+            progress: Callable[[ExtractStats], Any] = None, interval: float = 5.0) -> ExtractStats:
+    """
+    Writes the records matching `query` to a JSONL, CSV or Parquet file. See the module documentation.
+
+    :param path: The output file, or '-' for standard output (JSONL and CSV only).
+    :param format: 'jsonl', 'csv' or 'parquet'. By default it is chosen by extension.
+    :param compression: 'gzip' for JSONL and CSV; a pyarrow codec such as 'snappy' or 'zstd' for Parquet.
+    :param prefetch: Pages fetched ahead in a background thread while the previous ones are written.
+    :param batch_rows: Rows per Parquet row group. JSONL and CSV files are flushed every `batch_rows` rows.
+    :param progress: Called with an ExtractStats at most every `interval` seconds.
+    :return: The rows written, the time taken and the size of the file.
+    """
+    format = output_format(path, format)
+    tracker = Progress(progress, interval)
+    if format == 'parquet':
+        if path == '-':
+            raise ValueError('Parquet files cannot be written to standard output.')
+        _write_parquet(client, obj, path, query, fields, compression, pagesize, prefetch, batch_rows, tracker)
+        return tracker.stats()
+
+    if compression is None and path.lower().endswith('.gz'):
+        compression = 'gzip'
+    if compression not in (None, 'none', 'gzip'):
+        raise ValueError(f'Unsupported compression {compression} for {format}.')
+    raw = sys.stdout.buffer if path == '-' else open(path, 'wb')
+    counter = _CountingWriter(raw)
+    binary = gzip.GzipFile(fileobj=counter, mode='wb') if compression == 'gzip' else counter
+    f = io.TextIOWrapper(binary, encoding='utf-8', newline='' if format == 'csv' else None, write_through=False)
+    try:
+        records = client.yield_by_query(obj, query, fields, pagesize, prefetch=prefetch, as_dicts=True)
+        writer = _write_csv if format == 'csv' else _write_jsonl
+        writer(records, f, fields, batch_rows, tracker, counter)
+    finally:
+        f.detach()
+        if binary is not counter:
+            binary.close()
+        if raw is not sys.stdout.buffer:
+            raw.close()
+    tracker.bytes = counter.count
+    return tracker.stats()
+
+
+def _write_jsonl(records: Iterator[dict], f, fields: str, flush_rows: int, tracker: Progress, counter):
+    rows = 0
+    for record in records:
+        f.write(json.dumps(record))
+        f.write('\n')
+        rows += 1
+        if rows == flush_rows:
+            f.flush()
+            tracker.update(rows, counter.count)
+            rows = 0
+    tracker.update(rows)
+
+
+def _write_csv(records: Iterator[dict], f, fields: str, flush_rows: int, tracker: Progress, counter):
+    names = None if fields.strip() == '*' else [field.strip() for field in fields.split(',')]
+    writer = None
+    rows = 0
+    for record in records:
+        record = flatten(record)
+        if writer is None:
+            # With '*' the columns are those of the first record.
+            writer = csv.DictWriter(f, names or list(record), extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow(record)
+        rows += 1
+        if rows == flush_rows:
+            f.flush()
+            tracker.update(rows, counter.count)
+            rows = 0
+    if writer is None and names:
+        csv.writer(f).writerow(names)
+    tracker.update(rows)
+
+
+def _write_parquet(client, obj: str, path: str, query: str, fields: str, compression: Optional[str],
+                   pagesize: int, prefetch: int, batch_rows: int, tracker: Progress):
+    import os
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from .columnar import BatchBuilder
+
+    writer = None
+    names = None
+    try:
+        for batch in client.read_by_query_columnar(obj, query, fields, batch_rows, pagesize, prefetch=prefetch):
+            table = batch.to_arrow()
+            if writer is None:
+                names = table.column_names
+                writer = pq.ParquetWriter(path, table.schema, compression=compression or 'snappy')
+            elif table.column_names != names:
+                extra = set(table.column_names) - set(names)
+                if extra:
+                    logger.warning('Dropping fields missing from the first row group: %s', ', '.join(sorted(extra)))
+                for name in names:
+                    if name not in table.column_names:
+                        table = table.append_column(name, pa.nulls(len(table), writer.schema.field(name).type))
+                table = table.select(names).cast(writer.schema)
+            writer.write_table(table, row_group_size=batch_rows)
+            tracker.update(len(batch), os.path.getsize(path))
+        if writer is None:
+            # No records: write the columns alone.
+            types = client.describe(obj).types
+            names = list(types) if fields.strip() == '*' else [field.strip() for field in fields.split(',')]
+            table = BatchBuilder(types, names).finish().to_arrow()
+            writer = pq.ParquetWriter(path, table.schema, compression=compression or 'snappy')
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    tracker.bytes = os.path.getsize(path)
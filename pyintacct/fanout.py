@@ -0,0 +1,307 @@
+"""
+Running the same operation across many companies and entities.
+
+An IntacctAPI is bound to one company and entity. A FanOut keeps one client,
+and so one session, per tenant, shares a single connection pool between
+them, and runs operations across tenants from a thread pool:
+
+    fanout = FanOut(['ACME', 'ACME/EAST', 'GLOBEX'], sender_id='...', sender_password='...',
+                    user_id='...', user_password='...', max_workers=16, per_tenant=2)
+    for result in fanout.read_by_query('GLACCOUNTBALANCE', "PERIOD = 'Month Ended December 2024'"):
+        print(result.tenant.name, len(result.unwrap()))
+
+At most `max_workers` operations run at once in total and at most
+`per_tenant` against any one tenant. Every result is a TenantResult tagged
+with its tenant; an operation that fails for one tenant does not stop the
+others, and its exception is kept on the result.
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from .batch import MAX_FUNCTIONS_PER_REQUEST
+
+
+class Tenant(NamedTuple):
+    """A company, optionally an entity within it, and the user to log in as if it differs from the default."""
+    company_id: str
+    entity_id: Optional[str] = None
+    user_id: Optional[str] = None
+    user_password: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return f'{self.company_id}/{self.entity_id}' if self.entity_id else self.company_id
+
+    @classmethod
+    def parse(cls, tenant: Union['Tenant', str]) -> 'Tenant':
+        """Accepts a Tenant or a 'COMPANY' or 'COMPANY/ENTITY' string."""
+        if isinstance(tenant, Tenant):
+            return tenant
+        company_id, _, entity_id = tenant.partition('/')
+        return cls(company_id, entity_id or None)
+
+
+class TenantResult(NamedTuple):
+    """The outcome of an operation for one tenant. `item` is the argument the operation was called with."""
+    tenant: Tenant
+    value: Any = None
+    error: Optional[BaseException] = None
+    item: Any = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def unwrap(self) -> Any:
+        """Returns the value, or raises the operation's exception."""
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class FanOut(object):
+    """
+    Runs operations across tenants concurrently. See the module documentation.
+
+    :param tenants: Tenants or 'COMPANY' / 'COMPANY/ENTITY' strings.
+    :param max_workers: Operations running at once across all tenants. Also sizes the shared connection pool.
+    :param per_tenant: Operations running at once against one tenant, across all `run` and `map` calls.
+    :param client_factory: Creates the client of a tenant. Defaults to an IntacctAPI built from `client_kwargs`
+                           and the tenant's company, entity and user.
+    :param share_connections: Give every client the connection pool of the first one.
+    :param client_kwargs: Passed to IntacctAPI, e.g. sender_id, sender_password, user_id, user_password,
+                          session_store or policy.
+    """
+    def __init__(self, tenants: Iterable[Union[Tenant, str]], max_workers: int = 8, per_tenant: int = 2,
+                 client_factory: Callable[[Tenant], Any] = None, share_connections: bool = True, **client_kwargs):
+        self.tenants = [Tenant.parse(tenant) for tenant in tenants]
+        if len({tenant.name for tenant in self.tenants}) != len(self.tenants):
+            raise ValueError('Each tenant may only be listed once.')
+        self.max_workers = max_workers
+        self.per_tenant = per_tenant
+        self.client_factory = client_factory or self._create_client
+        self.share_connections = share_connections
+        self.client_kwargs = client_kwargs
+        self._clients: Dict[str, Any] = {}
+        self._names = {tenant.name for tenant in self.tenants}
+        self._http_client = None
+        self._lock = threading.Lock()
+        # Operations started per tenant name, shared by every run; `_freed` is notified when one finishes.
+        self._running: Dict[str, int] = {}
+        self._freed = threading.Condition(self._lock)
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stops the worker threads and closes the shared connection pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            # Not under the lock: finishing operations take it to give their slots back.
+            executor.shutdown(wait=True)
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+
+    def _create_client(self, tenant: Tenant):
+        from .client import IntacctAPI
+
+        kwargs = dict(self.client_kwargs, company_id=tenant.company_id, entity_id=tenant.entity_id)
+        if tenant.user_id is not None:
+            kwargs.update(user_id=tenant.user_id, user_password=tenant.user_password)
+        return IntacctAPI(**kwargs)
+
+    def client(self, tenant: Union[Tenant, str]):
+        """The client of a tenant, created on first use."""
+        tenant = Tenant.parse(tenant)
+        client = self._clients.get(tenant.name)
+        if client is not None:
+            return client
+        if tenant.name not in self._names:
+            raise KeyError(f'Unknown tenant {tenant.name}')
+        with self._lock:
+            client = self._clients.get(tenant.name)
+            if client is None:
+                client = self.client_factory(tenant)
+                if self.share_connections:
+                    self._share_connections(client)
+                self._clients[tenant.name] = client
+        return client
+
+    def _share_connections(self, client):
+        # Every tenant talks to the same gateway, so they can share one connection pool.
+        if self._http_client is None:
+            if 'limits' not in self.client_kwargs and hasattr(client, '_http_kwargs'):
+                import httpx
+
+                client._http_kwargs['limits'] = httpx.Limits(max_connections=self.max_workers,
+                                                             max_keepalive_connections=self.max_workers)
+            self._http_client = client.http_client
+        else:
+            client.http_client = self._http_client
+
+    def _call(self, fn: Callable, tenant: Tenant, item: Any, with_item: bool) -> TenantResult:
+        try:
+            client = self.client(tenant)
+            value = fn(client, item) if with_item else fn(client)
+        except Exception as e:
+            return TenantResult(tenant, error=e, item=item)
+        return TenantResult(tenant, value, item=item)
+
+    def _release(self, name: str, future: Future = None):
+        with self._freed:
+            self._running[name] -= 1
+            if not self._running[name]:
+                del self._running[name]
+            self._freed.notify_all()
+
+    def map(self, fn: Callable[[Any, Any], Any], tasks: Iterable[Tuple[Union[Tenant, str], Any]],
+            ordered: bool = False, lookahead: int = None) -> Iterator[TenantResult]:
+        """
+        Calls `fn(client, item)` for every (tenant, item) pair, e.g. several objects to read per tenant.
+        Results are yielded as they complete, or in task order if `ordered`.
+
+        :param lookahead: Tasks are read as slots free up. While their tenants are busy, up to this many are
+                          held back so that tasks of other tenants further on can start.
+                          Defaults to four times `max_workers`.
+        """
+        return self._run(((Tenant.parse(tenant), item, True) for tenant, item in tasks), fn, ordered, lookahead)
+
+    def run(self, fn: Callable[[Any], Any], tenants: Iterable[Union[Tenant, str]] = None,
+            ordered: bool = False) -> Iterator[TenantResult]:
+        """
+        Calls `fn(client)` once for every tenant, or for the given ones.
+        Results are yielded as they complete, or in tenant order if `ordered`.
+        """
+        tenants = self.tenants if tenants is None else [Tenant.parse(tenant) for tenant in tenants]
+        return self._run(((tenant, None, False) for tenant in tenants), fn, ordered)
+
+    def _run(self, tasks: Iterable[Tuple[Tenant, Any, bool]], fn: Callable, ordered: bool,
+             lookahead: int = None) -> Iterator[TenantResult]:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='pyintacct-fanout')
+            executor = self._executor
+        lookahead = 4 * self.max_workers if lookahead is None else max(lookahead, 1)
+        tasks = enumerate(tasks)
+        exhausted = False
+        # Tasks wait in a queue per tenant and are only submitted once their tenant has a free slot,
+        # so a worker never sits blocked while another tenant has work.
+        queues: Dict[str, deque] = {}
+        turns = deque()
+        queued = 0
+        pending: Dict[Future, int] = {}
+        finished: Dict[int, TenantResult] = {}
+
+        def take():
+            # Take tenants in turn, skipping those at `per_tenant`. Called with the lock held.
+            for _ in range(len(turns)):
+                name = turns[0]
+                turns.rotate(-1)
+                if self._running.get(name, 0) < self.per_tenant:
+                    task = queues[name].popleft()
+                    if not queues[name]:
+                        del queues[name]
+                        turns.remove(name)
+                    self._running[name] = self._running.get(name, 0) + 1
+                    return task
+            return None
+
+        def ready():
+            # Called with the lock held.
+            if any(future.done() for future in pending):
+                return True
+            return len(pending) < self.max_workers and any(self._running.get(name, 0) < self.per_tenant
+                                                           for name in turns)
+
+        next_index = 0
+        try:
+            while True:
+                # Start what the free slots allow, reading more tasks only while none of the queued ones can start.
+                while len(pending) < self.max_workers:
+                    with self._lock:
+                        task = take()
+                    if task is None:
+                        if exhausted or queued >= lookahead:
+                            break
+                        try:
+                            index, (tenant, item, with_item) = next(tasks)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        if tenant.name not in queues:
+                            queues[tenant.name] = deque()
+                            turns.append(tenant.name)
+                        queues[tenant.name].append((index, tenant, item, with_item))
+                        queued += 1
+                        continue
+                    queued -= 1
+                    index, tenant, item, with_item = task
+                    try:
+                        future = executor.submit(self._call, fn, tenant, item, with_item)
+                    except BaseException:
+                        self._release(tenant.name)
+                        raise
+                    pending[future] = index
+                    # Also called on cancellation, and after the result is set.
+                    future.add_done_callback(partial(self._release, tenant.name))
+                if not pending and not queued:
+                    return
+                # Woken when any run frees a slot, so tasks held back by another run's operations can start.
+                with self._freed:
+                    while not ready():
+                        self._freed.wait()
+                for future in [future for future in pending if future.done()]:
+                    finished[pending.pop(future)] = future.result()
+                if ordered:
+                    while next_index in finished:
+                        yield finished.pop(next_index)
+                        next_index += 1
+                else:
+                    for index in sorted(finished):
+                        yield finished.pop(index)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def read_by_query(self, obj: str, query: str = '', fields: str = '*', tenants: Iterable = None,
+                      ordered: bool = False, **kwargs) -> Iterator[TenantResult]:
+        """Runs read_by_query for every tenant; each value is the list of records. `kwargs` go to read_by_query."""
+        return self.run(lambda client: client.read_by_query(obj, query, fields, **kwargs), tenants, ordered)
+
+    def query(self, obj: str, fields, filter=None, tenants: Iterable = None, ordered: bool = False,
+              **kwargs) -> Iterator[TenantResult]:
+        """Runs the `query` function for every tenant. See `IntacctAPI.query`."""
+        return self.run(lambda client: client.query(obj, fields, filter, **kwargs), tenants, ordered)
+
+    def describe(self, obj: str, tenants: Iterable = None, ordered: bool = False) -> Iterator[TenantResult]:
+        """Inspects an object in every tenant, e.g. to compare custom fields."""
+        return self.run(lambda client: client.describe(obj), tenants, ordered)
+
+    def create_many(self, objs: Mapping[Union[Tenant, str], Iterable], transaction: bool = False,
+                    batch_size: int = MAX_FUNCTIONS_PER_REQUEST, ordered: bool = False) -> Iterator[TenantResult]:
+        """
+        Creates objects in several tenants. Each value is the list of FunctionResults from `create_many`.
+
+        :param objs: The objects to create, by tenant.
+        """
+        return self.map(lambda client, items: client.create_many(items, transaction, batch_size),
+                        list(objs.items()), ordered)
+
+
+def by_tenant(results: Iterable[TenantResult]) -> Dict[str, List[TenantResult]]:
+    """Groups results by tenant name."""
+    grouped: Dict[str, List[TenantResult]] = {}
+    for result in results:
+        grouped.setdefault(result.tenant.name, []).append(result)
+    return grouped
@@ -0,0 +1,225 @@
+"""
+Resumable bulk writes.
+
+A BulkLoad sends creates or updates in batches and records the outcome of
+every item in a WriteJournal, so a load that fails halfway can be run again
+and only sends what is unfinished:
+
+    load = BulkLoad(client, SQLiteWriteJournal('loads.db'), 'invoices-2024-10')
+    entries = load.create(invoices)
+
+Each item gets a function control id derived from the load name, the
+operation and the item's key (its position, unless a `key` function is
+given), and each request a control id derived from its items, sent with
+`uniqueid` so the gateway refuses to process the same request twice. Before
+a request is sent its items are journaled as `sent`; when the run is resumed,
+requests left in that state, whose outcome is unknown, are sent again
+unchanged. If the gateway had already processed one, it refuses it and its
+items are marked `duplicate`: they were submitted, but their individual
+results were lost and may need checking. Items that `failed` are final
+unless the load is created with `retry_failed`.
+"""
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+from uuid import NAMESPACE_URL, uuid5
+
+from .batch import MAX_FUNCTIONS_PER_REQUEST, chunked, map_results
+from .exceptions import IntacctDuplicateRequestError
+
+PENDING = 'pending'
+SENT = 'sent'
+SUCCESS = 'success'
+FAILURE = 'failure'
+DUPLICATE = 'duplicate'
+
+
+class JournalEntry(NamedTuple):
+    seq: int
+    item: str
+    controlid: str
+    status: str
+    request: Optional[str] = None
+    attempts: int = 0
+    key: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCESS, DUPLICATE)
+
+
+class WriteJournal(object):
+    """Persists the state of bulk loads. Subclass to keep it elsewhere; `record` must be atomic."""
+    def entries(self, name: str) -> Dict[str, JournalEntry]:
+        """The entries of a load by item key."""
+        raise NotImplementedError
+
+    def record(self, name: str, entries: List[JournalEntry]):
+        """Adds or replaces entries."""
+        raise NotImplementedError
+
+    def reset(self, name: str):
+        raise NotImplementedError
+
+    def summary(self, name: str) -> Dict[str, int]:
+        """The number of entries in each status."""
+        counts: Dict[str, int] = {}
+        for entry in self.entries(name).values():
+            counts[entry.status] = counts.get(entry.status, 0) + 1
+        return counts
+
+
+class MemoryWriteJournal(WriteJournal):
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, JournalEntry]] = {}
+        self._lock = threading.Lock()
+
+    def entries(self, name: str) -> Dict[str, JournalEntry]:
+        return dict(self._entries.get(name, {}))
+
+    def record(self, name: str, entries: List[JournalEntry]):
+        with self._lock:
+            self._entries.setdefault(name, {}).update((entry.item, entry) for entry in entries)
+
+    def reset(self, name: str):
+        with self._lock:
+            self._entries.pop(name, None)
+
+
+class SQLiteWriteJournal(WriteJournal):
+    """Keeps the journal in an SQLite database file."""
+    def __init__(self, path: str, timeout: float = 60):
+        self.path = path
+        self.timeout = timeout
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS journal (name TEXT, seq INTEGER, item TEXT, controlid TEXT, '
+                               'status TEXT, request TEXT, attempts INTEGER, key TEXT, error TEXT, '
+                               'PRIMARY KEY (name, item))')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def entries(self, name: str) -> Dict[str, JournalEntry]:
+        connection = self._connect()
+        try:
+            rows = connection.execute('SELECT seq, item, controlid, status, request, attempts, key, error '
+                                      'FROM journal WHERE name = ? ORDER BY seq', (name,))
+            return {row[1]: JournalEntry(*row) for row in rows}
+        finally:
+            connection.close()
+
+    def record(self, name: str, entries: List[JournalEntry]):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO journal VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                       [(name, *entry) for entry in entries])
+        finally:
+            connection.close()
+
+    def reset(self, name: str):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute('DELETE FROM journal WHERE name = ?', (name,))
+        finally:
+            connection.close()
+
+
+class BulkLoad(object):
+    """
+    Creates or updates many objects through a WriteJournal. See the module documentation.
+
+    :param client: An IntacctAPI.
+    :param journal: Where the outcome of each item is kept.
+    :param name: Identifies the load in the journal. Running a load with the same name resumes it.
+    :param transaction: If True, each request is all-or-nothing.
+    :param batch_size: Maximum number of functions per request.
+    :param key: Returns a unique key for each object, e.g. its external id. By default objects are keyed
+                by their position, so a resumed load must be given the same objects in the same order.
+    :param retry_failed: Send items that failed in a previous run again.
+    """
+    def __init__(self, client, journal: WriteJournal, name: str, transaction: bool = False,
+                 batch_size: int = MAX_FUNCTIONS_PER_REQUEST, key: Callable[[Any], str] = None,
+                 retry_failed: bool = False):
+        self.client = client
+        self.journal = journal
+        self.name = name
+        self.transaction = transaction
+        self.batch_size = batch_size
+        self.key = key
+        self.retry_failed = retry_failed
+
+    def create(self, objs: Iterable) -> List[JournalEntry]:
+        """Creates the objects not created by a previous run. Returns the journal entry of every object."""
+        return self.run('create', objs)
+
+    def update(self, objs: Iterable) -> List[JournalEntry]:
+        """Updates the objects not updated by a previous run. See `create`."""
+        return self.run('update', objs)
+
+    def controlid(self, operation: str, item: str) -> str:
+        return str(uuid5(NAMESPACE_URL, f'pyintacct:{self.name}:{operation}:{item}'))
+
+    def request_id(self, entries: List[JournalEntry]) -> str:
+        # Derived from the items and their attempt, so resending a failed item is a new request.
+        return str(uuid5(NAMESPACE_URL, f'pyintacct:{self.name}:' +
+                         ','.join(f'{entry.controlid}.{entry.attempts}' for entry in entries)))
+
+    def run(self, operation: str, objs: Iterable) -> List[JournalEntry]:
+        objs = list(objs)
+        make = {'create': self.client.create_function, 'update': self.client.update_function}[operation]
+        journaled = self.journal.entries(self.name)
+        entries: List[JournalEntry] = []
+        for seq, obj in enumerate(objs):
+            item = str(self.key(obj)) if self.key is not None else str(seq)
+            controlid = self.controlid(operation, item)
+            entry = journaled.get(item)
+            if entry is None:
+                entry = JournalEntry(seq, item, controlid, PENDING)
+            elif entry.controlid != controlid:
+                raise ValueError(f'Item {item} of load {self.name} was journaled for a different operation.')
+            entries.append(entry._replace(seq=seq))
+        if len({entry.item for entry in entries}) != len(entries):
+            raise ValueError('The keys of the objects in a load must be unique.')
+
+        # Requests whose outcome is unknown are resent as they were, then everything unsent is batched.
+        in_doubt: Dict[str, List[int]] = {}
+        unsent = []
+        for seq, entry in enumerate(entries):
+            if entry.status == SENT:
+                in_doubt.setdefault(entry.request, []).append(seq)
+            elif entry.status == PENDING or entry.status == FAILURE and self.retry_failed:
+                unsent.append(seq)
+        batches = [(request, seqs) for request, seqs in in_doubt.items()]
+        batches += [(None, seqs) for seqs in chunked(unsent, self.batch_size)]
+        for request, seqs in batches:
+            for seq, entry in zip(seqs, self._send(make, objs, [entries[seq] for seq in seqs], request)):
+                entries[seq] = entry
+        return entries
+
+    def _send(self, make, objs: list, entries: List[JournalEntry], request: Optional[str]) -> List[JournalEntry]:
+        if request is None:
+            entries = [entry._replace(attempts=entry.attempts + 1) for entry in entries]
+            request = self.request_id(entries)
+        entries = [entry._replace(status=SENT, request=request, key=None, error=None) for entry in entries]
+        self.journal.record(self.name, entries)
+        functions = [make(objs[entry.seq], entry.controlid) for entry in entries]
+        payload = self.client.get_payload(functions, self.transaction, controlid=request, uniqueid=True)
+        try:
+            response = self.client.execute(payload, validate=False)
+        except IntacctDuplicateRequestError as e:
+            entries = [entry._replace(status=DUPLICATE, error=str(e).strip()) for entry in entries]
+        else:
+            results = map_results(response, [entry.controlid for entry in entries], [None] * len(entries))
+            entries = [self._outcome(entry, result) for entry, result in zip(entries, results)]
+        self.journal.record(self.name, entries)
+        return entries
+
+    @staticmethod
+    def _outcome(entry: JournalEntry, result) -> JournalEntry:
+        if result.ok:
+            return entry._replace(status=SUCCESS, key=result.key)
+        return entry._replace(status=FAILURE, error=result.error.strip())
+
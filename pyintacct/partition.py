@@ -0,0 +1,121 @@
+"""
+Parallel extraction of one object by splitting its query into disjoint key ranges.
+
+A readByQuery result set can only be paged serially through readMore, so a
+large object is split into ranges of a key such as RECORDNO or WHENMODIFIED
+and each range is read as its own result set, concurrently.
+
+The first range is open below and the last is open above, so the ranges cover
+every record whatever the boundaries are; boundaries only affect how evenly the
+work is divided.
+"""
+from datetime import date, datetime
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from .prefetch import chained, merged
+
+
+def literal(value: Any) -> str:
+    """Formats a value for use in a readByQuery query."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, datetime):
+        return f"'{value:%m/%d/%Y %H:%M:%S}'"
+    if isinstance(value, date):
+        return f"'{value:%m/%d/%Y}'"
+    value = str(value).replace("'", "\\'")
+    return f"'{value}'"
+
+
+def combine(query: str, condition: str) -> str:
+    return f'({query}) AND {condition}' if query and query.strip() else condition
+
+
+def partition_queries(query: str, key: str, boundaries: Sequence[Any]) -> List[str]:
+    """
+    Splits `query` into len(boundaries) + 1 queries over disjoint ranges of `key`.
+
+    :param boundaries: Ascending values of `key` at which a new range starts.
+    """
+    boundaries = sorted(boundaries)
+    if not boundaries:
+        return [query]
+    conditions = [f'{key} < {literal(boundaries[0])}']
+    for lower, upper in zip(boundaries, boundaries[1:]):
+        conditions.append(f'{key} >= {literal(lower)} AND {key} < {literal(upper)}')
+    conditions.append(f'{key} >= {literal(boundaries[-1])}')
+    return [combine(query, condition) for condition in conditions]
+
+
+def _probe(client, obj: str, query: str, key: str) -> Tuple[int, Optional[str]]:
+    """Returns the number of records matching `query` and the key of the first one, using a one-record page."""
+    response = client.execute(client.read_by_query_payload(obj, query, key, 1))
+    data = next(response.find_nodes_with_tag('data'))
+    total = int(data.get_xml_attr('totalcount', data.get_xml_attr('count', '0')))
+    for record in data.find_nodes_with_tag(obj.lower()):
+        return total, str(record.get(key))
+    return total, None
+
+
+def probe_boundaries(client, obj: str, query: str = '', key: str = 'RECORDNO', partitions: int = 4) -> List[int]:
+    """
+    Chooses boundaries splitting an integer key into `partitions` ranges of equal width, using count probes.
+
+    The lower bound is the key of the first record returned and the upper bound is
+    found by searching for the smallest value with no larger keys. Keys are
+    distinct, so the search starts at lower + count - 1 and takes one probe when
+    keys are dense.
+    """
+    total, first = _probe(client, obj, query, key)
+    if total == 0 or first is None or partitions < 2:
+        return []
+    lower = int(first)
+
+    def any_above(value):
+        return _probe(client, obj, combine(query, f'{key} > {value}'), key)[0] > 0
+
+    below, upper = lower, lower + max(total - 1, 1)
+    while any_above(upper):
+        below, upper = upper, lower + (upper - lower) * 2
+    # Refine the upper bound until it is within a fraction of a partition.
+    tolerance = max((upper - lower) // (partitions * 8), 1)
+    while upper - below > tolerance:
+        middle = (below + upper) // 2
+        if any_above(middle):
+            below = middle
+        else:
+            upper = middle
+    width = (upper - lower + 1) / partitions
+    boundaries = sorted({lower + round(width * i) for i in range(1, partitions)})
+    return [boundary for boundary in boundaries if lower < boundary <= upper]
+
+
+def yield_partitioned(client, obj: str, query: str = '', fields: str = '*', key: str = 'RECORDNO',
+                      partitions: int = 4, boundaries: Sequence[Any] = None, max_workers: int = None,
+                      ordered: bool = False, pagesize: int = 1000, buffer_pages: int = 2,
+                      **kwargs) -> Iterator[Any]:
+    """
+    Reads the records matching `query` by running a yield_by_query per key range concurrently.
+
+    :param client: An IntacctAPI. It is shared by the worker threads.
+    :param key: The field to partition on.
+    :param partitions: The number of ranges when boundaries are probed automatically (integer keys only).
+    :param boundaries: Ascending values of `key` at which a new range starts. Use these for non-integer
+                       keys such as WHENMODIFIED, or to reuse known splits.
+    :param max_workers: Maximum number of ranges read at once. Defaults to the number of ranges.
+    :param ordered: If True, records are yielded range by range, in ascending key-range order; later ranges
+                    are fetched ahead while earlier ones are consumed. Otherwise records are yielded as they
+                    arrive from any range.
+    :param buffer_pages: Pages buffered per running range, bounding memory to roughly
+                         max_workers * buffer_pages * pagesize records.
+    :param kwargs: Passed to yield_by_query, e.g. model or as_tuples.
+    """
+    if boundaries is None:
+        boundaries = probe_boundaries(client, obj, query, key, partitions)
+    queries = partition_queries(query, key, boundaries)
+    max_workers = max_workers or len(queries)
+    depth = buffer_pages * pagesize
+    readers = (client.yield_by_query(obj, q, fields, pagesize, **kwargs) for q in queries)
+    if ordered:
+        return chained(readers, max_workers, depth)
+    return merged(readers, max_workers, depth * max_workers)
@@ -0,0 +1,174 @@
+import asyncio
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+_DONE = object()
+
+
+class _Failure(object):
+    __slots__ = ('error',)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class _Buffer(object):
+    """A bounded queue between producer threads and a consumer which can be abandoned by the consumer."""
+    def __init__(self, depth: int):
+        self.queue = queue.Queue(maxsize=depth)
+        self.stop = threading.Event()
+
+    def put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def drain(self, iterable: Iterable, done=_DONE):
+        try:
+            for item in iterable:
+                if self.stop.is_set():
+                    return
+                self.put(item)
+            self.put(done)
+        except BaseException as e:
+            self.put(_Failure(e))
+
+    def get(self):
+        item = self.queue.get()
+        if isinstance(item, _Failure):
+            raise item.error
+        return item
+
+
+class Prefetcher(object):
+    """
+    Starts iterating `iterable` in a background thread as soon as it is created, keeping at most
+    `depth` items buffered ahead of the consumer. Exceptions raised while producing an item are
+    re-raised to the consumer at that position. Call `close` to stop early.
+    """
+    def __init__(self, iterable: Iterable[T], depth: int):
+        self._buffer = _Buffer(depth)
+        self._finished = False
+        thread = threading.Thread(target=self._buffer.drain, args=(iterable,), name='pyintacct-prefetch',
+                                  daemon=True)
+        thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> T:
+        if self._finished:
+            raise StopIteration
+        try:
+            item = self._buffer.get()
+        except BaseException:
+            self.close()
+            raise
+        if item is _DONE:
+            self.close()
+            raise StopIteration
+        return item
+
+    def close(self):
+        self._finished = True
+        self._buffer.stop.set()
+
+    def __del__(self):
+        self._buffer.stop.set()
+
+
+def prefetched(iterable: Iterable[T], depth: int) -> Iterator[T]:
+    """
+    Iterates `iterable` in a background thread, keeping at most `depth` items buffered ahead of the consumer.
+    The thread starts on the first call to next().
+    """
+    prefetcher = Prefetcher(iterable, depth)
+    try:
+        yield from prefetcher
+    finally:
+        # Stops the producer if the consumer gives up early.
+        prefetcher.close()
+
+
+def chained(iterables: Iterable[Iterable[T]], max_workers: int, depth: int) -> Iterator[T]:
+    """
+    Yields every item of each iterable in turn, while up to `max_workers` of the
+    following iterables are already being produced in background threads.
+    Each buffers at most `depth` items.
+    """
+    iterables = iter(iterables)
+    window = deque(Prefetcher(iterable, depth) for iterable in islice(iterables, max_workers))
+    try:
+        while window:
+            yield from window[0]
+            window.popleft()
+            for iterable in islice(iterables, 1):
+                window.append(Prefetcher(iterable, depth))
+    finally:
+        for prefetcher in window:
+            prefetcher.close()
+
+
+def merged(iterables: Iterable[Iterable[T]], max_workers: int, depth: int) -> Iterator[T]:
+    """
+    Yields the items of all iterables in the order they are produced, consuming
+    up to `max_workers` of them at once in background threads. At most `depth`
+    items are buffered in total.
+    """
+    iterables = list(iterables)
+    buffer = _Buffer(depth)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pyintacct-merge')
+    done = object()
+    futures = [executor.submit(buffer.drain, iterable, done) for iterable in iterables]
+    try:
+        remaining = len(iterables)
+        while remaining:
+            item = buffer.get()
+            if item is done:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        buffer.stop.set()
+        # Iterables that have not started would still make their first request.
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+async def aprefetched(iterable: AsyncIterable[T], depth: int) -> AsyncIterator[T]:
+    """
+    The asyncio version of `prefetched`, producing items in a background task.
+    """
+    buffer = asyncio.Queue(maxsize=depth)
+
+    async def produce():
+        try:
+            async for item in iterable:
+                await buffer.put(item)
+            await buffer.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await buffer.put(_Failure(e))
+
+    task = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        task.cancel()
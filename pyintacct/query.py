@@ -0,0 +1,232 @@
+"""
+The `query` function: typed filters and offset pagination.
+
+Unlike readByQuery, whose pages must be read one after another with readMore,
+`query` takes an offset, so once the first page has returned the total count
+every other page can be requested at once:
+
+    from pyintacct.query import Field
+
+    active = (Field('STATUS') == 'active') & (Field('WHENMODIFIED') >= datetime(2024, 1, 1))
+    for vendor in client.yield_query('VENDOR', ['VENDORID', 'NAME'], active, max_workers=8):
+        ...
+
+Pages arrive in whatever order they complete unless `ordered` is set. Offsets
+only address the same records from request to request if the order is fixed,
+so results are sorted by RECORDNO unless another `orderby` is given.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Tuple, Union
+
+from jxmlease import XMLDictNode
+
+# The gateway caps `query` pages at this many records.
+MAX_PAGESIZE = 2000
+
+
+def value_text(value: Any) -> str:
+    """Formats a filter value the way the gateway expects it."""
+    if isinstance(value, datetime):
+        return value.strftime('%m/%d/%Y %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%m/%d/%Y')
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class Filter(object):
+    """A query filter. Combine filters with `&` and `|`."""
+    def node(self) -> Tuple[str, Any]:
+        """The element of the filter as a (tag, content) pair."""
+        raise NotImplementedError
+
+    def to_xml(self) -> XMLDictNode:
+        tag, content = self.node()
+        return XMLDictNode({tag: content})
+
+    def __and__(self, other: 'Filter') -> 'Filter':
+        return Group('and', [self, other])
+
+    def __or__(self, other: 'Filter') -> 'Filter':
+        return Group('or', [self, other])
+
+
+class Condition(Filter):
+    __slots__ = ('operator', 'field', 'values')
+
+    def __init__(self, operator: str, field: str, values: Sequence[Any] = ()):
+        self.operator = operator
+        self.field = field
+        self.values = [value_text(value) for value in values]
+
+    def __repr__(self):
+        return f'Condition({self.operator!r}, {self.field!r}, {self.values!r})'
+
+    def node(self) -> Tuple[str, Any]:
+        content: Dict[str, Any] = {'field': self.field}
+        if self.values:
+            content['value'] = self.values if len(self.values) > 1 else self.values[0]
+        return self.operator, content
+
+
+class Group(Filter):
+    __slots__ = ('operator', 'filters')
+
+    def __init__(self, operator: str, filters: Iterable[Filter]):
+        self.operator = operator
+        self.filters = []
+        for f in filters:
+            # (a & b) & c becomes a single <and> with three children.
+            self.filters.extend(f.filters if isinstance(f, Group) and f.operator == operator else [f])
+
+    def __repr__(self):
+        return f'Group({self.operator!r}, {self.filters!r})'
+
+    def node(self) -> Tuple[str, Any]:
+        content: Dict[str, List[Any]] = {}
+        for f in self.filters:
+            tag, child = f.node()
+            content.setdefault(tag, []).append(child)
+        return self.operator, content
+
+
+def all_of(*filters: Filter) -> Filter:
+    return filters[0] if len(filters) == 1 else Group('and', filters)
+
+
+def any_of(*filters: Filter) -> Filter:
+    return filters[0] if len(filters) == 1 else Group('or', filters)
+
+
+class Field(object):
+    """
+    A field to filter on. Comparison operators and the methods below return Conditions:
+
+        Field('TOTALDUE') > 0
+        Field('VENDORID').isin(['V1', 'V2'])
+        Field('WHENDUE').between(date(2024, 1, 1), date(2024, 3, 31))
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f'Field({self.name!r})'
+
+    def __eq__(self, value) -> Condition:
+        return Condition('equalto', self.name, [value])
+
+    def __ne__(self, value) -> Condition:
+        return Condition('notequalto', self.name, [value])
+
+    def __lt__(self, value) -> Condition:
+        return Condition('lessthan', self.name, [value])
+
+    def __le__(self, value) -> Condition:
+        return Condition('lessthanorequalto', self.name, [value])
+
+    def __gt__(self, value) -> Condition:
+        return Condition('greaterthan', self.name, [value])
+
+    def __ge__(self, value) -> Condition:
+        return Condition('greaterthanorequalto', self.name, [value])
+
+    __hash__ = None
+
+    def between(self, low, high) -> Condition:
+        return Condition('between', self.name, [low, high])
+
+    def isin(self, values: Iterable) -> Condition:
+        return Condition('in', self.name, list(values))
+
+    def notin(self, values: Iterable) -> Condition:
+        return Condition('notin', self.name, list(values))
+
+    def like(self, pattern: str) -> Condition:
+        """Matches a pattern where % is any run of characters and _ any one character."""
+        return Condition('like', self.name, [pattern])
+
+    def notlike(self, pattern: str) -> Condition:
+        return Condition('notlike', self.name, [pattern])
+
+    def isnull(self) -> Condition:
+        return Condition('isnull', self.name)
+
+    def isnotnull(self) -> Condition:
+        return Condition('isnotnull', self.name)
+
+
+def field_names(fields: Union[str, Iterable[str]]) -> List[str]:
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    names = [name.strip() for name in fields if name.strip()]
+    if not names or '*' in names:
+        raise ValueError('The query function needs the fields to select; it does not accept *.')
+    return names
+
+
+def page_size(pagesize: int) -> int:
+    """Caps `pagesize` at MAX_PAGESIZE, as the gateway would, and rejects sizes below one."""
+    pagesize = int(pagesize)
+    if pagesize < 1:
+        raise ValueError(f'The query page size must be at least 1, not {pagesize}.')
+    return min(pagesize, MAX_PAGESIZE)
+
+
+def order_node(orderby: Union[str, Iterable[str]]) -> Dict[str, Any]:
+    """Builds <orderby> content from field names; a leading '-' sorts that field in descending order."""
+    if isinstance(orderby, str):
+        orderby = orderby.split(',')
+    orders = []
+    for name in orderby:
+        name = name.strip()
+        descending = name.startswith('-')
+        orders.append({'field': name.lstrip('-'), 'descending' if descending else 'ascending': None})
+    return {'order': orders}
+
+
+class QueryPage(NamedTuple):
+    """One page of a `query` result: its records, the offset of the first one and the total count."""
+    records: List[XMLDictNode]
+    offset: int
+    total: int
+    remaining: int
+
+
+def parse_query_page(response: XMLDictNode, obj: str) -> QueryPage:
+    data = next(response.find_nodes_with_tag('data'))
+    records = list(data.find_nodes_with_tag(obj.upper()))
+    return QueryPage(records, int(data.get_xml_attr('offset', 0)), int(data.get_xml_attr('totalcount', 0)),
+                     int(data.get_xml_attr('numremaining', 0)))
+
+
+def fetch_pages(fetch: Callable[[int], QueryPage], offsets: Sequence[int], max_workers: int,
+                ordered: bool) -> Iterator[QueryPage]:
+    """
+    Calls `fetch(offset)` for every offset using up to `max_workers` threads, yielding pages as they complete,
+    or in offset order if `ordered`. At most `max_workers * 2` pages are requested or held at once.
+    """
+    offsets = iter(offsets)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pyintacct-query')
+    pending = deque()
+    try:
+        pending.extend(executor.submit(fetch, offset) for offset in islice(offsets, max_workers * 2))
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(f for f in pending if f in done)
+                pending.remove(future)
+            page = future.result()
+            pending.extend(executor.submit(fetch, offset) for offset in islice(offsets, 1))
+            yield page
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -0,0 +1,230 @@
+"""
+In-memory indexes of reference data, such as locations, departments, vendors
+and customers, used to resolve and validate dimension keys without a request
+per lookup.
+"""
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .decode import record_value
+from .delta import TIMESTAMP_FORMAT
+from .exceptions import IntacctException
+from .partition import combine, literal
+
+# Maps the reference fields found on transactions and their lines to the object and key field they refer to.
+REFERENCE_FIELDS: Dict[str, Tuple[str, str]] = {
+    'locationid': ('LOCATION', 'LOCATIONID'),
+    'departmentid': ('DEPARTMENT', 'DEPARTMENTID'),
+    'customerid': ('CUSTOMER', 'CUSTOMERID'),
+    'vendorid': ('VENDOR', 'VENDORID'),
+    'employeeid': ('EMPLOYEE', 'EMPLOYEEID'),
+    'itemid': ('ITEM', 'ITEMID'),
+    'classid': ('CLASS', 'CLASSID'),
+    'projectid': ('PROJECT', 'PROJECTID'),
+    'contractid': ('CONTRACT', 'CONTRACTID'),
+    'warehouseid': ('WAREHOUSE', 'WAREHOUSEID'),
+    'glaccountno': ('GLACCOUNT', 'ACCOUNTNO'),
+}
+
+
+class _Index(NamedTuple):
+    records: Dict[str, Any]
+    keys: List[str]
+
+
+class ReferenceIndex(object):
+    """
+    All records of one object, loaded once with yield_by_query and indexed by `key`.
+
+    The index is loaded on first use. Once `ttl` seconds have passed, the next
+    lookup first reads the records modified since the latest WHENMODIFIED seen.
+    Deleted records, and records which no longer match `query`, are only dropped
+    by `reload`.
+
+    :param client: An IntacctAPI.
+    :param key: The field records are indexed by.
+    :param query: readByQuery filter, e.g. "STATUS = 'active'".
+    :param fields: Fields to read. `key` and WHENMODIFIED are always included.
+    :param ttl: Seconds between incremental refreshes. None never refreshes.
+    :param kwargs: Passed to yield_by_query, e.g. model or as_dicts.
+    """
+    timestamp_field = 'WHENMODIFIED'
+
+    def __init__(self, client, obj: str, key: str, query: str = '', fields: str = '*', ttl: Optional[float] = 3600,
+                 pagesize: int = 1000, **kwargs):
+        if kwargs.get('as_tuples'):
+            raise ValueError('ReferenceIndex needs named fields; use as_dicts or model instead of as_tuples.')
+        self.client = client
+        self.obj = obj
+        self.key = key
+        self.query = query
+        self.fields = fields if fields.strip() == '*' else ','.join(
+            dict.fromkeys([f.strip() for f in fields.split(',')] + [key, self.timestamp_field]))
+        self.ttl = ttl
+        self.pagesize = pagesize
+        self.kwargs = kwargs
+        self._index = _Index({}, [])
+        self._modified: Optional[datetime] = None
+        self._loaded: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def _read(self, query: str, records: Dict[str, Any], latest: Optional[datetime]) -> int:
+        # Lookups don't take the lock, so the new index is built aside and swapped in whole.
+        count = 0
+        for record in self.client.yield_by_query(self.obj, query, self.fields, self.pagesize, **self.kwargs):
+            records[str(record_value(record, self.key))] = record
+            modified = record_value(record, self.timestamp_field)
+            if modified:
+                modified = datetime.strptime(str(modified), TIMESTAMP_FORMAT)
+                if latest is None or modified > latest:
+                    latest = modified
+            count += 1
+        self._index = _Index(records, sorted(records))
+        self._modified = latest
+        self._loaded = time.monotonic()
+        return count
+
+    def reload(self) -> int:
+        """Replaces the index with every record matching `query`, returning the number read."""
+        with self._lock:
+            return self._read(self.query, {}, None)
+
+    def refresh(self) -> int:
+        """Reads the records modified since the last load or refresh, returning the number read."""
+        with self._lock:
+            if self._loaded is None or self._modified is None:
+                return self.reload()
+            return self._read(combine(self.query, f'{self.timestamp_field} >= {literal(self._modified)}'),
+                              dict(self._index.records), self._modified)
+
+    def _fresh(self):
+        if self._loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    self.reload()
+        elif self.ttl is not None and time.monotonic() - self._loaded >= self.ttl:
+            self.refresh()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self._fresh()
+        return self._index.records.get(str(key), default)
+
+    def __getitem__(self, key: str) -> Any:
+        self._fresh()
+        return self._index.records[str(key)]
+
+    def __contains__(self, key: str) -> bool:
+        self._fresh()
+        return str(key) in self._index.records
+
+    def __len__(self) -> int:
+        self._fresh()
+        return len(self._index.records)
+
+    def keys(self) -> List[str]:
+        """The keys in ascending order."""
+        self._fresh()
+        return list(self._index.keys)
+
+    def prefix(self, prefix: str) -> List[Any]:
+        """The records whose key starts with `prefix`, in key order."""
+        self._fresh()
+        index = self._index
+        keys = index.keys
+        records = []
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            records.append(index.records[keys[i]])
+        return records
+
+    def range(self, lower: str = None, upper: str = None) -> List[Any]:
+        """The records with lower <= key < upper, in key order. Keys are compared as strings."""
+        self._fresh()
+        index = self._index
+        keys = index.keys
+        start = bisect_left(keys, lower) if lower is not None else 0
+        end = bisect_left(keys, upper) if upper is not None else len(keys)
+        return [index.records[key] for key in keys[start:end]]
+
+
+class MissingReference(NamedTuple):
+    """A reference which does not resolve. `path` locates the field in the validated object."""
+    path: str
+    field: str
+    object: str
+    value: str
+
+
+def find_references(value: Any, fields: Dict[str, Tuple[str, str]], path: str = '') -> Iterator[Tuple[str, str, Any]]:
+    """Yields (path, field, value) for each non-empty reference field in a model, dict or list, recursively."""
+    if isinstance(value, BaseModel):
+        items = ((name, getattr(value, name)) for name in type(value).model_fields)
+    elif isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, (list, tuple)):
+        for i, item in enumerate(value):
+            yield from find_references(item, fields, f'{path}[{i}]')
+        return
+    else:
+        return
+    for name, item in items:
+        item_path = f'{path}.{name}' if path else str(name)
+        if str(name).lower() in fields and item is not None and not isinstance(item, (dict, list, BaseModel)):
+            if str(item):
+                yield item_path, str(name).lower(), item
+        else:
+            yield from find_references(item, fields, item_path)
+
+
+class ReferenceData(object):
+    """
+    A set of ReferenceIndexes, created on demand, for validating transactions before they are created.
+
+        refdata = ReferenceData(client, query="STATUS = 'active'")
+        refdata.validate(invoice)  # raises IntacctException listing unknown references
+        client.create(invoice)
+
+    :param fields: Maps reference field names, lower case, to their (object, key field).
+    :param kwargs: Passed to each ReferenceIndex, e.g. query, ttl or fields.
+    """
+    def __init__(self, client, fields: Dict[str, Tuple[str, str]] = None, **kwargs):
+        self.client = client
+        self.fields = {name.lower(): target for name, target in (fields or REFERENCE_FIELDS).items()}
+        self.kwargs = kwargs
+        self._indexes: Dict[str, ReferenceIndex] = {}
+        self._lock = threading.Lock()
+
+    def index(self, obj: str) -> ReferenceIndex:
+        obj = obj.upper()
+        with self._lock:
+            if obj not in self._indexes:
+                keys = {key for target, key in self.fields.values() if target == obj}
+                if len(keys) != 1:
+                    raise ValueError(f'No single key field is configured for {obj}.')
+                self._indexes[obj] = ReferenceIndex(self.client, obj, keys.pop(), **self.kwargs)
+            return self._indexes[obj]
+
+    def lookup(self, obj: str, key: str, default: Any = None) -> Any:
+        return self.index(obj).get(key, default)
+
+    def missing(self, value: Any) -> List[MissingReference]:
+        """Lists the references in a model, dict or list of them which do not resolve."""
+        missing = []
+        for path, field, key in find_references(value, self.fields):
+            obj = self.fields[field][0]
+            if key not in self.index(obj):
+                missing.append(MissingReference(path, field, obj, str(key)))
+        return missing
+
+    def validate(self, value: Any):
+        """Raises IntacctException if any reference in `value` does not resolve."""
+        missing = self.missing(value)
+        if missing:
+            raise IntacctException('Unknown references: ' + '; '.join(
+                f'{m.path} = {m.value!r} ({m.object})' for m in missing))
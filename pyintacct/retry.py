@@ -0,0 +1,189 @@
+import random
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Iterable, Optional, TypeVar
+
+import httpx
+
+from .exceptions import IntacctRateLimitError, IntacctServerError
+
+T = TypeVar('T')
+
+# Functions which can be repeated without side effects.
+IDEMPOTENT_FUNCTIONS = frozenset({
+    'getAPISession', 'inspect', 'lookup', 'query', 'read', 'readByName', 'readByQuery', 'readMore',
+    'readRelated', 'readReport', 'readView', 'readEntityDetails', 'getDimensions', 'getDimensionRelationships',
+})
+THROTTLE_PATTERN = r'(?i)too many|concurren|rate limit|throttl|try again later'
+
+
+class TokenBucket(object):
+    """Allows `rate` requests per second on average, with bursts of up to `burst` requests."""
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token, returning how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class AdaptiveLimit(object):
+    """
+    A concurrency limit adjusted AIMD-style: it grows by roughly one slot per
+    `limit` successful requests and is multiplied by `decrease` when a request
+    is throttled, at most once per `cooldown` seconds.
+    """
+    def __init__(self, initial: float = 4, minimum: float = 1, maximum: float = 64, decrease: float = 0.5,
+                 cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._decreased = 0.0
+        self._condition = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < max(int(self.limit), 1):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= max(int(self.limit), 1):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._decreased >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._decreased = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class RetryPolicy(object):
+    """
+    Paces requests and retries them when the gateway is overloaded.
+
+    Before each request a token is taken from the optional token bucket and a
+    slot from the adaptive concurrency limit. HTTP 429 and 5xx responses,
+    timeouts and errors matching `throttle_pattern` count as throttling and
+    shrink the limit. Requests made only of idempotent functions are retried
+    after exponential backoff with full jitter; others fail immediately.
+
+    :param max_attempts: Total attempts per request, including the first.
+    :param backoff_base: Backoff before the first retry is drawn from [0, backoff_base] seconds.
+    :param backoff_max: Upper bound on any backoff.
+    :param rate: Requests per second allowed by the token bucket. None disables it.
+    :param burst: Token bucket size.
+    :param limit: The AdaptiveLimit to use. None creates one with default settings.
+    """
+    def __init__(self, max_attempts: int = 5, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 rate: float = None, burst: int = 1, limit: AdaptiveLimit = None,
+                 idempotent_functions: Iterable[str] = IDEMPOTENT_FUNCTIONS,
+                 throttle_pattern: str = THROTTLE_PATTERN):
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.limit = limit or AdaptiveLimit()
+        self.idempotent_functions = frozenset(idempotent_functions)
+        self.throttle_pattern = re.compile(throttle_pattern)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def retryable(self, functions: Iterable[str]) -> bool:
+        functions = list(functions)
+        return bool(functions) and all(function in self.idempotent_functions for function in functions)
+
+    def is_throttled(self, error: BaseException) -> bool:
+        if isinstance(error, (IntacctServerError, IntacctRateLimitError, httpx.TimeoutException)):
+            return True
+        return bool(self.throttle_pattern.search(str(error)))
+
+    def should_retry(self, error: BaseException, retryable: bool, attempt: int) -> bool:
+        if not retryable or attempt + 1 >= self.max_attempts:
+            return False
+        return self.is_throttled(error) or isinstance(error, httpx.TransportError)
+
+    def acquire(self):
+        if self.bucket is not None:
+            time.sleep(self.bucket.reserve())
+        self.limit.acquire()
+
+    async def acquire_async(self):
+        import asyncio
+
+        if self.bucket is not None:
+            await asyncio.sleep(self.bucket.reserve())
+        while not self.limit.try_acquire():
+            await asyncio.sleep(0.01)
+
+    def call(self, functions: Iterable[str], attempt: Callable[[], T],
+             on_retry: Optional[Callable[[int, BaseException, float], None]] = None) -> T:
+        """Runs `attempt` under the policy, retrying it if allowed."""
+        retryable = self.retryable(functions)
+        n = 0
+        while True:
+            self.acquire()
+            throttled = False
+            try:
+                return attempt()
+            except Exception as e:
+                throttled = self.is_throttled(e)
+                if not self.should_retry(e, retryable, n):
+                    raise
+                error = e
+            finally:
+                # Also on cancellation and other BaseExceptions, or the slot would be lost for good.
+                self.limit.release(throttled)
+            delay = self.backoff(n)
+            if on_retry is not None:
+                on_retry(n, error, delay)
+            time.sleep(delay)
+            n += 1
+
+    async def call_async(self, functions: Iterable[str], attempt: Callable[[], Awaitable[T]],
+                         on_retry: Optional[Callable[[int, BaseException, float], None]] = None) -> T:
+        """The asyncio version of `call`."""
+        import asyncio
+
+        retryable = self.retryable(functions)
+        n = 0
+        while True:
+            await self.acquire_async()
+            throttled = False
+            try:
+                return await attempt()
+            except Exception as e:
+                throttled = self.is_throttled(e)
+                if not self.should_retry(e, retryable, n):
+                    raise
+                error = e
+            finally:
+                self.limit.release(throttled)
+            delay = self.backoff(n)
+            if on_retry is not None:
+                on_retry(n, error, delay)
+            await asyncio.sleep(delay)
+            n += 1
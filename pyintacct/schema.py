@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from jxmlease import XMLDictNode
+
+from .exceptions import IntacctException
+
+logger = logging.getLogger(__name__)
+
+
+class FieldInfo(NamedTuple):
+    """A field definition from `inspect`. Only `name` is known when inspected without detail."""
+    name: str
+    datatype: Optional[str] = None
+    label: Optional[str] = None
+    required: Optional[bool] = None
+    readonly: Optional[bool] = None
+    max_length: Optional[int] = None
+
+
+def _first(node: XMLDictNode, *tags) -> Optional[str]:
+    for tag in tags:
+        value = node.get(tag)
+        if value is not None and not isinstance(value, dict):
+            return str(value)
+    return None
+
+
+def _bool(value: Optional[str]) -> Optional[bool]:
+    return None if value is None else value.strip().lower() == 'true'
+
+
+def parse_fields(response: XMLDictNode) -> Tuple[FieldInfo, ...]:
+    """Extracts the field definitions from an `inspect` response."""
+    fields = []
+    for node in response.find_nodes_with_tag('Field'):
+        if not isinstance(node, dict):
+            fields.append(FieldInfo(str(node)))
+            continue
+        name = _first(node, 'Name', 'ID', 'dataName')
+        if not name:
+            continue
+        max_length = _first(node, 'maxLength')
+        fields.append(FieldInfo(
+            name=name,
+            datatype=(_first(node, 'DATATYPE', 'dataType', 'type', 'Type') or '').upper() or None,
+            label=_first(node, 'DisplayLabel', 'LABEL'),
+            required=_bool(_first(node, 'isRequired', 'REQUIRED')),
+            readonly=_bool(_first(node, 'isReadOnly', 'READONLY')),
+            max_length=int(max_length) if max_length and max_length.isdigit() else None))
+    return tuple(fields)
+
+
+def field_types(fields: Tuple[FieldInfo, ...]) -> Dict[str, str]:
+    """Maps field names to their Intacct data types, for fields inspected with detail."""
+    return {field.name: field.datatype for field in fields if field.datatype}
+
+
+class ObjectSchema(NamedTuple):
+    """The parsed `inspect` result for one object."""
+    object: str
+    fields: Tuple[FieldInfo, ...]
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(field.name for field in self.fields)
+
+    @property
+    def types(self) -> Dict[str, str]:
+        return field_types(self.fields)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def get(self, name: str) -> Optional[FieldInfo]:
+        for field in self.fields:
+            if field.name == name:
+                return field
+        return None
+
+    def check(self, names: Iterable[str]):
+        """
+        Raises IntacctException naming any of `names` that are not fields of the object, ignoring case.
+        Dotted names, which read fields of related objects, are not checked.
+        """
+        known = {name.upper() for name in self.names}
+        unknown = [name for name in names if '.' not in name and name.upper() not in known]
+        if unknown:
+            raise IntacctException(f'Unknown fields for {self.object}: {", ".join(unknown)}')
+
+
+class MetadataCache(object):
+    """
+    Caches ObjectSchemas for `ttl` seconds, optionally persisting them to a JSON file
+    so they survive restarts. Entries are keyed by company, entity, object and detail level.
+    """
+    def __init__(self, ttl: float = 24 * 3600, path: str = None):
+        self.ttl = ttl
+        self.path = path
+        self._entries: Dict[str, Tuple[float, ObjectSchema]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def key(company_id: str, entity_id: Optional[str], obj: str, detail: bool) -> str:
+        return f'{company_id}|{entity_id or ""}|{obj.upper()}|{int(detail)}'
+
+    def get(self, key: str) -> Optional[ObjectSchema]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def set(self, key: str, schema: ObjectSchema):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, schema)
+            self._save()
+
+    def invalidate(self, key: str = None):
+        """Removes one entry, or every entry if `key` is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._save()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = {key: (expires, ObjectSchema(obj, tuple(FieldInfo(*field) for field in fields)))
+                           for key, (expires, obj, fields) in json.load(f).items()}
+        except (ValueError, TypeError, AttributeError) as e:
+            # A truncated or corrupt file is a cache miss; it is rewritten on the next save.
+            logger.warning('Ignoring unreadable metadata cache %s: %s', self.path, e)
+            return
+        self._entries.update(entries)
+
+    def _save(self):
+        if not self.path:
+            return
+        entries = {key: (expires, schema.object, [list(field) for field in schema.fields])
+                   for key, (expires, schema) in self._entries.items()}
+        temporary = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(temporary, self.path)
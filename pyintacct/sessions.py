@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    import asyncio
+    import sqlite3
+
+# How often `alock` retries a lock held by another thread or process.
+LOCK_POLL_INTERVAL = 0.05
+
+
+class Session(NamedTuple):
+    session_id: str
+    endpoint: str
+    expiration: float
+
+    @property
+    def expired(self) -> bool:
+        return self.expiration < time.time()
+
+
+class SessionStore(object):
+    """
+    Shares API sessions between clients so only one of them logs in and refreshes.
+
+    Sessions are keyed by sender, company, entity and user (see `IntacctAPI.session_key`).
+    To use an external store such as Redis or a database, subclass this and implement
+    `get`, `set`, `delete` and `lock`. `lock` must exclude every other client using the
+    store for the same key, since it is held while a new session is requested.
+
+    Async clients use `alock` instead, which must not block the event loop. The default
+    queues the tasks of one event loop on an asyncio.Lock and holds `lock` in a helper
+    thread; override it if the store has a non-blocking way to wait.
+    """
+    def get(self, key: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    def set(self, key: str, session: Session):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        raise NotImplementedError
+        yield
+
+    @asynccontextmanager
+    async def alock(self, key: str) -> AsyncIterator[None]:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        acquired = loop.create_future()
+        release = threading.Event()
+
+        def settle(error: BaseException = None):
+            if not acquired.done():
+                acquired.set_exception(error) if error is not None else acquired.set_result(None)
+
+        def hold():
+            try:
+                with self.lock(key):
+                    loop.call_soon_threadsafe(settle)
+                    release.wait()
+            except BaseException as e:
+                loop.call_soon_threadsafe(settle, e)
+
+        async with self._async_lock(key):
+            # `lock` may block, so a helper thread takes and holds it until we are done.
+            threading.Thread(target=hold, name='pyintacct-session-lock', daemon=True).start()
+            try:
+                await acquired
+                yield
+            finally:
+                release.set()
+
+    def _async_lock(self, key: Optional[str]) -> asyncio.Lock:
+        """A lock for `key` shared by the tasks of the running event loop."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        loops = self.__dict__.setdefault('_async_locks', weakref.WeakKeyDictionary())
+        return loops.setdefault(loop, {}).setdefault(key, asyncio.Lock())
+
+
+class MemorySessionStore(SessionStore):
+    """Shares sessions between clients in the same process."""
+    def __init__(self):
+        self._sessions: Dict[str, Session] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, key: str) -> Optional[Session]:
+        return self._sessions.get(key)
+
+    def set(self, key: str, session: Session):
+        self._sessions[key] = session
+
+    def delete(self, key: str):
+        self._sessions.pop(key, None)
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        with self._lock(key):
+            yield
+
+    @asynccontextmanager
+    async def alock(self, key: str) -> AsyncIterator[None]:
+        import asyncio
+
+        lock = self._lock(key)
+        async with self._async_lock(key):
+            # Only a client in another thread can hold the lock now, so poll instead of blocking the loop.
+            while not lock.acquire(blocking=False):
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                lock.release()
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Shares sessions between processes on one host through an SQLite database file.
+    `lock` holds a write transaction on the database, so refreshes for different
+    keys are serialized as well.
+    """
+    def __init__(self, path: str, timeout: float = 60):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS sessions '
+                               '(key TEXT PRIMARY KEY, session_id TEXT, endpoint TEXT, expiration REAL)')
+
+    def _connect(self, timeout: float = None) -> sqlite3.Connection:
+        import sqlite3
+
+        return sqlite3.connect(self.path, timeout=self.timeout if timeout is None else timeout,
+                               isolation_level=None)
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        # Inside lock(), reuse its connection; a second one would wait on our own write lock.
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            yield connection
+            return
+        connection = self._connect()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def get(self, key: str) -> Optional[Session]:
+        with self._connection() as connection:
+            row = connection.execute('SELECT session_id, endpoint, expiration FROM sessions WHERE key = ?',
+                                     (key,)).fetchone()
+        return Session(*row) if row else None
+
+    def set(self, key: str, session: Session):
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)', (key, *session))
+
+    def delete(self, key: str):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM sessions WHERE key = ?', (key,))
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            with self._transaction(connection):
+                yield
+        finally:
+            connection.close()
+
+    @asynccontextmanager
+    async def alock(self, key: str) -> AsyncIterator[None]:
+        import asyncio
+        import sqlite3
+
+        # The write lock covers every key, so the tasks of a loop queue up on one asyncio.Lock.
+        async with self._async_lock(None):
+            connection = self._connect(timeout=0)
+            try:
+                deadline = time.monotonic() + self.timeout
+                while True:
+                    try:
+                        connection.execute('BEGIN IMMEDIATE')
+                        break
+                    except sqlite3.OperationalError:
+                        if time.monotonic() >= deadline:
+                            raise
+                    await asyncio.sleep(LOCK_POLL_INTERVAL)
+                with self._transaction(connection):
+                    yield
+            finally:
+                connection.close()
+
+    @contextmanager
+    def _transaction(self, connection: sqlite3.Connection) -> Iterator[None]:
+        self._local.connection = connection
+        try:
+            yield
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        finally:
+            self._local.connection = None
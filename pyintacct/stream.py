@@ -0,0 +1,64 @@
+from typing import Any, Callable, Iterator, List, Optional
+from xml.etree.ElementTree import XMLPullParser
+
+from jxmlease import parse_etree
+
+from .batch import format_errors
+from .exceptions import IntacctException
+
+
+class ResponseStreamParser(object):
+    """
+    Incrementally parses a gateway response as its bytes arrive.
+
+    Each record element is decoded (to an XMLDictNode by default) and discarded from the
+    underlying tree as soon as it closes, so memory stays flat regardless of
+    page size. A failure status raises an IntacctException as soon as its
+    error message has been received, without waiting for the rest of the body.
+    The `<data>` attributes needed for readMore, and the number of records
+    parsed, are available once the records have been consumed.
+
+    :param record_tag: The tag of the record elements, e.g. the lowercase object name.
+    :param decode: Converts each record element into the value to yield. By default records are XMLDictNodes.
+    """
+    def __init__(self, record_tag: str, decode: Callable[[Any], Any] = None):
+        self.record_tag = record_tag
+        self.decode = decode
+        self.remaining: Optional[str] = None
+        self.result_id: Optional[str] = None
+        self.failed = False
+        self.records = 0
+        self._parser = XMLPullParser(events=('start', 'end'))
+        self._stack: List = []
+
+    def feed(self, chunk: bytes) -> Iterator[Any]:
+        """Feeds a chunk of the response and yields the records it completed."""
+        self._parser.feed(chunk)
+        return self._events()
+
+    def close(self) -> Iterator[Any]:
+        """Signals the end of the response and yields any remaining records."""
+        self._parser.close()
+        yield from self._events()
+        if self.failed:
+            raise IntacctException('Intacct API call failed.')
+
+    def _events(self) -> Iterator[Any]:
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if elem.tag == 'data':
+                    self.remaining = elem.get('numremaining')
+                    self.result_id = elem.get('resultId')
+                self._stack.append(elem)
+                continue
+            self._stack.pop()
+            parent = self._stack[-1] if self._stack else None
+            if elem.tag == 'status' and (elem.text or '').strip() == 'failure':
+                self.failed = True
+            elif elem.tag == 'errormessage':
+                raise IntacctException(format_errors(parse_etree(elem)) or 'Intacct API call failed.')
+            elif elem.tag == self.record_tag and parent is not None and parent.tag == 'data':
+                record = self.decode(elem) if self.decode else parse_etree(elem)[self.record_tag]
+                parent.remove(elem)
+                self.records += 1
+                yield record
@@ -15,7 +15,10 @@ REQUIRES = ['httpx >=0.23.0, <2.0',
             'pydantic >= 2.0']
 EXTRAS = {
     'http2': ['httpx[http2] >=0.23.0, <2.0'],
-    'dev': ['pytest', 'pydantic-settings >= 2.0.1']
+    'columnar': ['numpy', 'pyarrow'],
+    'prometheus': ['prometheus_client'],
+    'opentelemetry': ['opentelemetry-api'],
+    'dev': ['pytest', 'pydantic-settings >= 2.0.1', 'prometheus_client', 'opentelemetry-sdk']
 }
 
 
@@ -33,6 +36,7 @@ setup(
     python_requires=PYTHON_VERSION,
     install_requires=REQUIRES,
     extras_require=EXTRAS,
+    entry_points={'console_scripts': ['pyintacct = pyintacct.cli:main']},
     # test_suite='tests',
     include_package_data=True,
     classifiers=[
@@ -1,7 +1,10 @@
+import time
+
+import httpx
 import pytest
 from .config import config
 from decimal import Decimal
-from pyintacct import IntacctAPI
+from pyintacct import AsyncIntacctAPI, IntacctAPI
 from pyintacct.models.base import Date
 from pyintacct.models.company import Contact, MailAddress
 from pyintacct.models.purchasing import POTransaction, POTransactionItem, POTransactionItems
@@ -76,3 +79,37 @@ def make_podocument():
         return potransaction
     return _make_podocument
 
+
+@pytest.fixture
+def make_mock_client():
+    """Builds a client with a live session whose requests are answered by `handler` instead of the network."""
+    def _make_mock_client(handler, **kwargs):
+        kwargs.setdefault('session_id', 'session')
+        kwargs.setdefault('session_expiration', time.time() + 3600)
+        api = IntacctAPI('sender_id', 'sender_pass', **kwargs)
+        api.http_client = httpx.Client(transport=httpx.MockTransport(handler))
+        return api
+    return _make_mock_client
+
+
+@pytest.fixture
+def make_gateway_client():
+    """Builds a client with a live session whose requests are answered by an emulator Gateway."""
+    def _make_gateway_client(gateway, **kwargs):
+        api = IntacctAPI('sender_id', 'sender_pass', company_id='company', user_id='user', user_password='password',
+                         transport=gateway.transport(), **kwargs)
+        api.set_session(api.get_session_id())
+        return api
+    return _make_gateway_client
+
+
+@pytest.fixture
+def make_async_client():
+    """Like `make_mock_client`, for AsyncIntacctAPI. `handler` may be a coroutine function."""
+    def _make_async_client(handler, **kwargs):
+        kwargs.setdefault('session_id', 'session')
+        kwargs.setdefault('session_expiration', time.time() + 3600)
+        api = AsyncIntacctAPI('sender_id', 'sender_pass', **kwargs)
+        api.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return api
+    return _make_async_client
@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+from jxmlease import parse
+
+from pyintacct import AsyncIntacctAPI, IntacctException
+from pyintacct.emulator import Gateway
+from .utils import page_handler, response_xml, result_xml
+
+
+def test_async_read_by_query_pages(make_async_client):
+    async def run():
+        async with make_async_client(page_handler([[1, 2], [3, 4], [5]])) as client:
+            return await client.read_by_query('LOCATION', '')
+
+    records = asyncio.run(run())
+    assert [record['LOCATIONID'] for record in records] == ['1', '2', '3', '4', '5']
+
+
+def test_async_concurrency_is_bounded(make_async_client):
+    in_flight = []
+    peak = []
+
+    async def handler(request):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        controlid = next(parse(request.content.decode('utf-8')).find_nodes_with_tag('function'))\
+            .get_xml_attr('controlid')
+        return httpx.Response(200, text=response_xml(result_xml(controlid, 'inspect', data='<data/>')))
+
+    async def run():
+        async with make_async_client(handler, max_concurrency=3) as client:
+            await asyncio.gather(*(client.inspect('LOCATION') for _ in range(12)))
+
+    asyncio.run(run())
+    assert max(peak) == 3
+
+
+def test_async_streamed_compressed_requests():
+    gateway = Gateway(compress=True)
+    objs = [{'CUSTOMER': {'CUSTOMERID': f'C{i:04}'}} for i in range(150)]
+
+    async def run():
+        async with AsyncIntacctAPI('sender_id', 'sender_pass', company_id='company', user_id='user',
+                                   user_password='password', transport=gateway.transport(), stream_requests=True,
+                                   compress_requests=True) as client:
+            results = await client.create_many(objs)
+            return results, await client.read_by_query('CUSTOMER', '', pagesize=1000)
+
+    results, records = asyncio.run(run())
+    assert all(result.ok for result in results) and len(records) == 150
+
+
+def test_async_execute_batch_cancels_other_batches(make_async_client):
+    finished = []
+
+    async def handler(request):
+        function = next(parse(request.content.decode('utf-8')).find_nodes_with_tag('function'))
+        controlid = function.get_xml_attr('controlid')
+        if function['create']['CUSTOMER']['CUSTOMERID'] == 'C0':
+            return httpx.Response(500)
+        await asyncio.sleep(0.2)
+        finished.append(controlid)
+        return httpx.Response(200, text=response_xml(result_xml(controlid, 'create')))
+
+    async def run():
+        async with make_async_client(handler) as client:
+            with pytest.raises(IntacctException):
+                await client.create_many([{'CUSTOMER': {'CUSTOMERID': f'C{i}'}} for i in range(5)], batch_size=1)
+            await asyncio.sleep(0.3)
+
+    asyncio.run(run())
+    assert finished == []
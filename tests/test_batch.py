@@ -0,0 +1,62 @@
+import httpx
+import pytest
+from jxmlease import parse
+
+from pyintacct.exceptions import IntacctFunctionError
+from pyintacct.models.company import Contact
+from .utils import response_xml, result_xml
+
+
+def echo_handler(requests):
+    """Answers every function with a success result, except functions mentioning 'BAD'."""
+    def handler(request):
+        body = request.content.decode('utf-8')
+        requests.append(parse(body))
+        results = []
+        for function in parse(body).find_nodes_with_tag('function'):
+            controlid = function.get_xml_attr('controlid')
+            name = next(iter(function.keys()))
+            if 'BAD' in body.split(f'controlid="{controlid}"')[1].split('</function>')[0]:
+                results.append(result_xml(controlid, name, 'failure', 'Bad record'))
+            else:
+                results.append(result_xml(controlid, name, data=f'<data><key>{controlid}</key></data>'))
+        return httpx.Response(200, text=response_xml(*results))
+    return handler
+
+
+def test_create_many_batches_requests(make_mock_client):
+    requests = []
+    client = make_mock_client(echo_handler(requests))
+    objs = [{'LOCATION': {'LOCATIONID': f'L{i}'}} for i in range(250)]
+    results = client.create_many(objs, batch_size=100)
+    assert len(requests) == 3
+    assert len(results) == 250
+    assert all(result.ok for result in results)
+    assert [result.item for result in results] == objs
+    assert results[0].key == results[0].controlid
+
+
+def test_create_many_reports_partial_failures(make_mock_client):
+    client = make_mock_client(echo_handler([]))
+    objs = [{'LOCATION': {'LOCATIONID': 'L1'}}, {'LOCATION': {'LOCATIONID': 'BAD'}}, {'LOCATION': {'LOCATIONID': 'L3'}}]
+    results = client.create_many(objs)
+    assert [result.ok for result in results] == [True, False, True]
+    assert 'Bad record' in results[1].error
+    with pytest.raises(IntacctFunctionError) as e:
+        results[1].raise_for_status()
+    assert e.value.result is results[1]
+
+
+def test_update_many_transaction(make_mock_client):
+    requests = []
+    client = make_mock_client(echo_handler(requests))
+    client.update_many([{'LOCATION': {'RECORDNO': '1'}}], transaction=True)
+    assert requests[0]['request']['operation'].get_xml_attr('transaction') == 'true'
+
+
+def test_delete_v21_single_request(make_mock_client):
+    requests = []
+    client = make_mock_client(echo_handler(requests))
+    client.delete(Contact, ['a', 'b', 'c'])
+    assert len(requests) == 1
+    assert len(list(requests[0].find_nodes_with_tag('delete_contact'))) == 3
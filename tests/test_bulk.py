@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from pyintacct import cli
+from pyintacct.bulk import FAILURE, INVALID, SUCCESS, bulk_load, nest, read_rows, resolve_model, write_results
+from pyintacct.emulator import Gateway
+from pyintacct.models.accounts_receivable import ARInvoice
+
+
+def invoice(i):
+    return {'customerid': f'C{i}', 'datecreated': {'year': '2024', 'month': '1', 'day': str(i % 28 + 1)},
+            'action': 'Submit', 'invoiceitems': {'lineitem': [{'glaccountno': '4000', 'amount': f'{i}.50'}]}}
+
+
+def test_bulk_load_models(make_gateway_client):
+    gateway = Gateway()
+    client = make_gateway_client(gateway)
+    rows = [invoice(i) for i in range(1, 24)]
+    rows[4] = {'customerid': 'C5'}
+    results = list(bulk_load(client, iter(rows), model=ARInvoice, batch_size=5, max_workers=3))
+    assert [result.line for result in results] == list(range(1, 24))
+    assert [result.status for result in results] == [SUCCESS] * 4 + [INVALID] + [SUCCESS] * 18
+    assert 'datecreated' in results[4].error and results[4].key is None
+    assert sorted(record['CUSTOMERID'] for record in gateway.objects['INVOICE']) == \
+        sorted(row['customerid'] for row in rows if row is not rows[4])
+    assert all(result.key for result in results if result.ok)
+
+
+def test_failed_request_fails_its_batch(make_gateway_client):
+    gateway = Gateway()
+    client = make_gateway_client(gateway)
+    gateway.fail_next(1, status=500)
+    results = list(bulk_load(client, [invoice(i) for i in range(1, 13)], model=ARInvoice, batch_size=3,
+                             max_workers=2))
+    assert [result.line for result in results] == list(range(1, 13))
+    failed = [result for result in results if result.status == FAILURE]
+    assert len(failed) == 3 and all(result.error for result in failed)
+    assert len(gateway.objects['INVOICE']) == 9 == sum(result.ok for result in results)
+
+
+def test_bulk_load_objects(make_gateway_client):
+    gateway = Gateway({'CUSTOMER': [{'RECORDNO': '1', 'CUSTOMERID': 'C1'}]})
+    client = make_gateway_client(gateway)
+    rows = [{'RECORDNO': '1', 'NAME': 'One'}, {'RECORDNO': '2', 'NAME': 'Two'}]
+    results = list(bulk_load(client, rows, obj='CUSTOMER', operation='update'))
+    assert [result.status for result in results] == [SUCCESS, FAILURE]
+    assert results[1].error and gateway.objects['CUSTOMER'][0]['NAME'] == 'One'
+    with pytest.raises(ValueError):
+        bulk_load(client, rows, model=ARInvoice, obj='CUSTOMER')
+
+
+def test_files(tmp_path):
+    path = tmp_path / 'in.csv'
+    path.write_text('CUSTOMERID,NAME,DISPLAYCONTACT.EMAIL1\nC1,One,one@example.com\nC2,,\n')
+    assert list(read_rows(str(path))) == [
+        {'CUSTOMERID': 'C1', 'NAME': 'One', 'DISPLAYCONTACT': {'EMAIL1': 'one@example.com'}}, {'CUSTOMERID': 'C2'}]
+    assert nest({'a.b.c': 1, 'a.d': 2, 'e': ''}) == {'a': {'b': {'c': 1}, 'd': 2}}
+    assert resolve_model('ARInvoice') is ARInvoice
+    assert resolve_model('pyintacct.models.accounts_receivable:ARInvoice') is ARInvoice
+    with pytest.raises(ValueError):
+        resolve_model('Nope')
+
+
+def test_load_command(tmp_path, monkeypatch, capsys, make_gateway_client):
+    gateway = Gateway()
+    monkeypatch.setattr(cli, 'client_from_environment', lambda args, **kwargs: make_gateway_client(gateway))
+    source = tmp_path / 'invoices.jsonl'
+    source.write_text(''.join(json.dumps(invoice(i)) + '\n' for i in range(1, 8)) + '{"customerid": "C8"}\n')
+    output = tmp_path / 'results.csv'
+    assert cli.main(['load', str(source), '--model', 'ARInvoice', '--output', str(output), '--batch-size', '3']) == 1
+    lines = output.read_text().splitlines()
+    assert lines[0] == 'line,status,key,error' and len(lines) == 9
+    assert [line.split(',')[1] for line in lines[1:]] == [SUCCESS] * 7 + [INVALID]
+    assert capsys.readouterr().err.strip() == '1 invalid, 7 success'
+    assert len(gateway.objects['INVOICE']) == 7
+
+    counts = write_results(str(tmp_path / 'results.jsonl'), bulk_load(make_gateway_client(gateway), [invoice(9)],
+                                                                         model=ARInvoice))
+    assert counts == {SUCCESS: 1}
+    assert json.loads((tmp_path / 'results.jsonl').read_text())['status'] == SUCCESS
+
+
+def test_client_from_environment(monkeypatch):
+    monkeypatch.delenv('INTACCT_USER_PASSWORD', raising=False)
+    for variable in ('INTACCT_SENDER_ID', 'INTACCT_SENDER_PASSWORD', 'INTACCT_COMPANY_ID', 'INTACCT_USER_ID'):
+        monkeypatch.setenv(variable, 'x')
+    args = cli.parser().parse_args(['load', 'in.csv', '--object', 'CUSTOMER', '--rate', '2'])
+    with pytest.raises(SystemExit, match='INTACCT_USER_PASSWORD'):
+        cli.client_from_environment(args)
+    monkeypatch.setenv('INTACCT_USER_PASSWORD', 'x')
+    client = cli.client_from_environment(args)
+    assert client.user_password == 'x' and client.policy.bucket is not None
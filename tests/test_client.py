@@ -1,11 +1,17 @@
+import subprocess
+import sys
+import time
 import types
+from concurrent.futures import ThreadPoolExecutor
 
+import httpx
 import pytest
-from jxmlease import XMLDictNode
+from jxmlease import XMLDictNode, parse
 from pydantic import BaseModel
 
 from pyintacct import IntacctException
 from pyintacct.client import IntacctAPI
+from .utils import login_handler, page_handler
 
 
 def test_client():
@@ -58,3 +64,51 @@ def test_yield_by_query_custom_object(client):
 def test_invalid_request(client):
     with pytest.raises(IntacctException):
         client.read_by_query('FAKEOBJECT', '')
+
+
+def test_envelope_matches_request_tree():
+    api = IntacctAPI('sender_id', 'sender_pass')
+    payload, function = api._function_request()
+    function.add_node(tag='readMore', new_node=XMLDictNode({'resultId': '123'}))
+    tree, tree_function = api.get_function_base()
+    tree_function.set_xml_attr('controlid', function.get_xml_attr('controlid'))
+    tree_function.add_node(tag='readMore', new_node=XMLDictNode({'resultId': '123'}))
+    assert tree['request']['operation']['content']['function']['readMore']['resultId'] == '123'
+    assert parse(api.serialize(payload, 'session')) == parse(api.serialize(tree, 'session'))
+    assert b'<sessionid>other</sessionid>' in api.serialize(payload, 'other')
+
+
+def test_client_limits_and_timeout():
+    api = IntacctAPI('sender_id', 'sender_pass', timeout=5, limits=httpx.Limits(max_connections=4))
+    assert api._http_client is None
+    assert api.http_client.timeout.read == 5
+    assert api.http_client._transport._pool._max_connections == 4
+
+
+def test_lazy_imports():
+    code = ('import logging, sys, pyintacct; '
+            'print(sorted(m for m in ("httpx", "pydantic", "pyintacct.client") if m in sys.modules)); '
+            'pyintacct.IntacctAPI; '
+            'print(sorted(m for m in ("pydantic", "asyncio", "sqlite3") if m in sys.modules), '
+            'logging.getLogger().handlers)')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.splitlines() == ['[]', '[] []']
+
+
+def test_shared_client_across_threads(make_mock_client):
+    logins, sessions = [], []
+    pages = page_handler([[1, 2], [3]])
+
+    def handler(request):
+        sessions.append(next(parse(request.content.decode('utf-8')).find_nodes_with_tag('sessionid')))
+        time.sleep(0.001)
+        return pages(request)
+
+    client = make_mock_client(login_handler(handler, logins), session_id=None, session_expiration=0,
+                              limits=httpx.Limits(max_connections=16))
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda _: client.read_by_query('LOCATION', ''), range(200)))
+    assert len(logins) == 1
+    assert len(sessions) == 400
+    assert set(sessions) == {'session-1'}
+    assert all(len(records) == 3 for records in results)
@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+import httpx
+import pytest
+from jxmlease import parse
+
+from .utils import response_xml, result_xml
+
+TYPES = {'RECORDNO': 'INTEGER', 'TOTALDUE': 'CURRENCY', 'WHENDUE': 'DATE', 'WHENMODIFIED': 'TIMESTAMP',
+         'ONHOLD': 'BOOLEAN', 'CUSTOMERID': 'TEXT'}
+ROWS = [('1', '10.50', '01/31/2024', '01/02/2024 03:04:05', 'false', 'C1'),
+        ('2', '-0.01', '', '', 'true', ''),
+        ('3', '1000', '12/31/1969', '01/01/1970 00:00:00', 'false', 'C3')]
+
+
+def invoice_handler(request):
+    function = next(parse(request.content.decode('utf-8')).find_nodes_with_tag('function'))
+    records = ''.join('<arinvoice>' + ''.join(f'<{name}>{value}</{name}>' for name, value in zip(TYPES, row))
+                      + '</arinvoice>' for row in ROWS)
+    data = f'<data listtype="arinvoice" numremaining="0">{records}</data>'
+    return httpx.Response(200, text=response_xml(result_xml(function.get_xml_attr('controlid'), data=data)))
+
+
+def test_columnar_batches(make_mock_client):
+    client = make_mock_client(invoice_handler)
+    batches = list(client.read_by_query_columnar('ARINVOICE', '', ','.join(TYPES), batch_rows=2, types=TYPES))
+    assert [len(batch) for batch in batches] == [2, 1]
+    batch = batches[0]
+    assert list(batch['RECORDNO'].values) == [1, 2]
+    assert list(batch['TOTALDUE'].values) == [1050, -1]
+    assert list(batch['WHENDUE'].values) == [19753, 0]
+    assert list(batch['WHENDUE'].valid) == [1, 0]
+    assert batch['CUSTOMERID'].values == ['C1', None]
+    assert list(batches[1]['WHENDUE'].values) == [-1]
+
+
+def test_columnar_to_numpy_and_arrow(make_mock_client):
+    np = pytest.importorskip('numpy')
+    pa = pytest.importorskip('pyarrow')
+    client = make_mock_client(invoice_handler)
+    batch = next(client.read_by_query_columnar('ARINVOICE', '', ','.join(TYPES), types=TYPES))
+    arrays = batch.to_numpy()
+    assert arrays['WHENDUE'][0] == np.datetime64('2024-01-31')
+    assert arrays['WHENDUE'].mask.tolist() == [False, True, False]
+    table = batch.to_arrow()
+    assert table.column('TOTALDUE').to_pylist() == [Decimal('10.50'), Decimal('-0.01'), Decimal('1000.00')]
+    assert table.column('WHENMODIFIED').type == pa.timestamp('s')
+    assert table.column('ONHOLD').to_pylist() == [False, True, False]
+    assert table.column('CUSTOMERID').to_pylist() == ['C1', None, 'C3']
@@ -0,0 +1,45 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from pyintacct.decode import field_plan, model_fields
+from .utils import page_handler
+
+
+class Location(BaseModel):
+    LOCATIONID: str
+    NAME: Optional[str] = None
+
+
+def test_yield_by_query_model(make_mock_client):
+    client = make_mock_client(page_handler([[1, 2], [3]]))
+    records = list(client.yield_by_query('LOCATION', '', pagesize=2, model=Location))
+    assert records == [Location(LOCATIONID='1'), Location(LOCATIONID='2'), Location(LOCATIONID='3')]
+
+
+def test_yield_by_query_tuples_and_dicts(make_mock_client):
+    client = make_mock_client(page_handler([[1, 2], [3]]))
+    assert client.read_by_query('LOCATION', '', fields='LOCATIONID, NAME', as_tuples=True) == \
+        [('1', None), ('2', None), ('3', None)]
+    assert client.read_by_query('LOCATION', '', as_dicts=True) == \
+        [{'LOCATIONID': '1'}, {'LOCATIONID': '2'}, {'LOCATIONID': '3'}]
+
+
+def test_field_plan_is_cached_and_nested():
+    class Parent(BaseModel):
+        ID: str
+        CHILD: Optional[Location] = None
+
+    assert field_plan(Parent) is field_plan(Parent)
+    assert field_plan(Parent)['CHILD'] is field_plan(Location)
+
+
+def test_yield_by_query_aliased_model(make_mock_client):
+    class AliasedLocation(BaseModel):
+        location_id: str = Field(alias='LOCATIONID')
+        name: Optional[str] = Field(None, validation_alias='NAME')
+
+    client = make_mock_client(page_handler([[1, 2]]))
+    records = list(client.yield_by_query('LOCATION', '', model=AliasedLocation))
+    assert [record.location_id for record in records] == ['1', '2']
+    assert model_fields(AliasedLocation) == ('LOCATIONID', 'NAME')
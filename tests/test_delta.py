@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from pyintacct.delta import DeltaSync, MemoryWatermarkStore, SQLiteWatermarkStore
+from .utils import query_handler
+
+
+def record(recordno, modified):
+    return {'RECORDNO': str(recordno), 'NAME': f'Invoice {recordno}',
+            'WHENMODIFIED': f'{modified:%m/%d/%Y %H:%M:%S}'}
+
+
+def keys(batches):
+    return [r['RECORDNO'] for batch in batches for r in batch.records]
+
+
+def test_delta_sync_advances_on_final_ack(make_mock_client, tmp_path):
+    records = [record(n, datetime(2024, 1, 1, 0, n)) for n in range(1, 8)]
+    client = make_mock_client(query_handler('arinvoice', records))
+    store = SQLiteWatermarkStore(str(tmp_path / 'sync.db'))
+    sync = DeltaSync(client, 'ARINVOICE', store, batch_size=3, pagesize=2, overlap=120)
+
+    batches = []
+    for batch in sync.batches():
+        assert store.watermark('ARINVOICE') is None
+        batches.append(batch)
+        batch.ack()
+    assert keys(batches) == [str(n) for n in range(1, 8)]
+    assert [batch.final for batch in batches] == [False, False, True]
+    assert store.watermark('ARINVOICE') == datetime(2024, 1, 1, 0, 7)
+    # Only records within the overlap window are remembered.
+    assert sorted(store.delivered('ARINVOICE')) == ['5', '6', '7']
+
+    # The next run re-reads the overlap but skips what was delivered; changed records come through.
+    records[5] = record(6, datetime(2024, 1, 1, 0, 9))
+    records.append(record(8, datetime(2024, 1, 1, 0, 8)))
+    assert sync.delta_query() == "WHENMODIFIED >= '01/01/2024 00:05:00'"
+    batches = list(sync.batches())
+    assert keys(batches) == ['6', '8']
+    batches[0].ack()
+    assert store.watermark('ARINVOICE') == datetime(2024, 1, 1, 0, 9)
+    assert list(sync.batches()) == []
+
+
+def test_delta_sync_resumes_unacknowledged_run(make_mock_client):
+    records = [record(n, datetime(2024, 1, 1, 0, 10 - n)) for n in range(1, 7)]
+    client = make_mock_client(query_handler('arinvoice', records))
+    store = MemoryWatermarkStore()
+    sync = DeltaSync(client, 'ARINVOICE', store, fields='NAME', batch_size=2,
+                     start=datetime(2024, 1, 1))
+    assert sync.fields == 'NAME,RECORDNO,WHENMODIFIED'
+
+    batches = sync.batches()
+    next(batches).ack()
+    next(batches)  # processed but never acknowledged
+    assert store.watermark('ARINVOICE') is None
+
+    batches = list(sync.batches())
+    assert keys(batches) == ['3', '4', '5', '6']
+    for batch in batches:
+        batch.ack()
+    assert store.watermark('ARINVOICE') == datetime(2024, 1, 1, 0, 9)
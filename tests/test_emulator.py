@@ -0,0 +1,95 @@
+import pytest
+
+from pyintacct import IntacctAPI, IntacctException, RetryPolicy
+from pyintacct.emulator import Gateway
+from pyintacct.exceptions import DUPLICATE_REQUEST
+
+
+def customers(n):
+    return [{'CUSTOMERID': f'C{i:04}', 'NAME': f'Customer {i}', 'STATUS': 'active' if i % 2 else 'inactive',
+             'WHENMODIFIED': f'01/{i % 28 + 1:02}/2024 00:00:00'} for i in range(n)]
+
+
+def test_gateway_paging_and_queries(make_gateway_client):
+    gateway = Gateway({'CUSTOMER': customers(250)})
+    client = make_gateway_client(gateway)
+    records = list(client.yield_by_query('CUSTOMER', "STATUS = 'active'", fields='CUSTOMERID,NAME', pagesize=40))
+    assert len(records) == 125
+    assert set(records[0]) == {'CUSTOMERID', 'NAME'}
+    assert gateway.requests == 1 + 4  # getAPISession, then readByQuery and three readMore
+    assert len(client.read_by_query('CUSTOMER', "WHENMODIFIED >= '01/27/2024 00:00:00' AND NAME LIKE 'Customer 1%'",
+                                    pagesize=1000)) == 8
+    with pytest.raises(IntacctException, match='Unsupported query'):
+        client.read_by_query('CUSTOMER', "STATUS = 'active' OR STATUS = 'inactive'")
+
+
+def test_gateway_writes_and_transactions(make_gateway_client):
+    gateway = Gateway()
+    client = make_gateway_client(gateway)
+    client.create({'CUSTOMER': {'CUSTOMERID': 'C1', 'NAME': 'Acme'}})
+    recordno = gateway.objects['CUSTOMER'][0]['RECORDNO']
+    client.update({'CUSTOMER': {'RECORDNO': recordno, 'NAME': 'Acme, Inc.'}})
+    assert client.read_by_query('CUSTOMER', '')[0]['NAME'] == 'Acme, Inc.'
+
+    results = client.create_many([{'CUSTOMER': {'CUSTOMERID': 'C2'}}, {'CUSTOMER': {'CUSTOMERID': 'C3'}}],
+                                 transaction=True)
+    assert all(result.ok for result in results)
+    payload = client.get_payload([client.new_function(), client.new_function()], transaction=True)
+    client._add_create(payload.functions[0], {'CUSTOMER': {'CUSTOMERID': 'C4'}})
+    client._add_update(payload.functions[1], {'CUSTOMER': {'RECORDNO': '999', 'NAME': 'Missing'}})
+    with pytest.raises(IntacctException, match='999'):
+        client.execute(payload)
+    assert len(gateway.objects['CUSTOMER']) == 3
+
+    client.delete('CUSTOMER', [recordno])
+    assert [r['CUSTOMERID'] for r in gateway.objects['CUSTOMER']] == ['C2', 'C3']
+
+    function = client.new_function()
+    function.add_node('getEverything')
+    result = client.execute_batch([function])[0]
+    assert result.error.strip() == 'Unknown function getEverything'
+    assert result.node['errormessage']['error']['errorno'] != DUPLICATE_REQUEST
+
+
+def test_gateway_injected_errors_and_server(make_gateway_client):
+    gateway = Gateway({'CUSTOMER': customers(10)}, latency=0.001)
+    client = make_gateway_client(gateway, policy=RetryPolicy(backoff_base=0.001))
+    gateway.reset_stats()
+    gateway.fail_next(2)
+    assert len(client.read_by_query('CUSTOMER', '')) == 10
+    assert gateway.requests == 3
+
+    with gateway.serve() as server:
+        client = IntacctAPI('sender_id', 'sender_pass', company_id='company', user_id='user',
+                            user_password='password', endpoint=server.url)
+        assert len(client.read_by_query('CUSTOMER', 'RECORDNO > 5', pagesize=2)) == 5
+
+
+def test_compressed_and_streamed_requests(make_gateway_client):
+    gateway = Gateway({'CUSTOMER': customers(300)}, compress=True)
+    client = make_gateway_client(gateway, stream_requests=True, compress_requests=True)
+    assert 'gzip' in client.headers['accept-encoding'] and '*' not in client.headers['accept-encoding']
+
+    objs = [{'CUSTOMER': {'CUSTOMERID': f'N{i:04}', 'NAME': f'New customer {i}'}} for i in range(200)]
+    gateway.reset_stats()
+    assert all(result.ok for result in client.create_many(objs))
+    body = len(client.serialize(client.get_payload([client.create_function(obj) for obj in objs]), 'session'))
+    assert gateway.bytes_received < body / 4
+    gateway.reset_stats()
+    assert len(client.read_by_query('CUSTOMER', '', pagesize=1000)) == 500
+    assert gateway.bytes_sent < 500 * 50
+
+    with gateway.serve() as server:
+        served = IntacctAPI('sender_id', 'sender_pass', company_id='company', user_id='user',
+                            user_password='password', endpoint=server.url, stream_requests=True,
+                            compress_requests=True)
+        assert all(result.ok for result in served.create_many(objs[:50], transaction=True))
+        assert len(served.read_by_query('CUSTOMER', "CUSTOMERID LIKE 'N%'", pagesize=1000)) == 250
+
+
+def test_compression_refused(make_gateway_client):
+    gateway = Gateway(accept_gzip=False)
+    client = make_gateway_client(gateway, compress_requests=True)
+    objs = [{'CUSTOMER': {'CUSTOMERID': f'N{i:04}', 'NAME': f'New customer {i}'}} for i in range(50)]
+    assert all(result.ok for result in client.create_many(objs))
+    assert not client.compress_requests and len(gateway.objects['CUSTOMER']) == 50
@@ -0,0 +1,106 @@
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from jxmlease import XMLDictNode, parse
+from pydantic import BaseModel, field_serializer
+
+from pyintacct.client import IntacctAPI
+from pyintacct.encoder import EncodedFunction, encode
+from pyintacct.envelope import Envelope
+from pyintacct.models.base import Date
+from pyintacct.models.company import Contact, MailAddress
+from pyintacct.models.order_entry import SOTransaction, SOTransactionItem, SOTransactionItems
+from pyintacct.models.purchasing import POTransaction, POTransactionItem, POTransactionItems
+
+
+class Customer(BaseModel):
+    customerid: str
+    name: Optional[str] = None
+    created: Optional[date] = None
+    tags: List[str] = []
+    attributes: Dict[str, object] = {}
+    balance: Decimal = Decimal('0')
+    active: bool = True
+
+
+class Serialized(BaseModel):
+    name: str
+    amount: Decimal
+
+    @field_serializer('amount')
+    def format_amount(self, amount):
+        return f'{amount:.2f}'
+
+
+class Wrapper(BaseModel):
+    item: Serialized
+    items: List[Serialized] = []
+
+
+def contact(name):
+    return Contact(contactname=name, companyname='Acme & Sons <AU>', taxable=False,
+                   mailaddress=MailAddress(address1='1 "Main" St', city='Sydney', zip=None))
+
+
+def sotransaction(lines):
+    items = [SOTransactionItem(itemid=f'I{i}', quantity=Decimal(i), unit='Each', price=Decimal('9.99'),
+                               memo=None if i % 2 else f'line {i}',
+                               revrecstartdate=Date(year='2024', month='1', day='2'),
+                               shipto=contact(f'Ship {i}') if i % 3 == 0 else None)
+             for i in range(lines)]
+    return SOTransaction(transactiontype='Sales Order', datecreated=Date(year='2024', month='01', day='31'),
+                         customerid='C1', shipto=contact('Primary'), sotransitems=SOTransactionItems(sotransitem=items))
+
+
+def legacy(api, add, obj):
+    # The output before models were encoded directly: model_dump() -> XMLDictNode -> emit_xml().
+    function = api.new_function('cid')
+    add(function, obj)
+    return Envelope.function(function)
+
+
+OBJECTS = [
+    sotransaction(0),
+    sotransaction(25),
+    POTransaction(vendorid='V1', potransitems=POTransactionItems(potransitem=[
+        POTransactionItem(itemid='I1', quantity=Decimal('1.50'), taxable=True, deliverto=contact('D'))])),
+    contact('Solo'),
+    Customer(customerid='C&1', name='<Acme>', created=date(2024, 2, 29), tags=['a', 'b'],
+             attributes={'nested': {'x': 1}, 'none': None, 'list': [1, [2, 3]], 'empty': []}),
+    Customer(customerid='C2', tags=[]),
+    Serialized(name='S', amount=Decimal('1')),
+    Wrapper(item=Serialized(name='A', amount=Decimal('2.5')), items=[Serialized(name='B', amount=Decimal('3'))]),
+]
+
+
+def test_matches_jxmlease_output():
+    api = IntacctAPI('', '')
+    for obj in OBJECTS:
+        assert api.create_function(obj, 'cid').emit() == legacy(api, api._add_create, obj), obj
+        assert api.update_function(obj, 'cid').emit() == legacy(api, api._add_update, obj), obj
+
+
+def test_exclude_unset():
+    transaction = SOTransaction(transactiontype='Sales Order', datecreated=Date(year='2024', month='1', day='2'),
+                                customerid='C1', sotransitems=SOTransactionItems(sotransitem=[]))
+    xml = encode(transaction, 'create_sotransaction', exclude_unset=True)
+    assert xml == (b'<create_sotransaction><transactiontype>Sales Order</transactiontype><datecreated><year>2024'
+                   b'</year><month>1</month><day>2</day></datecreated><customerid>C1</customerid><sotransitems>'
+                   b'</sotransitems></create_sotransaction>')
+    assert b'<shipto></shipto>' in encode(transaction, 'sotransaction')
+    assert encode({'a': XMLDictNode({'b': '1'})}, 'x') == b'<x><a><b>1</b></a></x>'
+
+
+def test_encoded_function_in_request():
+    api = IntacctAPI('sender_id', 'sender_pass')
+    function = api.create_function(sotransaction(3))
+    assert isinstance(function, EncodedFunction)
+    assert function.keys() == ['create_sotransaction'] and function.get_xml_attr('controlid') == function.controlid
+    assert api.function_names(api.get_payload([function, api.new_function()])) == ['create_sotransaction']
+
+    document = parse(api.serialize(api.create_payload(sotransaction(3)), 'session'))
+    created = document['request']['operation']['content']['function']['create_sotransaction']
+    assert [str(item['itemid']) for item in created['sotransitems']['sotransitem']] == ['I0', 'I1', 'I2']
+    assert str(created['shipto']['mailaddress']['address1']) == '1 "Main" St'
+    assert isinstance(api.create_function({'CUSTOMER': {'CUSTOMERID': 'C1'}}), XMLDictNode)
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from pyintacct import AsyncIntacctAPI, IntacctAPI, IntacctException, RetryPolicy
+from pyintacct.emulator import Gateway
+from pyintacct.events import Hooks, RequestInfo
+
+CREDENTIALS = dict(company_id='company', user_id='user', user_password='password')
+
+
+class Recorder(Hooks):
+    def __init__(self):
+        self.events = []
+
+    def on_phase(self, info, phase, seconds):
+        assert seconds >= 0
+        self.events.append(('phase', info.function, phase))
+
+    def on_request(self, info):
+        self.events.append(('request', info.function, info))
+
+    def on_retry(self, info, attempt, error, delay):
+        self.events.append(('retry', info.function, attempt))
+
+    def on_session_refresh(self, seconds, error):
+        self.events.append(('session', seconds, error))
+
+    def requests(self, function):
+        return [event[2] for event in self.events if event[0] == 'request' and event[1] == function]
+
+    def phases(self, function):
+        return [event[2] for event in self.events if event[0] == 'phase' and event[1] == function]
+
+
+class Broken(Hooks):
+    def on_request(self, info):
+        raise RuntimeError('hook failure')
+
+
+def gateway():
+    return Gateway({'VENDOR': [{'VENDORID': f'V{i}', 'NAME': f'Vendor {i}'} for i in range(25)]})
+
+
+def test_execute_events():
+    recorder = Recorder()
+    gw = gateway()
+    client = IntacctAPI('sender_id', 'sender_pass', transport=gw.transport(), policy=RetryPolicy(backoff_base=0.001),
+                        hooks=[Broken(), recorder], **CREDENTIALS)
+    client._ensure_session()
+    gw.fail_next(1)
+    assert len(client.read_by_query('VENDOR', '', pagesize=10)) == 25
+
+    assert recorder.events[0][0] == 'phase' and recorder.events[0][1] == 'getAPISession'
+    assert [event for event in recorder.events if event[0] == 'session'][0][2] is None
+    assert ('retry', 'readByQuery', 0) in recorder.events
+    assert recorder.phases('readByQuery') == ['build', 'serialize', 'first_byte', 'download', 'first_byte',
+                                              'download', 'parse', 'validate']
+    info = recorder.requests('readByQuery')[0]
+    assert info.attempts == 2 and info.status_code == 200 and info.error is None
+    assert info.records == 10 and info.request_bytes > 0 and info.response_bytes > 0
+    assert info.controlids[0] and info.elapsed >= sum(info.timings.values()) - info.timings['build']
+    assert [i.records for i in recorder.requests('readMore')] == [10, 5]
+
+    with pytest.raises(IntacctException):
+        client.read_by_query('MISSING', '')
+    assert isinstance(recorder.requests('readByQuery')[-1].error, IntacctException)
+
+
+def test_stream_and_async_events():
+    recorder = Recorder()
+    gw = gateway()
+    client = IntacctAPI('sender_id', 'sender_pass', transport=gw.transport(), hooks=[recorder], **CREDENTIALS)
+    assert len(client.read_by_query('VENDOR', '', pagesize=20, stream=True)) == 25
+    assert recorder.phases('readMore') == ['build', 'serialize', 'first_byte', 'download']
+    assert [info.records for info in recorder.requests('readByQuery') + recorder.requests('readMore')] == [20, 5]
+
+    async def read():
+        async with AsyncIntacctAPI('sender_id', 'sender_pass', transport=gw.transport(), hooks=[recorder],
+                                   **CREDENTIALS) as async_client:
+            return await async_client.read_by_query('VENDOR', '', pagesize=100)
+
+    assert len(asyncio.run(read())) == 25
+    assert recorder.requests('readByQuery')[-1].records == 25
+
+
+def test_prometheus_hooks():
+    prometheus_client = pytest.importorskip('prometheus_client')
+    from pyintacct.events import PrometheusHooks
+
+    registry = prometheus_client.CollectorRegistry()
+    client = IntacctAPI('sender_id', 'sender_pass', transport=gateway().transport(),
+                        hooks=[PrometheusHooks(registry=registry)], **CREDENTIALS)
+    client.read_by_query('VENDOR', '', pagesize=10)
+    assert registry.get_sample_value('pyintacct_records_total', {'function': 'readMore'}) == 15
+    assert registry.get_sample_value('pyintacct_requests_total', {'function': 'readByQuery', 'outcome': 'success'}) == 1
+
+
+def test_opentelemetry_hooks():
+    pytest.importorskip('opentelemetry.sdk')
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from opentelemetry.trace import StatusCode
+    from pyintacct.events import OpenTelemetryHooks
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    hooks = OpenTelemetryHooks(tracer_provider=provider)
+    client = IntacctAPI('sender_id', 'sender_pass', transport=gateway().transport(), hooks=[hooks], **CREDENTIALS)
+    client.read_by_query('VENDOR', '', pagesize=20)
+    with pytest.raises(IntacctException):
+        client.read_by_query('MISSING', '')
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert set(spans) == {'intacct getAPISession', 'intacct readByQuery', 'intacct readMore'}
+    span = [s for s in exporter.get_finished_spans() if s.name == 'intacct readByQuery'][0]
+    assert span.attributes['intacct.records'] == 20 and span.attributes['http.status_code'] == 200
+    assert span.attributes['intacct.functions'] == ('readByQuery',) and span.attributes['intacct.request_bytes'] > 0
+    assert [event.name for event in span.events] == ['build', 'serialize', 'first_byte', 'download', 'parse',
+                                                     'validate']
+    assert span.start_time < span.events[0].timestamp <= span.end_time
+    failed = exporter.get_finished_spans()[-1]
+    assert failed.name == 'intacct readByQuery' and failed.status.status_code == StatusCode.ERROR
+    assert any(event.name == 'exception' for event in failed.events)
+    assert hooks._spans == {}
+
+    # A span is forgotten even if recording its outcome fails.
+    info = RequestInfo(['readByQuery'], ['controlid'])
+    hooks.on_phase(info, 'build', 0.001)
+    del info.request_bytes
+    with pytest.raises(AttributeError):
+        hooks.on_request(info)
+    assert hooks._spans == {}
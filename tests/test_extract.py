@@ -0,0 +1,93 @@
+import csv
+import gzip
+import json
+import threading
+
+import pytest
+
+from pyintacct import cli
+from pyintacct.emulator import Gateway
+from pyintacct.extract import ExtractStats, extract, flatten, output_format
+
+
+def make_gateway(n=25):
+    return Gateway({'CUSTOMER': [{'RECORDNO': str(i), 'CUSTOMERID': f'C{i}', 'NAME': f'Customer {i}',
+                                  'STATUS': 'active' if i % 2 else 'inactive'} for i in range(1, n + 1)]})
+
+
+def test_jsonl(tmp_path, make_gateway_client):
+    client = make_gateway_client(make_gateway())
+    path = tmp_path / 'customers.jsonl.gz'
+    reports = []
+    stats = extract(client, 'CUSTOMER', str(path), "STATUS = 'active'", 'RECORDNO,NAME', pagesize=4,
+                    batch_rows=5, progress=reports.append, interval=0)
+    records = [json.loads(line) for line in gzip.open(path, 'rt')]
+    assert records == [{'RECORDNO': str(i), 'NAME': f'Customer {i}'} for i in range(1, 26, 2)]
+    assert stats.rows == 13 and stats.bytes == path.stat().st_size
+    assert [report.rows for report in reports] == [5, 10, 13]
+
+
+def test_csv(tmp_path, make_gateway_client):
+    client = make_gateway_client(make_gateway(7))
+    path = tmp_path / 'customers.csv'
+    assert extract(client, 'CUSTOMER', str(path), pagesize=3).rows == 7
+    rows = list(csv.DictReader(open(path, newline='')))
+    assert list(rows[0])[:4] == ['RECORDNO', 'CUSTOMERID', 'NAME', 'STATUS'] and rows[0]['NAME'] == 'Customer 1'
+    assert len(rows) == 7
+
+    path = tmp_path / 'none.csv'
+    assert extract(client, 'CUSTOMER', str(path), "STATUS = 'closed'", 'RECORDNO,NAME').rows == 0
+    assert path.read_text().strip() == 'RECORDNO,NAME'
+    assert flatten({'A': {'B': '1', 'C': {'D': ''}}, 'E': '2'}) == {'A.B': '1', 'A.C.D': '', 'E': '2'}
+    assert output_format('x.csv.gz') == 'csv' and output_format('x') == 'jsonl'
+    with pytest.raises(ValueError):
+        extract(client, 'CUSTOMER', str(path), compression='zstd')
+
+
+def test_parquet(tmp_path, make_gateway_client):
+    pq = pytest.importorskip('pyarrow.parquet')
+    client = make_gateway_client(make_gateway())
+    path = tmp_path / 'customers.parquet'
+    stats = extract(client, 'CUSTOMER', str(path), fields='RECORDNO,NAME', pagesize=10, batch_rows=10,
+                    compression='zstd')
+    assert stats == ExtractStats(25, stats.seconds, path.stat().st_size)
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column('RECORDNO').to_pylist() == list(range(1, 26))
+    assert table.column('NAME').to_pylist()[-1] == 'Customer 25'
+
+    path = tmp_path / 'none.parquet'
+    assert extract(client, 'CUSTOMER', str(path), "STATUS = 'closed'", 'RECORDNO,NAME').rows == 0
+    assert pq.read_table(path).column_names == ['RECORDNO', 'NAME']
+
+
+def test_parquet_prefetch(tmp_path, monkeypatch, make_gateway_client):
+    pq = pytest.importorskip('pyarrow.parquet')
+    client = make_gateway_client(make_gateway())
+    threads = set()
+    yield_streamed = client.yield_streamed
+
+    def record_thread(*args):
+        for record in yield_streamed(*args):
+            threads.add(threading.current_thread())
+            yield record
+
+    monkeypatch.setattr(client, 'yield_streamed', record_thread)
+    path = tmp_path / 'customers.parquet'
+    assert extract(client, 'CUSTOMER', str(path), fields='RECORDNO,NAME', pagesize=10, batch_rows=10).rows == 25
+    assert threads and threading.current_thread() not in threads
+    assert pq.read_table(path).column('RECORDNO').to_pylist() == list(range(1, 26))
+
+    threads.clear()
+    extract(client, 'CUSTOMER', str(path), fields='RECORDNO,NAME', prefetch=0)
+    assert threads == {threading.current_thread()}
+
+
+def test_extract_command(tmp_path, monkeypatch, capsys, make_gateway_client):
+    gateway = make_gateway()
+    monkeypatch.setattr(cli, 'client_from_environment', lambda args, **kwargs: make_gateway_client(gateway))
+    path = tmp_path / 'out.jsonl'
+    assert cli.main(['extract', 'CUSTOMER', '--fields', 'CUSTOMERID', '--output', str(path), '--pagesize', '10']) == 0
+    assert len(path.read_text().splitlines()) == 25
+    assert capsys.readouterr().err.startswith('25 rows in ')
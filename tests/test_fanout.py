@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+from pyintacct import IntacctAPI
+from pyintacct.emulator import Gateway
+from pyintacct.fanout import FanOut, Tenant, by_tenant
+
+
+def make_gateways(tenants):
+    return {tenant: Gateway({'CUSTOMER': [{'RECORDNO': str(i), 'CUSTOMERID': f'{tenant}-{i}', 'NAME': f'Customer {i}'}
+                                          for i in range(1, 4)]}) for tenant in tenants}
+
+
+def test_tenant():
+    assert Tenant.parse('ACME/EAST') == Tenant('ACME', 'EAST')
+    assert Tenant.parse('ACME').name == 'ACME' and Tenant('ACME', 'EAST').name == 'ACME/EAST'
+    with pytest.raises(ValueError):
+        FanOut(['ACME', 'ACME'])
+
+
+def test_read_by_query_per_tenant():
+    gateways = make_gateways(['ACME', 'ACME/EAST', 'GLOBEX'])
+
+    def factory(tenant):
+        return IntacctAPI('sender_id', 'sender_pass', company_id=tenant.company_id, entity_id=tenant.entity_id,
+                          user_id='user', user_password='password', transport=gateways[tenant.name].transport())
+
+    with FanOut(gateways, client_factory=factory, share_connections=False) as fanout:
+        results = list(fanout.read_by_query('CUSTOMER', fields='CUSTOMERID', ordered=True))
+        assert [result.tenant.name for result in results] == ['ACME', 'ACME/EAST', 'GLOBEX']
+        for result in results:
+            assert [str(r['CUSTOMERID']) for r in result.unwrap()] == [f'{result.tenant.name}-{i}' for i in (1, 2, 3)]
+        results = list(fanout.read_by_query('NOSUCHOBJECT', tenants=['GLOBEX']))
+        assert len(results) == 1 and not results[0].ok
+        with pytest.raises(Exception):
+            results[0].unwrap()
+
+
+def test_concurrency_caps():
+    gateway = Gateway()
+    tenants = ['A', 'B', 'C']
+    running, peaks, lock = {}, {}, threading.Lock()
+
+    def work(client, item):
+        name = client.company_id
+        with lock:
+            running[name] = running.get(name, 0) + 1
+            running['*'] = running.get('*', 0) + 1
+            peaks[name] = max(peaks.get(name, 0), running[name])
+            peaks['*'] = max(peaks.get('*', 0), running['*'])
+        time.sleep(0.01)
+        with lock:
+            running[name] -= 1
+            running['*'] -= 1
+        if item == 5:
+            raise ValueError(item)
+        return item * 2
+
+    with FanOut(tenants, max_workers=4, per_tenant=2, sender_id='s', sender_password='p', user_id='u',
+                user_password='p', transport=gateway.transport()) as fanout:
+        results = list(fanout.map(work, [(tenant, i) for i in range(6) for tenant in tenants]))
+        clients = [fanout.client(tenant) for tenant in tenants]
+    assert len(results) == 18
+    assert max(peaks[tenant] for tenant in tenants) == 2 and peaks['*'] == 4
+    grouped = by_tenant(results)
+    assert sorted(grouped) == tenants
+    assert sorted(result.value for result in grouped['A'] if result.ok) == [0, 2, 4, 6, 8]
+    assert [result.item for result in results if not result.ok] == [5, 5, 5]
+    assert isinstance(results[0].tenant, Tenant)
+    # All tenants share one connection pool.
+    assert clients[0].http_client is clients[1].http_client is clients[2].http_client
+
+
+def test_grouped_tasks_keep_workers_busy():
+    gateway = Gateway()
+    tenants = ['A', 'B', 'C', 'D']
+    running, peaks, lock = {}, {}, threading.Lock()
+
+    def work(client, item):
+        with lock:
+            running[client.company_id] = running.get(client.company_id, 0) + 1
+            peaks[client.company_id] = max(peaks.get(client.company_id, 0), running[client.company_id])
+            peaks['*'] = max(peaks.get('*', 0), sum(running.values()))
+        time.sleep(0.02)
+        with lock:
+            running[client.company_id] -= 1
+        return item
+
+    # Grouped by tenant, the natural order: waiting on one tenant must not idle the workers.
+    tasks = [(tenant, i) for tenant in tenants for i in range(8)]
+    with FanOut(tenants, max_workers=8, per_tenant=2, sender_id='s', sender_password='p', user_id='u',
+                user_password='p', transport=gateway.transport()) as fanout:
+        results = list(fanout.map(work, tasks, ordered=True))
+    assert [(result.tenant.name, result.value) for result in results] == tasks
+    assert max(peaks[tenant] for tenant in tenants) == 2 and peaks['*'] == 8
+
+
+def test_per_tenant_cap_is_shared_between_runs():
+    gateway = Gateway()
+    running, peaks, lock = {}, {}, threading.Lock()
+
+    def work(client, item):
+        with lock:
+            running[client.company_id] = running.get(client.company_id, 0) + 1
+            peaks[client.company_id] = max(peaks.get(client.company_id, 0), running[client.company_id])
+        time.sleep(0.01)
+        with lock:
+            running[client.company_id] -= 1
+        return item
+
+    with FanOut(['A', 'B'], max_workers=8, per_tenant=2, sender_id='s', sender_password='p', user_id='u',
+                user_password='p', transport=gateway.transport()) as fanout:
+        results = []
+        threads = [threading.Thread(target=lambda: results.extend(fanout.map(work, [('A', i) for i in range(10)])))
+                   for _ in range(3)]
+        threads.append(threading.Thread(target=lambda: results.extend(fanout.run(lambda client: work(client, 0)))))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert fanout._running == {}
+    assert len(results) == 32 and all(result.ok for result in results)
+    assert peaks == {'A': 2, 'B': 1}
+
+
+def test_tasks_are_read_lazily():
+    gateway = Gateway()
+    read = []
+
+    def tasks(tenants):
+        for i in range(100):
+            read.append(i)
+            yield tenants[i % len(tenants)], i
+
+    with FanOut(['A', 'B'], max_workers=2, per_tenant=1, sender_id='s', sender_password='p', user_id='u',
+                user_password='p', transport=gateway.transport()) as fanout:
+        results = fanout.map(lambda client, item: item, tasks(['A', 'B']), ordered=True)
+        assert next(results).value == 0 and len(read) < 10
+        assert [result.value for result in results] == list(range(1, 100))
+        # While the only tenant is busy, at most `lookahead` tasks are held back.
+        read.clear()
+        results = fanout.map(lambda client, item: time.sleep(0.01), tasks(['A']), lookahead=3)
+        next(results)
+        assert len(read) <= 5
+        results.close()
+
+
+def test_create_many_by_tenant():
+    gateway = Gateway()
+    with FanOut(['ACME', 'GLOBEX'], sender_id='s', sender_password='p', user_id='u', user_password='p',
+                transport=gateway.transport()) as fanout:
+        objs = {'ACME': [{'CUSTOMER': {'CUSTOMERID': f'A{i}', 'NAME': f'A {i}'}} for i in range(3)],
+                'GLOBEX': [{'CUSTOMER': {'CUSTOMERID': 'G1', 'NAME': 'G 1'}}]}
+        results = {result.tenant.name: result.unwrap() for result in fanout.create_many(objs, batch_size=2)}
+    assert [len(results['ACME']), len(results['GLOBEX'])] == [3, 1]
+    assert all(r.ok for r in results['ACME'] + results['GLOBEX'])
@@ -0,0 +1,78 @@
+import pytest
+
+from pyintacct import IntacctAPI
+from pyintacct.emulator import Gateway
+from pyintacct.exceptions import IntacctServerError
+from pyintacct.journal import DUPLICATE, FAILURE, SENT, SUCCESS, BulkLoad, MemoryWriteJournal, \
+    SQLiteWriteJournal
+
+
+def customers(n):
+    return [{'CUSTOMER': {'CUSTOMERID': f'C{i:03}', 'NAME': f'Customer {i}'}} for i in range(n)]
+
+
+def test_load_is_idempotent(make_gateway_client):
+    gateway = Gateway()
+    client = make_gateway_client(gateway)
+    journal = MemoryWriteJournal()
+    entries = BulkLoad(client, journal, 'customers', batch_size=10).create(customers(25))
+    assert [entry.status for entry in entries] == [SUCCESS] * 25
+    assert [entry.key for entry in entries] == [record['RECORDNO'] for record in gateway.objects['CUSTOMER']]
+    assert len({entry.controlid for entry in entries}) == 25
+
+    requests = gateway.requests
+    assert BulkLoad(client, journal, 'customers', batch_size=10).create(customers(25)) == entries
+    assert gateway.requests == requests
+    assert journal.summary('customers') == {SUCCESS: 25}
+    with pytest.raises(ValueError, match='different operation'):
+        BulkLoad(client, journal, 'customers').update(customers(25))
+
+
+@pytest.mark.parametrize('processed', [True, False])
+def test_resume_after_lost_response(tmp_path, processed, make_gateway_client):
+    gateway = Gateway()
+    client = make_gateway_client(gateway)
+    journal = SQLiteWriteJournal(str(tmp_path / 'journal.db'))
+    gateway.fail_next(1, status=500, processed=processed)
+    with pytest.raises(IntacctServerError):
+        BulkLoad(client, journal, 'customers', batch_size=10).create(customers(25))
+    assert journal.summary('customers') == {SENT: 10}
+    request = journal.entries('customers')['0'].request
+
+    entries = BulkLoad(client, SQLiteWriteJournal(str(tmp_path / 'journal.db')), 'customers',
+                       batch_size=10).create(customers(25))
+    statuses = [entry.status for entry in entries]
+    assert statuses == [DUPLICATE if processed else SUCCESS] * 10 + [SUCCESS] * 15
+    assert [record['CUSTOMERID'] for record in gateway.objects['CUSTOMER']] == [f'C{i:03}' for i in range(25)]
+    assert entries[0].request == request and entries[0].attempts == 1
+
+
+def test_failed_items_and_keys(make_gateway_client):
+    gateway = Gateway({'CUSTOMER': [{'RECORDNO': str(i), 'CUSTOMERID': f'C{i}'} for i in range(1, 4)]})
+    client = make_gateway_client(gateway)
+    journal = MemoryWriteJournal()
+    updates = [{'CUSTOMER': {'RECORDNO': str(i), 'NAME': f'Renamed {i}'}} for i in (3, 1, 9, 2)]
+
+    def key(obj):
+        return obj['CUSTOMER']['RECORDNO']
+
+    entries = BulkLoad(client, journal, 'rename', key=key).update(updates)
+    assert [(entry.item, entry.status) for entry in entries] == [('3', SUCCESS), ('1', SUCCESS), ('9', FAILURE),
+                                                                ('2', SUCCESS)]
+    assert entries[2].error and entries[2].key is None
+
+    gateway.load('CUSTOMER', [{'RECORDNO': '9', 'CUSTOMERID': 'C9'}])
+    assert BulkLoad(client, journal, 'rename', key=key).update(updates[::-1])[1].status == FAILURE
+    entries = BulkLoad(client, journal, 'rename', key=key, retry_failed=True).update(updates[::-1])
+    assert [entry.status for entry in entries] == [SUCCESS] * 4 and entries[1].attempts == 2
+    assert {record['NAME'] for record in gateway.objects['CUSTOMER']} == {f'Renamed {i}' for i in (1, 2, 3, 9)}
+
+    with pytest.raises(ValueError, match='unique'):
+        BulkLoad(client, journal, 'other', key=lambda obj: 'same').update(updates)
+
+
+def test_request_control_id():
+    client = IntacctAPI('sender_id', 'sender_pass')
+    body = client.serialize(client.get_payload([client.new_function('f')], controlid='batch-1', uniqueid=True), 's')
+    assert b'<controlid>batch-1</controlid><uniqueid>true</uniqueid>' in body
+    assert b'<uniqueid>false</uniqueid>' in client.serialize(client.get_payload([client.new_function('f')]), 's')
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from pyintacct.partition import partition_queries, probe_boundaries
+from .utils import query_handler
+
+RECORDS = [{'RECORDNO': str(n), 'NAME': f'Location {n}'} for n in range(5, 1000, 3)]
+
+
+def test_partition_queries():
+    assert partition_queries("STATUS = 'active'", 'RECORDNO', [10, 20]) == [
+        "(STATUS = 'active') AND RECORDNO < 10",
+        "(STATUS = 'active') AND RECORDNO >= 10 AND RECORDNO < 20",
+        "(STATUS = 'active') AND RECORDNO >= 20"]
+    assert partition_queries('', 'WHENMODIFIED', [datetime(2024, 1, 2, 3, 4, 5)]) == [
+        "WHENMODIFIED < '01/02/2024 03:04:05'", "WHENMODIFIED >= '01/02/2024 03:04:05'"]
+
+
+def test_probe_boundaries(make_mock_client):
+    client = make_mock_client(query_handler('location', RECORDS))
+    boundaries = probe_boundaries(client, 'LOCATION', '', partitions=4)
+    assert len(boundaries) == 3
+    assert boundaries == sorted(boundaries)
+    assert 200 < boundaries[0] < 300 and 700 < boundaries[-1] < 800
+
+
+def test_yield_partitioned_unordered(make_mock_client):
+    client = make_mock_client(query_handler('location', RECORDS, delay=0.001))
+    records = list(client.yield_partitioned('LOCATION', partitions=4, pagesize=20, max_workers=2))
+    assert sorted(int(r['RECORDNO']) for r in records) == [int(r['RECORDNO']) for r in RECORDS]
+
+
+def test_yield_partitioned_ordered(make_mock_client):
+    client = make_mock_client(query_handler('location', RECORDS))
+    records = list(client.yield_partitioned('LOCATION', 'RECORDNO > 100', boundaries=[300, 600], ordered=True,
+                                            pagesize=25, as_tuples=True, fields='RECORDNO'))
+    assert [int(r[0]) for r in records] == [int(r['RECORDNO']) for r in RECORDS if int(r['RECORDNO']) > 100]
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from pyintacct.prefetch import merged, prefetched
+from .utils import page_handler
+
+
+def test_prefetched_preserves_order():
+    assert list(prefetched(iter(range(100)), 3)) == list(range(100))
+
+
+def test_prefetched_buffer_is_bounded():
+    produced = []
+
+    def source():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    iterator = prefetched(source(), 2)
+    assert next(iterator) == 0
+    time.sleep(0.2)
+    # One item consumed, two buffered and one waiting to be buffered.
+    assert len(produced) <= 4
+    iterator.close()
+
+
+def test_prefetched_reraises_errors():
+    def source():
+        yield 1
+        raise ValueError('boom')
+
+    iterator = prefetched(source(), 2)
+    assert next(iterator) == 1
+    with pytest.raises(ValueError):
+        next(iterator)
+
+
+def test_yield_by_query_prefetch(make_mock_client):
+    threads = set()
+    handler = page_handler([[1, 2], [3, 4], [5]])
+
+    def recording_handler(request):
+        threads.add(threading.current_thread().name)
+        return handler(request)
+
+    client = make_mock_client(recording_handler)
+    records = list(client.yield_by_query('LOCATION', '', prefetch=2))
+    assert [record['LOCATIONID'] for record in records] == ['1', '2', '3', '4', '5']
+    assert threads == {'pyintacct-prefetch'}
+
+
+def test_merged_does_not_start_iterables_after_close():
+    started = []
+
+    def source(i):
+        started.append(i)
+        for _ in range(5):
+            time.sleep(0.02)
+            yield i
+
+    iterator = merged([source(i) for i in range(10)], max_workers=2, depth=2)
+    next(iterator)
+    before = sorted(started)
+    iterator.close()
+    time.sleep(0.3)
+    assert before == [0, 1] and sorted(started) == before
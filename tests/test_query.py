@@ -0,0 +1,89 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+from pyintacct import AsyncIntacctAPI, IntacctAPI
+from pyintacct.emulator import Gateway
+from pyintacct.envelope import Envelope
+from pyintacct.query import Field, all_of, any_of
+
+
+def make_gateway(n=95):
+    return Gateway({'VENDOR': [{'RECORDNO': str(i), 'VENDORID': f'V{i:03}', 'NAME': f'Vendor {i}',
+                                'STATUS': 'inactive' if i % 10 == 0 else 'active',
+                                'WHENCREATED': f'01/{i % 28 + 1:02}/2024'} for i in range(1, n + 1)]})
+
+
+def test_filter_xml():
+    f = (Field('STATUS') == 'active') & (Field('WHENMODIFIED') >= datetime(2024, 1, 2, 3, 4, 5)) & \
+        (Field('VENDORID').isin(['V1', 'V2']) | Field('NAME').like('Acme%') | Field('TERMNAME').isnull())
+    assert Envelope.function(f.to_xml()) == (
+        b'<and><equalto><field>STATUS</field><value>active</value></equalto><greaterthanorequalto>'
+        b'<field>WHENMODIFIED</field><value>01/02/2024 03:04:05</value></greaterthanorequalto><or><in>'
+        b'<field>VENDORID</field><value>V1</value><value>V2</value></in><like><field>NAME</field>'
+        b'<value>Acme%</value></like><isnull><field>TERMNAME</field></isnull></or></and>')
+    assert Envelope.function(Field('WHENDUE').between(date(2024, 1, 1), date(2024, 3, 31)).to_xml()) == (
+        b'<between><field>WHENDUE</field><value>01/01/2024</value><value>03/31/2024</value></between>')
+    assert all_of(Field('A') == 1).node() == ('equalto', {'field': 'A', 'value': '1'})
+    assert any_of(Field('A') == True, Field('B') != 2).node()[0] == 'or'  # noqa: E712
+
+
+def test_query_payload():
+    client = IntacctAPI('sender_id', 'sender_pass')
+    body = client.serialize(client.query_payload('VENDOR', 'RECORDNO, NAME', Field('STATUS') == 'active',
+                                                 ['NAME', '-RECORDNO'], 100, 200, case_insensitive=True), 's')
+    assert (b'<query><object>VENDOR</object><select><field>RECORDNO</field><field>NAME</field></select><filter>'
+            b'<equalto><field>STATUS</field><value>active</value></equalto></filter><orderby><order><field>NAME'
+            b'</field><ascending></ascending></order><order><field>RECORDNO</field><descending></descending>'
+            b'</order></orderby><options><caseinsensitive>true</caseinsensitive></options><pagesize>100</pagesize>'
+            b'<offset>200</offset></query>') in body
+    with pytest.raises(ValueError):
+        client.query_payload('VENDOR', '*')
+    assert b'<pagesize>2000</pagesize>' in client.serialize(client.query_payload('VENDOR', 'NAME', pagesize=5000), 's')
+    with pytest.raises(ValueError):
+        client.query_payload('VENDOR', 'NAME', pagesize=0)
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_yield_query(ordered, make_gateway_client):
+    gateway = make_gateway()
+    client = make_gateway_client(gateway)
+    f = (Field('STATUS') == 'active') & Field('RECORDNO').between(3, 90)
+    records = list(client.yield_query('VENDOR', ['RECORDNO', 'VENDORID'], f, pagesize=10, max_workers=3,
+                                      ordered=ordered))
+    expected = [i for i in range(3, 91) if i % 10]
+    keys = [int(record['RECORDNO']) for record in records]
+    assert (keys if ordered else sorted(keys)) == expected
+    assert gateway.requests == 1 + 8  # the session, then one request per page
+    assert client.query('VENDOR', 'RECORDNO', Field('VENDORID') == 'none') == []
+
+
+def test_query_filters_and_order(make_gateway_client):
+    client = make_gateway_client(make_gateway(30))
+
+    def ids(f, orderby=None):
+        return [str(record['VENDORID']) for record in client.query('VENDOR', 'VENDORID', f, orderby, pagesize=7)]
+
+    assert ids(Field('STATUS') == 'inactive', '-VENDORID') == ['V030', 'V020', 'V010']
+    assert ids(Field('VENDORID').notin(['V001', 'V002']) & (Field('RECORDNO') < 5)) == ['V003', 'V004']
+    assert ids(Field('WHENCREATED') > date(2024, 1, 27)) == ['V027']
+    assert ids(Field('NAME').like('Vendor 2_') | (Field('RECORDNO') <= 1)) == \
+        ['V001'] + [f'V{i:03}' for i in range(20, 30)]
+    assert ids(Field('NAME').isnotnull() & Field('NAME').notlike('%1%'), 'RECORDNO')[:3] == ['V002', 'V003', 'V004']
+
+
+def test_async_yield_query():
+    gateway = make_gateway()
+
+    async def run():
+        async with AsyncIntacctAPI('sender_id', 'sender_pass', company_id='company', user_id='user',
+                                   user_password='password', transport=gateway.transport(),
+                                   max_concurrency=4) as client:
+            unordered = [record async for record in client.yield_query('VENDOR', 'RECORDNO', pagesize=10)]
+            ordered = await client.query('VENDOR', 'RECORDNO', Field('STATUS') == 'active', pagesize=10)
+            return unordered, ordered
+
+    unordered, ordered = asyncio.run(run())
+    assert sorted(int(record['RECORDNO']) for record in unordered) == list(range(1, 96))
+    assert [int(record['RECORDNO']) for record in ordered] == [i for i in range(1, 96) if i % 10]
@@ -0,0 +1,75 @@
+import threading
+from decimal import Decimal
+
+import pytest
+from jxmlease import parse
+
+from pyintacct import IntacctException
+from pyintacct.models.accounts_receivable import ARInvoice, LineItem, LineItemDetail
+from pyintacct.models.base import Date
+from pyintacct.refdata import ReferenceData, ReferenceIndex
+from .utils import query_handler
+
+
+def location(n, modified='01/01/2024 00:00:00'):
+    return {'RECORDNO': str(n), 'LOCATIONID': f'L{n:03}', 'WHENMODIFIED': modified}
+
+
+def test_reference_index(make_mock_client):
+    records = [location(n, f'01/0{i + 1}/2024 00:00:00') for i, n in enumerate((5, 12, 10, 11, 200))]
+    requests = []
+    handler = query_handler('location', records)
+    client = make_mock_client(lambda request: requests.append(request) or handler(request))
+    index = ReferenceIndex(client, 'LOCATION', 'LOCATIONID', ttl=None, pagesize=2)
+
+    assert 'L010' in index and 'L999' not in index
+    assert index['L005']['RECORDNO'] == '5'
+    assert [r['LOCATIONID'] for r in index.prefix('L01')] == ['L010', 'L011', 'L012']
+    assert [r['LOCATIONID'] for r in index.range('L011', 'L200')] == ['L011', 'L012']
+    assert len(index) == 5
+    assert len(requests) == 3  # one load, paged, shared by every lookup
+
+    records.append(location(300, '02/01/2024 00:00:00'))
+    records[0]['WHENMODIFIED'] = '03/01/2024 00:00:00'
+    assert index.refresh() == 3  # the two changes and the record at the previous high-water mark
+    query = next(parse(requests[-2].content.decode('utf-8')).find_nodes_with_tag('query'))
+    assert query == "WHENMODIFIED >= '01/05/2024 00:00:00'"
+    assert 'L300' in index
+
+
+def test_lookups_during_reload(make_mock_client):
+    client = make_mock_client(query_handler('location', [location(n) for n in range(1, 7)], delay=0.02))
+    index = ReferenceIndex(client, 'LOCATION', 'LOCATIONID', ttl=None, pagesize=2)
+    assert len(index) == 6
+    thread = threading.Thread(target=index.reload)
+    thread.start()
+    misses = 0
+    while thread.is_alive():
+        misses += 'L001' not in index or not index.prefix('L00')
+    thread.join()
+    assert misses == 0 and len(index) == 6
+
+
+def test_reference_data_validate(make_mock_client):
+    handlers = {'LOCATION': query_handler('location', [location(1), location(2)]),
+                'DEPARTMENT': query_handler('department', [{'DEPARTMENTID': 'D1', 'WHENMODIFIED': ''}])}
+
+    def handler(request):
+        function = next(parse(request.content.decode('utf-8')).find_nodes_with_tag('function'))
+        return handlers[str(function['readByQuery']['object'])](request)
+
+    refdata = ReferenceData(make_mock_client(handler),
+                            fields={'locationid': ('LOCATION', 'LOCATIONID'),
+                                    'departmentid': ('DEPARTMENT', 'DEPARTMENTID')})
+    invoice = ARInvoice(customerid='C1', datecreated=Date(year='2024', month='1', day='1'), action='Submit',
+                        invoiceitems=LineItem(lineitem=[
+                            LineItemDetail(glaccountno='4000', amount=Decimal(1), locationid='L001',
+                                           departmentid='D1'),
+                            LineItemDetail(glaccountno='4000', amount=Decimal(2), locationid='L003')]))
+    missing = refdata.missing(invoice)
+    assert [(m.path, m.object, m.value) for m in missing] == [
+        ('invoiceitems.lineitem[1].locationid', 'LOCATION', 'L003')]
+    with pytest.raises(IntacctException, match='L003'):
+        refdata.validate(invoice)
+    refdata.validate({'lineitem': [{'LOCATIONID': 'L002', 'DEPARTMENTID': 'D1'}]})
+    assert refdata.lookup('location', 'L002')['RECORDNO'] == '2'
@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+import pytest
+
+from pyintacct.exceptions import IntacctRateLimitError, IntacctServerError
+from pyintacct.retry import AdaptiveLimit, RetryPolicy, TokenBucket
+from .utils import page_handler
+
+
+def flaky(handler, failures, status=503):
+    """Fails the first `failures` requests with `status`, recording every request."""
+    calls = []
+
+    def _handler(request):
+        calls.append(request)
+        if len(calls) <= failures:
+            return httpx.Response(status, text='Service Unavailable')
+        return handler(request)
+    _handler.calls = calls
+    return _handler
+
+
+def test_token_bucket_paces_requests():
+    bucket = TokenBucket(rate=100, burst=2)
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(0.01, abs=0.002)
+    assert waits[4] == pytest.approx(0.03, abs=0.002)
+
+
+def test_adaptive_limit_aimd():
+    limit = AdaptiveLimit(initial=8, cooldown=0)
+    assert limit.try_acquire()
+    limit.release(throttled=True)
+    assert limit.limit == 4
+    for _ in range(4):
+        limit.acquire()
+        limit.release()
+    assert 4.9 < limit.limit < 5
+    for _ in range(4):
+        assert limit.try_acquire()
+    assert not limit.try_acquire()
+
+
+def test_backoff_is_bounded():
+    policy = RetryPolicy(backoff_base=1, backoff_max=4)
+    assert all(0 <= policy.backoff(attempt) <= 4 for attempt in range(10))
+
+
+def test_idempotent_requests_are_retried(make_mock_client):
+    handler = flaky(page_handler([[1, 2]]), failures=2)
+    client = make_mock_client(handler, policy=RetryPolicy(backoff_base=0.001))
+    assert len(client.read_by_query('LOCATION', '')) == 2
+    assert len(handler.calls) == 3
+    assert client.policy.limit.in_flight == 0
+
+
+def test_writes_are_not_retried(make_mock_client):
+    handler = flaky(page_handler([[1]]), failures=1)
+    client = make_mock_client(handler, policy=RetryPolicy(backoff_base=0.001))
+    with pytest.raises(IntacctServerError):
+        client.create({'LOCATION': {'LOCATIONID': 'L1'}})
+    assert len(handler.calls) == 1
+
+
+def test_retries_are_limited(make_mock_client):
+    handler = flaky(page_handler([[1]]), failures=10, status=429)
+    client = make_mock_client(handler, policy=RetryPolicy(max_attempts=3, backoff_base=0.001))
+    with pytest.raises(IntacctRateLimitError):
+        client.inspect('LOCATION')
+    assert len(handler.calls) == 3
+    assert client.policy.limit.limit < 4
+
+
+def test_cancelled_call_releases_its_slot():
+    policy = RetryPolicy(limit=AdaptiveLimit(initial=1, maximum=1))
+
+    async def run():
+        started = asyncio.Event()
+
+        async def attempt():
+            started.set()
+            await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(policy.call_async(['readByQuery'], attempt))
+        await started.wait()
+        assert policy.limit.in_flight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert policy.limit.in_flight == 0
+
+        async def quick():
+            return 'ok'
+
+        return await asyncio.wait_for(policy.call_async(['readByQuery'], quick), 1)
+
+    assert asyncio.run(run()) == 'ok'
@@ -0,0 +1,114 @@
+import logging
+from typing import Optional
+
+import pytest
+from jxmlease import parse
+from pydantic import BaseModel
+
+from pyintacct import IntacctException, MetadataCache
+from pyintacct.client import WIDE_OBJECT_FIELDS
+from pyintacct.emulator import Gateway
+from pyintacct.schema import FieldInfo, ObjectSchema, parse_fields
+from .utils import inspect_handler
+
+TYPES = {'RECORDNO': 'INTEGER', 'CUSTOMERID': 'TEXT', 'TOTALDUE': 'CURRENCY'}
+
+
+def test_describe_parses_fields(make_mock_client):
+    client = make_mock_client(inspect_handler('ARINVOICE', TYPES))
+    schema = client.describe('ARINVOICE')
+    assert schema.names == ('RECORDNO', 'CUSTOMERID', 'TOTALDUE')
+    assert schema.types == TYPES
+    assert schema.get('RECORDNO') == FieldInfo('RECORDNO', 'INTEGER', 'Recordno', False, True, 8)
+    assert 'CUSTOMERID' in schema and 'CUSTOMER' not in schema
+
+
+def test_describe_is_cached_until_invalidated(make_mock_client):
+    calls = []
+    client = make_mock_client(inspect_handler('ARINVOICE', TYPES, calls))
+    assert client.describe('ARINVOICE') is client.describe('arinvoice')
+    assert len(calls) == 1
+    client.invalidate_metadata('ARINVOICE')
+    client.describe('ARINVOICE')
+    client.describe('ARINVOICE', refresh=True)
+    assert len(calls) == 3
+
+
+def test_describe_expires(make_mock_client):
+    calls = []
+    client = make_mock_client(inspect_handler('ARINVOICE', TYPES, calls), metadata_cache=MetadataCache(ttl=-1))
+    client.describe('ARINVOICE')
+    client.describe('ARINVOICE')
+    assert len(calls) == 2
+
+
+def test_metadata_cache_persists(make_mock_client, tmp_path):
+    path = str(tmp_path / 'metadata.json')
+    client = make_mock_client(inspect_handler('ARINVOICE', TYPES), metadata_cache=MetadataCache(path=path))
+    schema = client.describe('ARINVOICE')
+    calls = []
+    client = make_mock_client(inspect_handler('ARINVOICE', TYPES, calls), metadata_cache=MetadataCache(path=path))
+    assert client.describe('ARINVOICE') == schema
+    assert calls == []
+
+
+def test_nameless_fields_and_corrupt_cache(make_mock_client, tmp_path):
+    response = parse('<response><Type Name="ARINVOICE"><Fields><Field><ID>RECORDNO</ID></Field>'
+                     '<Field><DATATYPE>TEXT</DATATYPE></Field></Fields></Type></response>')
+    schema = ObjectSchema('ARINVOICE', parse_fields(response))
+    assert schema.names == ('RECORDNO',)
+    with pytest.raises(IntacctException, match='NAME'):
+        schema.check(['recordno', 'NAME'])
+
+    path = tmp_path / 'metadata.json'
+    path.write_text('{"company|ARINVOICE": [1, "ARINVOICE", [["RECORDNO"')
+    calls = []
+    client = make_mock_client(inspect_handler('ARINVOICE', TYPES, calls), metadata_cache=MetadataCache(path=str(path)))
+    assert client.describe('ARINVOICE').names == ('RECORDNO', 'CUSTOMERID', 'TOTALDUE')
+    assert len(calls) == 1
+
+
+class Invoice(BaseModel):
+    RECORDNO: int
+    CUSTOMERID: str
+    TOTALDUE: Optional[str] = None
+
+
+def test_projection_from_model(make_gateway_client):
+    gateway = Gateway({'ARINVOICE': [dict({f'FIELD{i}': str(i) for i in range(50)}, CUSTOMERID=f'C{n}',
+                                          TOTALDUE='9.50') for n in range(3)]})
+    client = make_gateway_client(gateway)
+    invoices = client.read_by_query('ARINVOICE', '', model=Invoice)
+    assert [invoice.CUSTOMERID for invoice in invoices] == ['C0', 'C1', 'C2'] and invoices[0].TOTALDUE == '9.50'
+    assert client.projection('ARINVOICE', model=Invoice) == 'RECORDNO,CUSTOMERID,TOTALDUE'
+    assert client.projection('ARINVOICE', ['RECORDNO', 'CUSTOMERID']) == 'RECORDNO,CUSTOMERID'
+    assert client.projection('ARINVOICE', 'RECORDNO', model=Invoice) == 'RECORDNO'
+    records = client.read_by_query('ARINVOICE', '', ['CUSTOMERID'], as_dicts=True)
+    assert records == [{'CUSTOMERID': f'C{n}'} for n in range(3)]
+
+
+def test_check_fields(make_gateway_client):
+    gateway = Gateway({'ARINVOICE': [{'CUSTOMERID': 'C1', 'TOTALDUE': '1'}]})
+    client = make_gateway_client(gateway, check_fields=True)
+    requests = gateway.requests
+    with pytest.raises(IntacctException, match='Unknown fields for ARINVOICE: CUSTOMERNAME'):
+        client.read_by_query('ARINVOICE', '', 'CUSTOMERID,CUSTOMERNAME')
+    assert gateway.requests == requests + 1  # only the inspect
+    assert len(client.read_by_query('ARINVOICE', '', 'customerid, CUSTOMER.NAME')) == 1
+    assert client.read_by_query('ARINVOICE', '', model=Invoice)[0].CUSTOMERID == 'C1'
+    assert gateway.requests == requests + 3
+
+
+def test_wide_object_warning(caplog, make_gateway_client):
+    gateway = Gateway({'ARINVOICE': [{f'FIELD{i}': str(i) for i in range(WIDE_OBJECT_FIELDS)}]})
+    client = make_gateway_client(gateway)
+    with caplog.at_level(logging.WARNING, logger='pyintacct.client'):
+        client.read_by_query('ARINVOICE', '')
+        assert not caplog.records  # the width is unknown until the object is described
+        client.describe('ARINVOICE')
+        client.read_by_query('ARINVOICE', '')
+        client.read_by_query('ARINVOICE', '')
+        client.read_by_query('ARINVOICE', '', 'FIELD1')
+    assert [record.getMessage() for record in caplog.records] == [
+        f'Reading all {WIDE_OBJECT_FIELDS + 2} fields of ARINVOICE; pass fields or a model to read only the ones '
+        f'you use.']
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from pyintacct import MemorySessionStore, SQLiteSessionStore
+from pyintacct.sessions import Session, SessionStore
+from .utils import login_handler, page_handler
+
+
+def test_memory_store_shares_session(make_mock_client):
+    logins = []
+    store = MemorySessionStore()
+    handler = login_handler(page_handler([[1]]), logins)
+    clients = [make_mock_client(handler, session_id=None, session_expiration=0, session_store=store)
+               for _ in range(3)]
+    for client in clients:
+        client.read_by_query('LOCATION', '')
+    assert len(logins) == 1
+    assert {client.session_id for client in clients} == {'session-1'}
+
+
+def test_sqlite_store_single_refresh_across_threads(make_mock_client, tmp_path):
+    logins = []
+    path = str(tmp_path / 'sessions.db')
+    handler = login_handler(page_handler([[1]]), logins)
+    clients = [make_mock_client(handler, session_id=None, session_expiration=0,
+                                session_store=SQLiteSessionStore(path)) for _ in range(8)]
+    threads = [threading.Thread(target=client.read_by_query, args=('LOCATION', '')) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(logins) == 1
+    assert SQLiteSessionStore(path).get(clients[0].session_key()).session_id == 'session-1'
+
+
+def test_expired_stored_session_is_refreshed(make_mock_client):
+    logins = []
+    store = MemorySessionStore()
+    client = make_mock_client(login_handler(page_handler([[1]]), logins), session_id=None, session_expiration=0,
+                              session_store=store)
+    store.set(client.session_key(), Session('stale', client.endpoint, 0))
+    client.read_by_query('LOCATION', '')
+    assert len(logins) == 1
+    assert store.get(client.session_key()).session_id == 'session-1'
+
+
+@pytest.mark.parametrize('store', ['memory', 'sqlite'])
+def test_async_clients_share_store_in_one_loop(make_async_client, tmp_path, store):
+    logins = []
+    store = MemorySessionStore() if store == 'memory' else SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    login = login_handler(page_handler([[1]]), logins)
+
+    async def handler(request):
+        # Keep the login in flight so the other client has to wait for the store lock.
+        await asyncio.sleep(0.05)
+        return login(request)
+
+    async def run():
+        clients = [make_async_client(handler, session_id=None, session_expiration=0, session_store=store)
+                   for _ in range(2)]
+        await asyncio.gather(*(client.read_by_query('LOCATION', '') for client in clients))
+        return clients
+
+    # A blocking store lock would hang the event loop, so run it where a timeout can still fire.
+    results = []
+    thread = threading.Thread(target=lambda: results.append(asyncio.run(run())), daemon=True)
+    thread.start()
+    thread.join(10)
+    assert results, 'the clients deadlocked on the store lock'
+    assert len(logins) == 1
+    assert {client.session_id for client in results[0]} == {'session-1'}
+
+
+def test_default_async_lock_holds_store_lock_in_thread():
+    class Store(MemorySessionStore):
+        alock = SessionStore.alock
+
+    store, order = Store(), []
+
+    async def hold(name):
+        async with store.alock('key'):
+            order.append(name)
+            await asyncio.sleep(0.02)
+            order.append(name)
+
+    async def run():
+        await asyncio.gather(hold('a'), hold('b'))
+        with store.lock('key'):
+            pass
+
+    asyncio.run(run())
+    assert order in (['a', 'a', 'b', 'b'], ['b', 'b', 'a', 'a'])
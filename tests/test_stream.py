@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from jxmlease import parse
+
+from pyintacct import IntacctException
+from pyintacct.stream import ResponseStreamParser
+from .utils import page_handler, response_xml, result_xml
+
+
+def feed_in_chunks(parser, body, size=7):
+    records = []
+    for i in range(0, len(body), size):
+        records.extend(parser.feed(body[i:i + size]))
+    records.extend(parser.close())
+    return records
+
+
+def test_parser_matches_full_parse():
+    data = ('<data listtype="location" numremaining="3" resultId="r1">'
+            '<location>\n  <LOCATIONID>1</LOCATIONID>\n  <NAME>A &amp; B</NAME>\n</location>'
+            '<location><LOCATIONID>2</LOCATIONID><NAME/></location></data>')
+    body = response_xml(result_xml('c1', data=data))
+    parser = ResponseStreamParser('location')
+    records = feed_in_chunks(parser, body.encode('utf-8'))
+    assert records == list(parse(body).find_nodes_with_tag('location'))
+    assert parser.remaining == '3'
+    assert parser.result_id == 'r1'
+
+
+def test_parser_raises_on_error_message():
+    body = response_xml(result_xml('c1', status='failure', data='Object FAKEOBJECT does not exist'))
+    parser = ResponseStreamParser('fakeobject')
+    with pytest.raises(IntacctException, match='FAKEOBJECT'):
+        feed_in_chunks(parser, body.encode('utf-8'))
+
+
+def test_yield_by_query_stream(make_mock_client):
+    client = make_mock_client(page_handler([[1, 2], [3, 4], [5]]))
+    records = list(client.yield_by_query('LOCATION', '', pagesize=2, stream=True))
+    assert [record['LOCATIONID'] for record in records] == ['1', '2', '3', '4', '5']
+    records = list(client.yield_by_query('LOCATION', '', pagesize=2, stream=True, prefetch=1))
+    assert [record['LOCATIONID'] for record in records] == ['1', '2', '3', '4', '5']
+
+
+def test_async_yield_by_query_stream(make_async_client):
+    async def run():
+        async with make_async_client(page_handler([[1, 2], [3]])) as client:
+            return await client.read_by_query('LOCATION', '', pagesize=2, stream=True)
+
+    records = asyncio.run(run())
+    assert [record['LOCATIONID'] for record in records] == ['1', '2', '3']
@@ -1,7 +1,110 @@
+import operator
 import random
+import re
 import string
+import time
+from datetime import datetime
+from uuid import uuid4
+
+import httpx
+from jxmlease import parse
 
 
 def random_str(length=8):
     return ''.join(random.choice(string.ascii_letters + string.digits) for i in range(length))
 
+
+def result_xml(controlid, function='readByQuery', status='success', data=''):
+    if status == 'success':
+        body = data
+    else:
+        body = ('<errormessage><error><errorno>BL01001973</errorno><description></description>'
+                f'<description2>{data or "Failed"}</description2><correction></correction></error></errormessage>')
+    return (f'<result><status>{status}</status><function>{function}</function>'
+            f'<controlid>{controlid}</controlid>{body}</result>')
+
+
+def response_xml(*results):
+    return ('<?xml version="1.0" encoding="UTF-8"?><response><control><status>success</status>'
+            '<senderid>sender</senderid><controlid>control</controlid><uniqueid>false</uniqueid>'
+            '<dtdversion>3.0</dtdversion></control><operation><authentication><status>success</status>'
+            '<userid>user</userid><companyid>company</companyid></authentication>'
+            f'{"".join(results)}</operation></response>')
+
+
+def page_handler(pages):
+    """Serves LOCATION records in pages of `len(page)`, chained by resultId."""
+    def handler(request):
+        function = next(parse(request.content.decode('utf-8')).find_nodes_with_tag('function'))
+        controlid = function.get_xml_attr('controlid')
+        page = int(function['readMore']['resultId']) if 'readMore' in function else 0
+        records = ''.join(f'<location><LOCATIONID>{i}</LOCATIONID></location>' for i in pages[page])
+        remaining = sum(len(p) for p in pages[page + 1:])
+        data = f'<data listtype="location" numremaining="{remaining}" resultId="{page + 1}">{records}</data>'
+        return httpx.Response(200, text=response_xml(result_xml(controlid, data=data)))
+    return handler
+
+
+def login_handler(handler, logins):
+    """Answers getAPISession requests, appending each to `logins`, and passes anything else to `handler`."""
+    def _handler(request):
+        body = request.content.decode('utf-8')
+        if '<getAPISession' not in body:
+            return handler(request)
+        logins.append(body)
+        function = next(parse(body).find_nodes_with_tag('function'))
+        data = (f'<data><api><sessionid>session-{len(logins)}</sessionid>'
+                f'<endpoint>https://api.intacct.com/ia/xml/xmlgw.phtml</endpoint>'
+                f'<sessiontimeout>2099-01-01T00:00:00+00:00</sessiontimeout></api></data>')
+        return httpx.Response(200, text=response_xml(
+            result_xml(function.get_xml_attr('controlid'), 'getAPISession', data=data)))
+    return _handler
+
+
+def query_handler(obj, records, delay=0):
+    """
+    Serves readByQuery/readMore over `records` (dicts), applying queries made of
+    `FIELD <op> integer` and `FIELD <op> 'MM/DD/YYYY HH:MM:SS'` conditions joined by AND.
+    """
+    ops = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '=': operator.eq}
+    result_sets = {}
+
+    def value(v):
+        v = str(v).strip("'")
+        return datetime.strptime(v, '%m/%d/%Y %H:%M:%S') if '/' in v else int(v)
+
+    def handler(request):
+        time.sleep(delay)
+        function = next(parse(request.content.decode('utf-8')).find_nodes_with_tag('function'))
+        if 'readMore' in function:
+            result_id = str(function['readMore']['resultId'])
+            matches, pagesize = result_sets[result_id]
+        else:
+            read = function['readByQuery']
+            conditions = re.findall(r"(\w+) (<=|>=|<|>|=) (-?\d+|'[^']*')", str(read['query']))
+            matches = [r for r in records if all(ops[op](value(r[f]), value(v)) for f, op, v in conditions)]
+            pagesize = int(read['pagesize'])
+            result_id = str(uuid4())
+        page, rest = matches[:pagesize], matches[pagesize:]
+        result_sets[result_id] = (rest, pagesize)
+        rows = ''.join(f'<{obj}>' + ''.join(f'<{k}>{v}</{k}>' for k, v in r.items()) + f'</{obj}>' for r in page)
+        data = (f'<data listtype="{obj}" count="{len(page)}" totalcount="{len(matches)}" '
+                f'numremaining="{len(rest)}" resultId="{result_id}">{rows}</data>')
+        return httpx.Response(200, text=response_xml(result_xml(function.get_xml_attr('controlid'), data=data)))
+    return handler
+
+
+def inspect_handler(obj, types, calls=None):
+    """Answers inspect requests for `obj` with fields named and typed by `types`."""
+    def handler(request):
+        if calls is not None:
+            calls.append(request)
+        function = next(parse(request.content.decode('utf-8')).find_nodes_with_tag('function'))
+        fields = ''.join(f'<Field><Name>{name}</Name><externalDataName>{name.lower()}</externalDataName>'
+                         f'<isRequired>false</isRequired><isReadOnly>{str(name == "RECORDNO").lower()}</isReadOnly>'
+                         f'<maxLength>8</maxLength><DisplayLabel>{name.title()}</DisplayLabel>'
+                         f'<DATATYPE>{datatype}</DATATYPE></Field>' for name, datatype in types.items())
+        data = f'<data listtype="All" count="1"><Type Name="{obj}"><Fields>{fields}</Fields></Type></data>'
+        return httpx.Response(200, text=response_xml(
+            result_xml(function.get_xml_attr('controlid'), 'inspect', data=data)))
+    return handler